@@ -0,0 +1,234 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import attacks.attack_util as attack_util
+from data.fast_reader import parse_lines
+from defs.utils import log
+
+# Columns of the attack log
+LOG_COLUMNS = attack_util.ATTACK_LOG_HEADER.split(",")
+
+
+class AttackIndex:
+	"""
+	Index over the attack log written by attack_util.flag_attack_end(), used to find which attacks were active at a
+	given time or during a given window without scanning the whole log.
+	For each device and attack, the index keeps the intervals when the attack was active sorted by start time, with
+	overlapping intervals merged, so every query is a binary search (np.searchsorted). Every query has a batch
+	version that receives NumPy arrays.
+	An attack is considered active at time t if it started at or before t and ended after t.
+
+	The index is saved next to the log (see get_index_path()) along with the position of the log it covers. When it's
+	loaded again, or when refresh() is called, only the rows appended to the log since then are read.
+	"""
+
+	log_path: str
+	# True to save the index after reading new rows
+	persist: bool
+
+	# Start and end times of the intervals of each attack on each device, indexed by (device, attack)
+	_intervals: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]
+	# Position of the log up to which rows have been indexed
+	_offset: int
+
+	def __init__(self, log_path: str = attack_util.ATTACK_LOG_PATH, persist: bool = True):
+		"""
+		Loads the index of the specified log, reading any rows that haven't been indexed yet. If the log doesn't
+		exist, the index will be empty until refresh() is called after the log has been created.
+		"""
+		self.log_path = log_path
+		self.persist = persist
+		self._intervals = {}
+		self._offset = 0
+		if persist:
+			self._load()
+		self.refresh()
+
+	def refresh(self) -> int:
+		"""
+		Adds the rows appended to the log since the last refresh to the index. If the log has been replaced by a
+		smaller one, the index is rebuilt.
+		return: Number of rows added
+		"""
+		try:
+			size = os.path.getsize(self.log_path)
+		except FileNotFoundError:
+			return 0
+		if size < self._offset:
+			self._intervals = {}
+			self._offset = 0
+		if size == self._offset:
+			return 0
+
+		with open(self.log_path, "rb") as file:
+			file.seek(self._offset)
+			data = file.read(size - self._offset)
+		# Ignore a partially written row at the end
+		data = data[:data.rfind(b"\n") + 1]
+		rows_data = data
+		if self._offset == 0:
+			# Skip the header
+			rows_data = data[data.find(b"\n") + 1:]
+		columns = parse_lines(rows_data.decode(), LOG_COLUMNS)
+		rows = np.column_stack([columns[name] for name in LOG_COLUMNS])
+		self._offset += len(data)
+		self._add_rows(rows)
+		if self.persist and len(rows) > 0:
+			self._save()
+		return len(rows)
+
+	def get_index_path(self) -> str:
+		"""
+		Returns the path of the file where the index is saved
+		"""
+		return os.path.splitext(self.log_path)[0] + "-index.npz"
+
+	def get_intervals(self, device_num: int, attack_num: int) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the start and end times of the intervals when an attack was active on a device, sorted by start time
+		"""
+		empty = np.zeros(0, np.int64)
+		return self._intervals.get((device_num, attack_num), (empty, empty))
+
+	def get_attacks(self, device_num: int, timestamp: int) -> int:
+		"""
+		Returns the bitmask of the attacks that were active on a device at the given time
+		"""
+		return int(self.get_attacks_batch(device_num, np.array([timestamp], np.int64))[0])
+
+	def get_attacks_batch(self, device_num: int, timestamps: np.ndarray) -> np.ndarray:
+		"""
+		Returns the bitmask of the attacks that were active on a device at each of the given times (which don't need
+		to be sorted)
+		"""
+		result = np.zeros(len(timestamps), np.uint32)
+		for attack_num, (starts, ends) in self._get_device_intervals(device_num):
+			# Last interval that started at or before each time
+			idx = np.searchsorted(starts, timestamps, side="right") - 1
+			active = (idx >= 0) & (timestamps < ends[np.maximum(idx, 0)])
+			result[active] |= np.uint32(1 << attack_num)
+		return result
+
+	def get_overlapping(self, device_num: int, time_start: int, time_end: int) -> int:
+		"""
+		Returns the bitmask of the attacks that were active on a device at any point of the window
+		[time_start, time_end)
+		"""
+		return int(self.get_overlapping_batch(device_num, np.array([time_start], np.int64),
+			np.array([time_end], np.int64))[0])
+
+	def get_overlapping_batch(self, device_num: int, time_starts: np.ndarray, time_ends: np.ndarray) -> np.ndarray:
+		"""
+		Returns the bitmask of the attacks that were active on a device at any point of each of the windows
+		[time_starts[i], time_ends[i])
+		"""
+		result = np.zeros(len(time_starts), np.uint32)
+		for attack_num, (starts, ends) in self._get_device_intervals(device_num):
+			# Intervals are disjoint, so the ones that overlap a window are contiguous: the first one that ends after
+			# the window starts and the ones after it that start before the window ends
+			first = np.searchsorted(ends, time_starts, side="right")
+			last = np.searchsorted(starts, time_ends, side="left")
+			result[last > first] |= np.uint32(1 << attack_num)
+		return result
+
+	def get_overlapping_intervals(self, device_num: int, time_start: int, time_end: int) -> List[Tuple[int, int, int]]:
+		"""
+		Returns the intervals of the attacks that were active on a device at any point of the window
+		[time_start, time_end), as (start, end, attack number) tuples sorted by start time
+		"""
+		result = []
+		for attack_num, (starts, ends) in self._get_device_intervals(device_num):
+			first = np.searchsorted(ends, time_start, side="right")
+			last = np.searchsorted(starts, time_end, side="left")
+			result.extend([(int(s), int(e), attack_num) for s, e in zip(starts[first:last], ends[first:last])])
+		result.sort()
+		return result
+
+	def get_sample_ranges(self, device_num: int, attack_num: int, timestamps: np.ndarray) -> \
+		Tuple[np.ndarray, np.ndarray]:
+		"""
+		Given the sorted timestamps of the samples of a device, returns the ranges of samples taken while an attack
+		was active.
+		return: Position of the first sample of each range and position after the last one. Ranges with no samples
+		are left out.
+		"""
+		starts, ends = self.get_intervals(device_num, attack_num)
+		firsts = np.searchsorted(timestamps, starts, side="left")
+		lasts = np.searchsorted(timestamps, ends, side="left")
+		non_empty = lasts > firsts
+		return firsts[non_empty], lasts[non_empty]
+
+	def get_sample_mask(self, device_num: int, attack_num: int, timestamps: np.ndarray) -> np.ndarray:
+		"""
+		Returns a boolean array that is true for each timestamp at which an attack was active on a device
+		"""
+		return (self.get_attacks_batch(device_num, timestamps) & np.uint32(1 << attack_num)) != 0
+
+	def _get_device_intervals(self, device_num: int) -> List[Tuple[int, Tuple[np.ndarray, np.ndarray]]]:
+		return [(attack_num, intervals) for (device, attack_num), intervals in self._intervals.items()
+			if device == device_num]
+
+	def _add_rows(self, rows: np.ndarray):
+		"""
+		Adds log rows (start, end, device, attack) to the index
+		"""
+		for device_num, attack_num in set(zip(rows[:, 2].tolist(), rows[:, 3].tolist())):
+			selected = rows[(rows[:, 2] == device_num) & (rows[:, 3] == attack_num)]
+			starts, ends = self.get_intervals(device_num, attack_num)
+			self._intervals[(device_num, attack_num)] = _merge_intervals(np.concatenate((starts, selected[:, 0])),
+				np.concatenate((ends, selected[:, 1])))
+
+	def _load(self):
+		"""
+		Loads the saved index, if it exists and the log hasn't been replaced since it was saved
+		"""
+		path = self.get_index_path()
+		if not os.path.isfile(path) or not os.path.isfile(self.log_path):
+			return
+		try:
+			with np.load(path) as data:
+				offset = int(data["offset"])
+				if offset > os.path.getsize(self.log_path):
+					return
+				for device_num, attack_num, starts, ends in zip(data["devices"].tolist(), data["attacks"].tolist(),
+					np.split(data["starts"], data["splits"]), np.split(data["ends"], data["splits"])):
+					self._intervals[(device_num, attack_num)] = (starts, ends)
+				self._offset = offset
+		except (OSError, ValueError, KeyError):
+			log("Warning: Couldn't load the attack index " + path + ", it will be rebuilt")
+			self._intervals = {}
+
+	def _save(self):
+		keys = sorted(self._intervals.keys())
+		starts = [self._intervals[key][0] for key in keys]
+		ends = [self._intervals[key][1] for key in keys]
+		path = self.get_index_path()
+		try:
+			with open(path + ".tmp", "wb") as file:
+				np.savez(file, offset=np.int64(self._offset),
+					devices=np.array([key[0] for key in keys], np.int64),
+					attacks=np.array([key[1] for key in keys], np.int64),
+					splits=np.cumsum([len(s) for s in starts[:-1]], dtype=np.int64),
+					starts=np.concatenate(starts) if len(keys) > 0 else np.zeros(0, np.int64),
+					ends=np.concatenate(ends) if len(keys) > 0 else np.zeros(0, np.int64))
+			os.replace(path + ".tmp", path)
+		except OSError as e:
+			log("Warning: Couldn't save the attack index to " + path + ": " + str(e))
+
+
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Sorts a set of intervals and merges the ones that overlap, so each time falls in at most one interval.
+	return: Start and end times of the merged intervals
+	"""
+	order = np.argsort(starts, kind="stable")
+	starts = starts[order]
+	ends = np.maximum.accumulate(ends[order])
+	# An interval starts a new group if it starts after all the previous ones have ended
+	new_group = np.ones(len(starts), bool)
+	new_group[1:] = starts[1:] > ends[:-1]
+	group_starts = np.flatnonzero(new_group)
+	group_ends = np.append(group_starts[1:], len(starts)) - 1
+	return starts[group_starts], ends[group_ends]
@@ -0,0 +1,161 @@
+import os
+import select
+import time
+from threading import Thread, Lock, Event
+from typing import Dict
+
+import attacks.attack_util as attack_util
+from defs import inotify
+from defs.constants import Constants as Cst
+from defs.utils import log
+
+
+class AttackState:
+	"""
+	In-memory cache that keeps track of the attacks currently active on each device, stored as one bitmask per device
+	(bit N set means attack #N is active).
+	The attack files in Cst.ATTACK_FOLDER are still the source of truth. The cache is kept up to date by:
+	- Listening to attack_util, which notifies attacks flagged by this same process immediately.
+	- Watching the attack folder with inotify, which catches attacks flagged by external scripts.
+	- Periodically rescanning the whole folder, in case inotify is not available or an event was lost.
+	This allows reading the active attacks on each measurement without touching the filesystem.
+	"""
+
+	# Active attacks on each device, indexed by device number
+	bitmasks: Dict[int, int]
+	# Seconds between full rescans of the attack folder
+	rescan_interval: float
+
+	_lock: Lock
+	_stop_flag: Event
+	_thread: "Thread | None"
+	# Pipe used to wake up the watcher thread when stop() is called
+	_wakeup_read: int
+	_wakeup_write: int
+
+	def __init__(self, rescan_interval: float = Cst.ATTACK_RESCAN_INTERVAL):
+		self.bitmasks = {}
+		self.rescan_interval = rescan_interval
+		self._lock = Lock()
+		self._stop_flag = Event()
+		self._thread = None
+		self._wakeup_read = -1
+		self._wakeup_write = -1
+
+	def start(self):
+		"""
+		Performs an initial scan of the attack folder and starts tracking changes to it on a separate thread.
+		"""
+		os.makedirs(Cst.ATTACK_FOLDER, exist_ok=True)
+		self._stop_flag.clear()
+		attack_util.add_listener(self._on_attack_flagged)
+		self._wakeup_read, self._wakeup_write = os.pipe()
+
+		notifier = None
+		if inotify.is_available():
+			try:
+				notifier = inotify.INotify()
+				notifier.add_watch(Cst.ATTACK_FOLDER, inotify.IN_CREATE | inotify.IN_DELETE | inotify.IN_MOVED_TO |
+					inotify.IN_MOVED_FROM | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF | inotify.IN_ONLYDIR)
+			except OSError as e:
+				log("Warning: Could not watch the attack folder for changes (" + str(e) + "). Active attacks will be "
+					"rescanned every " + str(self.rescan_interval) + " seconds instead.")
+				if notifier is not None:
+					notifier.close()
+				notifier = None
+
+		# The scan must happen after the watch has been added so no changes are missed in between
+		self.rescan()
+		self._thread = Thread(target=self._watch, args=(notifier,), daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		"""
+		Stops tracking changes to the attack folder. The last known state can still be read after calling this method.
+		"""
+		attack_util.remove_listener(self._on_attack_flagged)
+		if self._thread is not None:
+			self._stop_flag.set()
+			os.write(self._wakeup_write, b"\0")
+			self._thread.join()
+			self._thread = None
+			os.close(self._wakeup_read)
+			os.close(self._wakeup_write)
+
+	def get_attacks(self, device_num: int) -> int:
+		"""
+		Returns the bitmask of attacks currently active on the specified device
+		"""
+		return self.bitmasks.get(device_num, 0)
+
+	def set_attack(self, device_num: int, attack_num: int, active: bool):
+		"""
+		Marks an attack as active or inactive on the specified device
+		"""
+		with self._lock:
+			if active:
+				self.bitmasks[device_num] = self.bitmasks.get(device_num, 0) | (1 << attack_num)
+			else:
+				self.bitmasks[device_num] = self.bitmasks.get(device_num, 0) & ~(1 << attack_num)
+
+	def rescan(self):
+		"""
+		Rebuilds the cached state by listing the contents of the attack folder
+		"""
+		bitmasks = {}
+		try:
+			for attack_file in os.listdir(Cst.ATTACK_FOLDER):
+				parsed = attack_util.parse_attack_file(attack_file)
+				if parsed is not None and os.path.isfile(os.path.join(Cst.ATTACK_FOLDER, attack_file)):
+					bitmasks[parsed[0]] = bitmasks.get(parsed[0], 0) | (1 << parsed[1])
+		except FileNotFoundError:
+			pass
+		with self._lock:
+			# Replace the whole dict at once so readers never see a partially rebuilt state
+			self.bitmasks = bitmasks
+
+	def _on_attack_flagged(self, device_num: int, attack_num: int, active: bool):
+		self.set_attack(device_num, attack_num, active)
+
+	def _watch(self, notifier: "inotify.INotify | None"):
+		"""
+		Main loop of the watcher thread. Applies inotify events as they arrive and rescans the folder periodically.
+		"""
+		fds = [self._wakeup_read]
+		if notifier is not None:
+			fds.append(notifier.fd)
+		next_rescan = time.monotonic() + self.rescan_interval
+		try:
+			while not self._stop_flag.is_set():
+				ready, _, _ = select.select(fds, [], [], max(0.0, next_rescan - time.monotonic()))
+				if self._stop_flag.is_set():
+					break
+				if notifier is not None and notifier.fd in ready:
+					if not self._apply_events(notifier):
+						# The watched folder is gone, fall back to periodic rescans
+						notifier.close()
+						fds.remove(notifier.fd)
+						notifier = None
+				if time.monotonic() >= next_rescan:
+					self.rescan()
+					next_rescan = time.monotonic() + self.rescan_interval
+		finally:
+			if notifier is not None:
+				notifier.close()
+
+	def _apply_events(self, notifier: "inotify.INotify") -> bool:
+		"""
+		Updates the cached state with the pending inotify events.
+		return: False if the watch is no longer valid, true otherwise.
+		"""
+		for _wd, mask, name in notifier.read_events():
+			if mask & inotify.IN_Q_OVERFLOW:
+				self.rescan()
+			elif mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF | inotify.IN_IGNORED):
+				self.rescan()
+				return False
+			else:
+				parsed = attack_util.parse_attack_file(name)
+				if parsed is not None:
+					self.set_attack(parsed[0], parsed[1], bool(mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO)))
+		return True
@@ -1,5 +1,7 @@
 import os
 from enum import Enum
+from typing import Callable, List, Tuple
+
 from defs.constants import Constants as Cst
 
 """
@@ -9,6 +11,10 @@ Utility file used to flag the start and end of an attack by creating and updatin
 ATTACK_LOG_PATH = "data/attack_log.csv"
 ATTACK_LOG_HEADER = "Time start,Time end,Device,Attack"
 
+# Functions called whenever an attack file is created or deleted by this process.
+# Each one receives the device number, the attack number and true if the attack started or false if it ended.
+_listeners: List[Callable[[int, int, bool], None]] = []
+
 
 class Status(Enum):
 	"""
@@ -32,6 +38,7 @@ def flag_attack_start(device_num: int, attack_num: int) -> Status:
 		os.makedirs(os.path.dirname(file_path), exist_ok=True)
 		try:
 			open(file_path, "a")  # Create empty file
+			_notify_listeners(device_num, attack_num, True)
 			return Status.SUCCESS
 		except OSError:
 			return Status.OS_ERROR
@@ -47,6 +54,7 @@ def flag_attack_end(device_num: int, attack_num: int, time_start: int, time_end:
 	if os.path.isfile(file_path):
 		try:
 			os.remove(file_path)
+			_notify_listeners(device_num, attack_num, False)
 
 			# Log attack
 			file_exists = os.path.isfile(ATTACK_LOG_PATH)
@@ -97,6 +105,9 @@ def delete_all_attack_files() -> Status:
 			try:
 				if os.path.isfile(path):
 					os.remove(path)
+					parsed = parse_attack_file(file)
+					if parsed is not None:
+						_notify_listeners(parsed[0], parsed[1], False)
 			except OSError:
 				return Status.OS_ERROR
 	return Status.SUCCESS
@@ -107,3 +118,40 @@ def get_attack_file(device_num: int, attack_num: int):
 	Returns the path to the file that indicates that the specified attack is active on the specified device
 	"""
 	return os.path.join(Cst.ATTACK_FOLDER, Cst.ATTACK_FILE_PREFIX + str(device_num) + "-" + str(attack_num))
+
+
+def parse_attack_file(file_name: str) -> "Tuple[int, int] | None":
+	"""
+	Given the name of an attack file (not the full path), returns the device number and the attack number it
+	represents. If the name doesn't follow the "attack-X-Y" format, returns None.
+	"""
+	if not file_name.startswith(Cst.ATTACK_FILE_PREFIX):
+		return None
+	file_split = file_name[len(Cst.ATTACK_FILE_PREFIX):].split("-")
+	if len(file_split) != 2:
+		return None
+	try:
+		return int(file_split[0]), int(file_split[1])
+	except ValueError:
+		return None
+
+
+def add_listener(listener: Callable[[int, int, bool], None]):
+	"""
+	Registers a function that will be called whenever this process flags the start or the end of an attack.
+	The function receives the device number, the attack number and true if the attack started or false if it ended.
+	"""
+	_listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[int, int, bool], None]):
+	"""
+	Unregisters a function previously registered with add_listener(). Does nothing if it wasn't registered.
+	"""
+	if listener in _listeners:
+		_listeners.remove(listener)
+
+
+def _notify_listeners(device_num: int, attack_num: int, active: bool):
+	for listener in _listeners:
+		listener(device_num, attack_num, active)
@@ -0,0 +1,286 @@
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import attacks.attack_util as attack_util
+from attacks.attack_state import AttackState
+from data.binary_buffer_data_writer import BinaryBufferDataWriter
+from data.buffer_data_writer import BufferDataWriter
+from data.data_writer import DataWriter
+from data.sample_ring import SampleRing
+from data.standard_data_writer import StandardDataWriter
+from defs.acquisition_profile import AcquisitionProfile
+from defs.measured_device import MeasuredDevice
+from sensors.sensor_array import SensorArray
+from sensors.sensor_type import SensorType
+from main_loop import get_file_path, get_power, pop_flag_param
+
+"""
+Script used to measure how long each step of a main loop measurement (tick) takes, without needing the real
+hardware. Sensors are replaced by synthetic or emulated ones and all files are written to a temporary directory.
+
+Each combination of device count, writer type, buffer size and amount of attack files is run for a fixed amount of
+ticks. For each combination, the latency of each phase of the tick is reported:
+	read: Reading the power usage of all devices from the sensors
+	attacks: Looking up the active attacks of all devices
+	push: Passing the samples of all devices to the writer thread
+	write: Writing the samples of all devices with DataWriter.write (done on the writer thread during real runs)
+	tick: Total time spent on the sampling thread (read + attacks + push)
+The maximum sustainable sample rate is the highest rate at which both the sampling thread and the writer thread can
+keep up, based on the mean time each one spends per tick.
+
+Results are written as JSON so they can be compared between versions.
+"""
+
+# Default values of the swept parameters
+DEFAULT_DEVICES = [1, 3, 6, 12]
+DEFAULT_WRITERS = ["standard", "buffer", "binary"]
+DEFAULT_BUFFER_SIZES = [100, 1000]
+DEFAULT_ATTACK_FILES = [0, 10, 100]
+DEFAULT_TICKS = 1000
+
+# Number of channels of each sensor and amount of sensors that can share the same bus
+CHANNELS_PER_SENSOR = 3
+SENSORS_PER_BUS = 4
+FIRST_SENSOR_ADDRESS = 0x40
+# Max number of attack files created for each device
+ATTACKS_PER_DEVICE = 32
+
+PHASES = ["read", "attacks", "push", "write", "tick"]
+
+
+def main():
+	args = sys.argv
+
+	if "--help" in args:
+		print_help()
+		return 0
+
+	devices = DEFAULT_DEVICES
+	writers = DEFAULT_WRITERS
+	buffer_sizes = DEFAULT_BUFFER_SIZES
+	attack_files = DEFAULT_ATTACK_FILES
+	num_ticks = DEFAULT_TICKS
+	sensor_type = SensorType.SYNTHETIC
+
+	value = pop_flag_param(args, "--devices")
+	if value is not None:
+		devices = [int(v) for v in value.split(",")]
+		if min(devices) <= 0:
+			print("Error: Device counts must be positive")
+			return 1
+	value = pop_flag_param(args, "--writers")
+	if value is not None:
+		writers = value.split(",")
+		if any(w not in DEFAULT_WRITERS for w in writers):
+			print_help()
+			return 1
+	value = pop_flag_param(args, "--buffer-sizes")
+	if value is not None:
+		buffer_sizes = [int(v) for v in value.split(",")]
+		if min(buffer_sizes) <= 0:
+			print("Error: Buffer sizes must be > 0")
+			return 1
+	value = pop_flag_param(args, "--attack-files")
+	if value is not None:
+		attack_files = [int(v) for v in value.split(",")]
+		if min(attack_files) < 0:
+			print("Error: Attack file counts can't be negative")
+			return 1
+	value = pop_flag_param(args, "--ticks")
+	if value is not None:
+		num_ticks = int(value)
+		if num_ticks <= 0:
+			print("Error: Tick count must be positive")
+			return 1
+	value = pop_flag_param(args, "--sensor")
+	if value is not None:
+		if value == "synthetic":
+			sensor_type = SensorType.SYNTHETIC
+		elif value == "fake":
+			sensor_type = SensorType.FAKE_SMBUS
+		else:
+			print_help()
+			return 1
+	output_path = pop_flag_param(args, "-o")
+
+	results = run(devices, writers, buffer_sizes, attack_files, num_ticks, sensor_type)
+	output = json.dumps(results, indent=2)
+	if output_path is None:
+		print(output)
+	else:
+		with open(output_path, "w") as f:
+			f.write(output + "\n")
+	return 0
+
+
+def run(devices: List[int], writers: List[str], buffer_sizes: List[int], attack_files: List[int], num_ticks: int,
+	sensor_type: SensorType = SensorType.SYNTHETIC) -> Dict:
+	"""
+	Runs every combination of the specified parameters and returns the results
+	devices: Amounts of devices to measure
+	writers: Writer types to use ("standard", "buffer" or "binary")
+	buffer_sizes: Buffer sizes to use with the buffer writers. Ignored by the standard writer.
+	attack_files: Amounts of active attack files present while measuring
+	num_ticks: Amount of ticks run for each combination
+	sensor_type: Type of sensor used to read power. Must not require any hardware.
+	return: Dict containing the parameters used and a list with the results of each combination
+	"""
+	results = []
+	cwd = os.getcwd()
+	for num_devices, writer_type, num_attack_files in itertools.product(devices, writers, attack_files):
+		for buffer_size in (buffer_sizes if writer_type != "standard" else [0]):
+			with tempfile.TemporaryDirectory() as data_dir:
+				# All paths used by the main loop are relative, so this makes them point to the temporary directory
+				os.chdir(data_dir)
+				try:
+					result = run_case(num_devices, buffer_size, num_attack_files, num_ticks, sensor_type,
+						writer_type == "binary")
+				finally:
+					os.chdir(cwd)
+			result["writer"] = writer_type
+			results.append(result)
+
+	return {
+		"time": int(time.time() * 1000),
+		"python": sys.version.split(" ")[0],
+		"sensor": sensor_type.name.lower(),
+		"ticks": num_ticks,
+		"results": results
+	}
+
+
+def run_case(num_devices: int, buffer_size: int, num_attack_files: int, num_ticks: int,
+	sensor_type: SensorType, binary_buffer: bool = False) -> Dict:
+	"""
+	Runs a single combination of parameters on the current working directory, measuring the duration of each phase
+	of every tick.
+	buffer_size: If > 0, a buffer writer of this size will be used. Otherwise, the standard writer will be used.
+	binary_buffer: True to use the binary buffer writer instead of the CSV one
+	return: Dict with the parameters of the run, the latency stats of each phase and the max sustainable rate
+	"""
+	devices = get_devices(num_devices)
+	create_attack_files(num_attack_files, num_devices)
+
+	attack_state = AttackState()
+	attack_state.start()
+	writers: Dict[int, DataWriter] = {}
+	for device in devices:
+		os.makedirs(os.path.dirname(get_file_path(device.device_num, buffer_size > 0)), exist_ok=True)
+		if buffer_size > 0 and binary_buffer:
+			writers[device.device_num] = BinaryBufferDataWriter(get_file_path(device.device_num, True, True), True,
+				buffer_size)
+		elif buffer_size > 0:
+			writers[device.device_num] = BufferDataWriter(get_file_path(device.device_num, True), True, buffer_size)
+		else:
+			writers[device.device_num] = StandardDataWriter(get_file_path(device.device_num, False), True)
+	# The ring is emptied on every tick, so it only needs to hold the samples of a single tick
+	ring = SampleRing(num_devices)
+	sensors = SensorArray(devices, sensor_type)
+	sensors.configure(AcquisitionProfile("benchmark", 1, 140, 140, AcquisitionProfile.MODE_SHUNT_BUS))
+
+	durations = {phase: [] for phase in PHASES}
+	try:
+		for _ in range(num_ticks):
+			timestamp = int(time.time() * 1000)
+
+			t0 = time.perf_counter_ns()
+			readings = sensors.read()
+			t1 = time.perf_counter_ns()
+			attacks = [attack_state.get_attacks(device.device_num) for device in devices]
+			t2 = time.perf_counter_ns()
+			for device, reading, device_attacks in zip(devices, readings, attacks):
+				ring.push(timestamp, device.device_num, get_power(reading, False), device_attacks)
+			t3 = time.perf_counter_ns()
+			for sample_time, device_num, power, device_attacks in ring.pop_batch(num_devices):
+				writers[device_num].write(power, device_attacks, sample_time)
+			t4 = time.perf_counter_ns()
+
+			durations["read"].append(t1 - t0)
+			durations["attacks"].append(t2 - t1)
+			durations["push"].append(t3 - t2)
+			durations["write"].append(t4 - t3)
+			durations["tick"].append(t3 - t0)
+	finally:
+		sensors.close()
+		for writer in writers.values():
+			writer.close()
+		attack_state.stop()
+
+	# The sampling thread and the writer thread run in parallel, so the slowest of them limits the rate
+	mean_tick = sum(durations["tick"]) / num_ticks
+	mean_write = sum(durations["write"]) / num_ticks
+	max_rate = 1e9 / max(mean_tick, mean_write)
+
+	return {
+		"devices": num_devices,
+		"buffer_size": buffer_size,
+		"attack_files": num_attack_files,
+		"phases": {phase: get_latency_stats(values) for phase, values in durations.items()},
+		"max_rate_hz": round(max_rate, 1)
+	}
+
+
+def get_devices(num_devices: int) -> List[MeasuredDevice]:
+	"""
+	Returns a list of devices laid out like they would be on real hardware: 3 devices per sensor and up to 4 sensors
+	per bus.
+	"""
+	devices = []
+	for i in range(num_devices):
+		sensor = i // CHANNELS_PER_SENSOR
+		devices.append(MeasuredDevice(i + 1, 1 + sensor // SENSORS_PER_BUS, FIRST_SENSOR_ADDRESS +
+			sensor % SENSORS_PER_BUS, 1 + i % CHANNELS_PER_SENSOR))
+	return devices
+
+
+def create_attack_files(num_files: int, num_devices: int):
+	"""
+	Creates the specified amount of attack files. Files are spread across the measured devices first. Once every
+	device has ATTACKS_PER_DEVICE active attacks, the remaining files are assigned to devices that aren't being
+	measured, so attack bitmasks always fit in the sample ring.
+	"""
+	for i in range(num_files):
+		if i < num_devices * ATTACKS_PER_DEVICE:
+			attack_util.flag_attack_start(1 + i % num_devices, i // num_devices)
+		else:
+			extra = i - num_devices * ATTACKS_PER_DEVICE
+			attack_util.flag_attack_start(num_devices + 1 + extra // ATTACKS_PER_DEVICE, extra % ATTACKS_PER_DEVICE)
+
+
+def get_latency_stats(durations_ns: List[int]) -> Dict[str, float]:
+	"""
+	Returns the p50, p99 and max values of a list of durations, in µs
+	"""
+	values = sorted(durations_ns)
+	return {
+		"p50_us": round(values[(len(values) - 1) * 50 // 100] / 1000, 3),
+		"p99_us": round(values[(len(values) - 1) * 99 // 100] / 1000, 3),
+		"max_us": round(values[-1] / 1000, 3)
+	}
+
+
+def print_help():
+	print("Runs the main loop measurement steps with simulated sensors and reports how long each one takes, in JSON "
+		"format.\n"
+		"Flags:\n"
+		"--help: Prints this help\n"
+		"--devices <list>: Comma-separated list of device counts to test. Default: " +
+		",".join([str(v) for v in DEFAULT_DEVICES]) + ".\n"
+		"--writers <list>: Comma-separated list of writer types to test. Possible values: standard, buffer "
+		"(CSV buffer), binary (binary buffer). Default: all of them.\n"
+		"--buffer-sizes <list>: Comma-separated list of buffer sizes to test with the buffer writers. Default: " +
+		",".join([str(v) for v in DEFAULT_BUFFER_SIZES]) + ".\n"
+		"--attack-files <list>: Comma-separated list of amounts of active attack files to test. Default: " +
+		",".join([str(v) for v in DEFAULT_ATTACK_FILES]) + ".\n"
+		"--ticks <n>: Amount of measurements taken for each combination. Default: " + str(DEFAULT_TICKS) + ".\n"
+		"--sensor <type>: Sensor used to read power. Possible values: synthetic (default), fake.\n"
+		"-o <file>: Write the results to the specified file instead of printing them.")
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,111 @@
+import csv
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from data import columnar_reader, fast_reader, timeseries_codec
+from data.data_writer import DataWriter
+
+"""
+Functions used to load the output of a run and compare the attacks column written during the run with the attack
+bitmask of each sample rebuilt from the attack log (see attacks.attack_index).
+"""
+
+
+class Disagreement:
+	"""
+	Range of consecutive samples where the attacks column written during the run doesn't match the attacks rebuilt
+	from the attack log
+	"""
+
+	# Position of the first sample of the range and number of samples in it
+	first: int
+	count: int
+	# Timestamps of the first and last sample of the range
+	time_start: int
+	time_end: int
+	# Values of the first sample of the range
+	live_attacks: int
+	log_attacks: int
+
+	def __init__(self, first: int, count: int, time_start: int, time_end: int, live_attacks: int, log_attacks: int):
+		self.first = first
+		self.count = count
+		self.time_start = time_start
+		self.time_end = time_end
+		self.live_attacks = live_attacks
+		self.log_attacks = log_attacks
+
+	def __str__(self):
+		return str(self.time_start) + "-" + str(self.time_end) + " (" + str(self.count) + " samples): live " + \
+			str(self.live_attacks) + ", log " + str(self.log_attacks)
+
+
+def load_channel_data(path: str) -> Dict[str, np.ndarray]:
+	"""
+	Loads the output of a device, which can be a CSV file, a columnar output directory, a file encoded with the
+	time-series codec, a segment of a rotated output (optionally compressed with gzip or zstd) or the manifest of a
+	rotated output, in which case all its segments are loaded.
+	If the output has an unsupported format, throws ValueError.
+	return: Dict containing the "time" (int64) and "power" (float64) columns and, if the output includes attack
+	data, the "attacks" column (int64, -1 for entries with no attack data). Missing power values are NaN.
+	"""
+	if os.path.isdir(path):
+		columns = columnar_reader.load(path)
+	elif path.endswith(".tsc"):
+		columns = timeseries_codec.decode_file(path)
+	elif path.endswith("-manifest.csv"):
+		return load_manifest(path)
+	elif path.endswith(".csv") or path.endswith(".csv.gz") or path.endswith(".csv.zst"):
+		return load_csv(path)
+	else:
+		raise ValueError("Unsupported output format: " + path + ". Outputs must be CSV files (optionally compressed "
+			"with gzip or zstd), segment manifests, columnar output directories or .tsc files.")
+	result = {"time": columns["time"].astype(np.int64), "power": columns["power"].astype(np.float64)}
+	if "attacks" in columns:
+		result["attacks"] = columns["attacks"].astype(np.int64)
+		# These formats don't distinguish gaps from samples with no active attacks
+		result["attacks"][np.isnan(result["power"])] = -1
+	return result
+
+
+def load_manifest(file_path: str) -> Dict[str, np.ndarray]:
+	"""
+	Loads all the segments listed in the manifest of a rotated output, in order. See load_channel_data() for the
+	returned value.
+	"""
+	with open(file_path, newline="") as manifest:
+		reader = csv.reader(manifest)
+		next(reader)
+		segments = [os.path.join(os.path.dirname(file_path), row[0]) for row in reader if len(row) > 0]
+	parts = [load_csv(segment) for segment in segments]
+	if len(parts) == 0:
+		return {"time": np.zeros(0, np.int64), "power": np.zeros(0, np.float64)}
+	return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def load_csv(file_path: str) -> Dict[str, np.ndarray]:
+	"""
+	Loads a CSV file written by StandardDataWriter. See load_channel_data() for the returned value.
+	"""
+	columns = fast_reader.load_csv(file_path).columns
+	result = {"time": columns[DataWriter.COLUMN_TIME], "power": columns[DataWriter.COLUMN_POWER]}
+	if DataWriter.COLUMN_ATTACKS in columns:
+		result["attacks"] = columns[DataWriter.COLUMN_ATTACKS]
+	return result
+
+
+def find_disagreements(times: np.ndarray, live: np.ndarray, labels: np.ndarray) -> List[Disagreement]:
+	"""
+	Compares the attacks column written during a run with the labels rebuilt from the attack log, and returns the
+	ranges of consecutive samples where they don't match. Samples with no live attack data (-1) are ignored.
+	"""
+	mismatch = (live != -1) & (live != labels)
+	# Position where each range of consecutive mismatches starts and ends
+	changes = np.flatnonzero(np.diff(np.concatenate(([0], mismatch.astype(np.int8), [0]))))
+	ranges = []
+	for first, end in zip(changes[::2], changes[1::2]):
+		ranges.append(Disagreement(int(first), int(end - first), int(times[first]), int(times[end - 1]),
+			int(live[first]), int(labels[first])))
+	return ranges
@@ -0,0 +1,176 @@
+import math
+import mmap
+import os
+import struct
+import time
+from typing import BinaryIO, List, Tuple
+
+from data.data_writer import DataWriter
+from defs.exceptions import IllegalOperationError
+
+
+class BinaryBufferDataWriter(DataWriter):
+	"""
+	Class that can be used to write power and attacks data to a binary file while treating it as a cyclic buffer.
+	Older data will be overwritten with newer data on each write.
+	Like BufferDataWriter, the file is memory-mapped and each write overwrites a single record in place. Since records
+	are stored in binary, readers can map the file and access the records directly without parsing them (see
+	data.binary_buffer_reader).
+
+	File layout (all values are little-endian):
+		Header (HEADER_SIZE bytes):
+			0  magic (8 bytes): MAGIC
+			8  version (uint16): VERSION
+			10 flags (uint16): Combination of FLAG_* values
+			12 record size (uint32): Size of each record, in bytes
+			16 capacity (uint64): Number of records in the buffer
+			24 head (int64): Number of the most recently written record (with the first record being #0), or -1 if no
+			   records have been written yet
+			32 seq (uint64): Total amount of records written so far
+			40 gen (uint64): Generation counter, used by readers to detect concurrent writes (see below)
+			48 record dtype (16 bytes): NumPy type of each field in the record, comma-separated and padded with null
+			   bytes. Currently RECORD_DTYPE.
+		Records (capacity * record size bytes). Each record contains:
+			time (int64): UNIX timestamp in ms
+			attacks (uint32): Active attacks on the device. 0 if the file doesn't include attack data.
+			power (float64): Power usage of the device. NaN if the measurement couldn't be taken.
+	Head and seq are updated after the record they refer to has been written.
+
+	Writes follow a seqlock protocol, so readers can get a consistent snapshot without any locks: gen is incremented
+	before modifying the file (making it odd) and again once the modification is complete (making it even). A reader
+	copies the data it needs between two reads of gen. If the first value was odd or both values differ, the copy
+	might be torn and must be retried (see BinaryBufferReader.read_last_snapshot()).
+	The file is created under a temporary name and then renamed, so readers never see a partially initialized file.
+	"""
+
+	MAGIC = b"IOTPBUF\0"
+	VERSION = 2
+	# Set once the execution that writes the buffer has ended
+	FLAG_END = 1
+	# Set if the records include attack data
+	FLAG_ATTACKS = 2
+	HEADER_SIZE = 64
+	RECORD_DTYPE = "<i8,<u4,<f8"
+	RECORD_FIELDS = ["time", "attacks", "power"]
+
+	HEADER_STRUCT = struct.Struct("<8sHHIQqQQ16s")
+	FLAGS_STRUCT = struct.Struct("<H")
+	STATUS_STRUCT = struct.Struct("<qQ")
+	RECORD_STRUCT = struct.Struct("<qId")
+	FLAGS_OFFSET = 10
+	STATUS_OFFSET = 24
+	GEN_STRUCT = struct.Struct("<Q")
+	GEN_OFFSET = 40
+
+	file_path: str
+	attack_column: bool
+	buffer_size: int
+
+	_file: BinaryIO
+	_mmap: "mmap.mmap | None"
+	_flags: int
+	# Number of the most recently written record
+	_head: int
+	# Total amount of records written
+	_seq: int
+	# Generation counter. Odd while the file is being modified.
+	_gen: int
+
+	def __init__(self, file_path: str, attack_column: bool, buffer_size: int):
+		"""
+		Instantiates the class to write to the specified file. If the file already exists, it will be truncated.
+		The file will remain open until close() is called.
+		attack_column: True to store the active attacks in each record.
+		buffer_size: Number of records in the buffer. Once it fills, older records will start getting replaced.
+		"""
+		self.file_path = file_path
+		self.attack_column = attack_column
+		self.buffer_size = buffer_size
+		self._flags = self.FLAG_ATTACKS if attack_column else 0
+		self._head = -1
+		self._seq = 0
+		self._gen = 0
+
+		tmp_path = self.file_path + ".tmp"
+		with open(tmp_path, "wb") as file:
+			file.write(self.HEADER_STRUCT.pack(self.MAGIC, self.VERSION, self._flags, self.RECORD_STRUCT.size,
+				buffer_size, self._head, self._seq, self._gen, self.RECORD_DTYPE.encode()))
+			file.truncate(self.HEADER_SIZE + buffer_size * self.RECORD_STRUCT.size)
+		os.replace(tmp_path, self.file_path)
+		self._file = open(self.file_path, "r+b")
+		self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
+		"""
+		Overwrites the oldest record in the buffer with the current power usage, then updates the header to point to
+		it. If close() has already been called, throws IllegalOperationError.
+		See DataWriter.write for the description of the base method.
+		"""
+		if self._mmap is None:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		if timestamp == -1:
+			timestamp = int(time.time() * 1000)
+
+		self._begin_update()
+		self._write_record(power, timestamp, attacks)
+		self.STATUS_STRUCT.pack_into(self._mmap, self.STATUS_OFFSET, self._head, self._seq)
+		self._end_update()
+
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Writes several records, updating the header only once at the end.
+		See DataWriter.write_batch for the description of the base method.
+		"""
+		if self._mmap is None:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		self._begin_update()
+		for power, attacks, timestamp in rows:
+			self._write_record(power, timestamp, attacks)
+		self.STATUS_STRUCT.pack_into(self._mmap, self.STATUS_OFFSET, self._head, self._seq)
+		self._end_update()
+
+	def write_end(self):
+		"""
+		Sets the end flag in the header to signal readers that the execution has ended. The records written so far are
+		kept.
+		"""
+		if self._mmap is None:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		self._flags |= self.FLAG_END
+		self._begin_update()
+		self.FLAGS_STRUCT.pack_into(self._mmap, self.FLAGS_OFFSET, self._flags)
+		self._end_update()
+
+	def close(self):
+		"""
+		Unmaps and closes the file that was opened when instantiating the class. Attempting to call write() after
+		calling this method will throw an exception.
+		"""
+		if self._mmap is not None:
+			self._mmap.close()
+			self._mmap = None
+		self._file.close()
+
+	def _has_attack_column(self):
+		return self.attack_column
+
+	def _begin_update(self):
+		self._gen += 1
+		self.GEN_STRUCT.pack_into(self._mmap, self.GEN_OFFSET, self._gen)
+
+	def _end_update(self):
+		self._gen += 1
+		self.GEN_STRUCT.pack_into(self._mmap, self.GEN_OFFSET, self._gen)
+
+	def _write_record(self, power: "float | None", timestamp: float, attacks: int):
+		"""
+		Overwrites the record that comes after the most recently written one
+		"""
+		self._head = (self._head + 1) % self.buffer_size
+		self._seq += 1
+		self.RECORD_STRUCT.pack_into(self._mmap, self.HEADER_SIZE + self._head * self.RECORD_STRUCT.size,
+			int(timestamp), 0 if attacks == -1 or not self.attack_column else attacks,
+			math.nan if power is None else power)
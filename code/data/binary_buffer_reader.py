@@ -0,0 +1,167 @@
+import mmap
+import time
+from typing import BinaryIO, Tuple
+
+import numpy as np
+
+from data.binary_buffer_data_writer import BinaryBufferDataWriter as Writer
+
+"""
+Functions and classes used to read the binary buffer files written by BinaryBufferDataWriter.
+Records are returned as NumPy structured arrays with the fields "time", "attacks" and "power", backed directly by
+the memory-mapped file, so no parsing is required.
+"""
+
+
+# Amount of failed attempts to get a consistent snapshot after which the reader waits for SNAPSHOT_RETRY_DELAY
+# seconds before trying again
+SNAPSHOT_SPIN_ATTEMPTS = 100
+SNAPSHOT_RETRY_DELAY = 0.0001
+
+
+class BufferFormatError(Exception):
+	"""
+	Thrown when a file is not a valid binary buffer file, or its version is not supported
+	"""
+	pass
+
+
+class BinaryBufferReader:
+	"""
+	Reads a binary buffer file while it's being written by another process.
+	Most methods return views over the mapped file, so their contents will change as the writer overwrites the buffer,
+	and they might contain a record that is being written. Use read_last_snapshot() to get a consistent copy instead.
+	"""
+
+	file_path: str
+	capacity: int
+	# True if the records include attack data
+	has_attacks: bool
+	# All the records in the buffer, in file order
+	records: np.ndarray
+
+	_file: BinaryIO
+	_mmap: mmap.mmap
+
+	def __init__(self, file_path: str):
+		"""
+		Opens and maps a buffer file. If the file is not a valid buffer file, throws BufferFormatError.
+		"""
+		self.file_path = file_path
+		self._file = open(file_path, "rb")
+		try:
+			self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:
+			self._file.close()
+			raise BufferFormatError("File " + file_path + " is empty")
+
+		if len(self._mmap) < Writer.HEADER_SIZE:
+			self.close()
+			raise BufferFormatError("File " + file_path + " is too small to be a buffer file")
+		magic, version, flags, record_size, capacity, _, _, _, record_dtype = \
+			Writer.HEADER_STRUCT.unpack_from(self._mmap, 0)
+		if magic != Writer.MAGIC:
+			self.close()
+			raise BufferFormatError("File " + file_path + " is not a buffer file")
+		if version != Writer.VERSION:
+			self.close()
+			raise BufferFormatError("Unsupported buffer file version: " + str(version))
+
+		dtype = np.dtype({
+			"names": Writer.RECORD_FIELDS,
+			"formats": record_dtype.rstrip(b"\0").decode().split(",")
+		})
+		if dtype.itemsize != record_size or len(self._mmap) < Writer.HEADER_SIZE + capacity * record_size:
+			self.close()
+			raise BufferFormatError("File " + file_path + " is truncated or its record size is invalid")
+
+		self.capacity = capacity
+		self.has_attacks = bool(flags & Writer.FLAG_ATTACKS)
+		self.records = np.frombuffer(self._mmap, dtype, capacity, Writer.HEADER_SIZE)
+
+	def is_over(self) -> bool:
+		"""
+		Returns true if the writer has flagged the end of the execution
+		"""
+		return bool(Writer.FLAGS_STRUCT.unpack_from(self._mmap, Writer.FLAGS_OFFSET)[0] & Writer.FLAG_END)
+
+	def get_status(self) -> Tuple[int, int]:
+		"""
+		Returns the number of the most recently written record (-1 if there's none) and the total amount of records
+		written so far
+		"""
+		return Writer.STATUS_STRUCT.unpack_from(self._mmap, Writer.STATUS_OFFSET)
+
+	def _get_gen(self) -> int:
+		return Writer.GEN_STRUCT.unpack_from(self._mmap, Writer.GEN_OFFSET)[0]
+
+	def read_last_parts(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Returns the most recent records as two views over the file, without copying them. Concatenating the first
+		view and the second one gives the records in chronological order.
+		count: Max number of records to return. If fewer records have been written, all of them are returned.
+		"""
+		head, seq = self.get_status()
+		count = min(count, seq, self.capacity)
+		start = head + 1 - count
+		if start >= 0:
+			return self.records[start:head + 1], self.records[0:0]
+		else:
+			return self.records[start + self.capacity:], self.records[:head + 1]
+
+	def read_last(self, count: int) -> np.ndarray:
+		"""
+		Returns the most recent records in chronological order.
+		If they are stored contiguously in the file, a view over the file is returned without copying them. Otherwise,
+		they are copied into a new array.
+		count: Max number of records to return. If fewer records have been written, all of them are returned.
+		"""
+		older, newer = self.read_last_parts(count)
+		if len(newer) == 0:
+			return older
+		return np.concatenate((older, newer))
+
+	def read_last_snapshot(self, count: int) -> Tuple[np.ndarray, bool]:
+		"""
+		Copies the most recent records in chronological order, making sure the writer didn't modify the buffer while
+		they were being copied. No locks are used: if the writer modifies the buffer during the copy, the copy is
+		retried.
+		count: Max number of records to return. If fewer records have been written, all of them are returned.
+		return: Copy of the records and true if the writer has flagged the end of the execution
+		"""
+		attempts = 0
+		while True:
+			gen = self._get_gen()
+			if gen % 2 == 0:
+				older, newer = self.read_last_parts(count)
+				records = np.concatenate((older, newer))
+				over = self.is_over()
+				if self._get_gen() == gen:
+					return records, over
+			attempts += 1
+			if attempts % SNAPSHOT_SPIN_ATTEMPTS == 0:
+				# The writer is being slow, stop spinning for a while
+				time.sleep(SNAPSHOT_RETRY_DELAY)
+
+	def close(self):
+		"""
+		Unmaps and closes the file. Views returned by this reader must not be used after calling this method.
+		"""
+		self.records = None
+		try:
+			self._mmap.close()
+		except BufferError:
+			# Some views are still referenced. The file will be unmapped once they are garbage collected.
+			pass
+		self._file.close()
+
+
+def read_last(file_path: str, count: int) -> np.ndarray:
+	"""
+	Reads the most recent records of a buffer file in chronological order, copying them so the file can be closed.
+	"""
+	reader = BinaryBufferReader(file_path)
+	try:
+		return reader.read_last_snapshot(count)[0]
+	finally:
+		reader.close()
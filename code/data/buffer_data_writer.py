@@ -1,78 +1,190 @@
+import mmap
+import os
 import time
+from typing import BinaryIO, List, Tuple
 
 from data.data_writer import DataWriter
-from defs.utils import log
+from defs.exceptions import IllegalOperationError
 
 
 class BufferDataWriter(DataWriter):
 	"""
 	Class that can be used to write power and attacks data to a file while treating it as a cyclic buffer.
 	Older data will be overwritten with newer data on each write.
+
+	Every line in the file has a fixed width, so each write only has to overwrite a single entry in place. The file
+	is memory-mapped, so writes don't require any system calls and their cost doesn't depend on the size of the
+	buffer.
+	File layout:
+		Line 1: Number of the most recently written entry (with the first entry being #0, or -1 if no entries have
+		been written yet), total amount of entries written so far and generation counter, separated by commas.
+		Line 2: CSV header
+		Lines 3+: One line per buffer entry. All entries are allocated when the file is created. Entries that haven't
+		been written yet are filled with spaces.
+	Numeric values are padded with leading zeros to fill their column. Empty values are filled with spaces.
+
+	Writes follow a seqlock protocol, so readers can get a consistent snapshot without any locks: the generation
+	counter is incremented before modifying the file (making it odd) and again once the modification is complete
+	(making it even). A reader reads the whole file, then reads the first line again. If the counter was odd or it
+	changed, the read might be torn and must be retried (see data.buffer_reader).
+	The file is created under a temporary name and then renamed, so readers never see a partially initialized file.
 	"""
 
+	# Width of each value in the file, in characters
+	HEAD_WIDTH = 10
+	SEQ_WIDTH = 20
+	GEN_WIDTH = 20
+	TIME_WIDTH = 13
+	ATTACKS_WIDTH = 10
+	POWER_WIDTH = 24
+
 	file_path: str
 	attack_column: bool
 	buffer_size: int
 
+	_file: BinaryIO
+	_mmap: "mmap.mmap | None"
+	# Length of the first line and of each entry, including the line break
+	_status_width: int
+	_entry_width: int
+	# Position of the first entry in the file
+	_entries_offset: int
+	# Number of the most recently written entry
+	_head: int
+	# Total amount of entries written
+	_seq: int
+	# Generation counter. Odd while the file is being modified.
+	_gen: int
+
 	def __init__(self, file_path: str, attack_column: bool, buffer_size: int):
 		"""
-		Instantiates the class to write to the specified file.
+		Instantiates the class to write to the specified file. If the file already exists, it will be truncated.
+		The file will remain open until close() is called.
 		buffer_size: Size of the buffer file. Once it fills, older entries will start getting replaced.
 		"""
 		self.file_path = file_path
 		self.attack_column = attack_column
 		self.buffer_size = buffer_size
+		self._head = -1
+		self._seq = 0
+		self._gen = 0
 
-		file = open(self.file_path, "w")
-		# The first line contains the number of the most recently written entry, with the first entry being #0.
-		# We write -1 to indicate that no entries are present in the buffer yet.
-		file.write("-1" + "\n")
-		self._write_header(file)
-		file.close()
+		self._entry_width = self._get_entry_width()
+		status_line = self._get_status_line()
+		self._status_width = len(status_line)
 
-	def write(self, power: float, attacks: int = -1, timestamp: float = -1):
+		# newline="" prevents line breaks from being translated, which would change the width of each line
+		tmp_path = self.file_path + ".tmp"
+		with open(tmp_path, "w", newline="") as file:
+			file.write(status_line.decode())
+			# The second line contains the CSV header
+			self._write_header(file)
+			self._entries_offset = file.tell()
+			file.write((" " * (self._entry_width - 1) + "\n") * buffer_size)
+		os.replace(tmp_path, self.file_path)
+
+		self._file = open(self.file_path, "r+b")
+		self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
 		"""
-		Updates the output buffer, writing the current power usage into a new entry. If the buffer is full, the oldest
-		entry will be overwritten.
-		The first line in the buffer file, which indicates which buffer entry was most recently overwritten, will be
-		updated accordingly. The second line in the file, the CSV header, will remain untouched.
+		Overwrites the oldest entry in the buffer with the current power usage, then updates the first line of the
+		file to point to it. If close() has already been called, throws IllegalOperationError.
 		See DataWriter.write for the description of the base method.
 		"""
-		file = open(self.file_path, "r+")
-		# Since the buffer is small, we just read the whole file and manipulate it in memory, since it's easier
-		lines = file.read().split("\n")
-		if lines[-1] == "":
-			lines.pop(-1)
-		# Read the most recent entry value first
-		most_recent_entry = int(lines[0])
+		if self._mmap is None:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
 
 		if timestamp == -1:
 			timestamp = int(time.time() * 1000)
 
-		string_to_write = self._get_csv_line(power, timestamp, attacks)
-		# Check if we need to append or overwrite the new entry
-		entry_to_replace = (most_recent_entry + 1) % self.buffer_size
-		last_entry = len(lines) - 3
-		if entry_to_replace <= last_entry:
-			# Replace the entry
-			lines[entry_to_replace + 2] = string_to_write
-			lines[0] = str(entry_to_replace)
-		elif entry_to_replace == last_entry + 1:
-			# Add new line
-			lines.append(string_to_write)
-			lines[0] = str(entry_to_replace)
-		else:
-			log("Error: Output buffer in inconsistent state: Most recent entry is #" + str(most_recent_entry) + ", but "
-				"the last entry in the file is #" + str(last_entry) + ". Buffer will be truncated.")
-			# Keep only the header lines and write a new entry as the first entry
-			lines = lines[0:2]
-			lines.append(string_to_write)
-			lines[0] = "0"
-
-		file.seek(0)
-		file.truncate()
-		file.write("\n".join(lines))
-		file.close()
+		self._begin_update()
+		self._write_entry(power, timestamp, attacks)
+		self._end_update()
+
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Writes several entries, updating the first line of the file only once at the end.
+		See DataWriter.write_batch for the description of the base method.
+		"""
+		if self._mmap is None:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		self._begin_update()
+		for power, attacks, timestamp in rows:
+			self._write_entry(power, timestamp, attacks)
+		self._end_update()
+
+	def close(self):
+		"""
+		Unmaps and closes the file that was opened when instantiating the class. Attempting to call write() after
+		calling this method will throw an exception.
+		"""
+		if self._mmap is not None:
+			self._mmap.close()
+			self._mmap = None
+		self._file.close()
 
 	def _has_attack_column(self):
 		return self.attack_column
+
+	def _begin_update(self):
+		self._gen += 1
+		self._mmap[0:self._status_width] = self._get_status_line()
+
+	def _end_update(self):
+		self._gen += 1
+		self._mmap[0:self._status_width] = self._get_status_line()
+
+	def _write_entry(self, power: "float | None", timestamp: float, attacks: int):
+		"""
+		Overwrites the entry that comes after the most recently written one
+		"""
+		self._write_line(self._get_entry(power, timestamp, attacks))
+
+	def _write_line(self, line: bytes):
+		"""
+		Overwrites the entry that comes after the most recently written one with an already formatted line. Must be
+		called between _begin_update() and _end_update().
+		"""
+		self._head = (self._head + 1) % self.buffer_size
+		self._seq += 1
+		offset = self._entries_offset + self._head * self._entry_width
+		self._mmap[offset:offset + self._entry_width] = line
+
+	def _get_entry_width(self) -> int:
+		"""
+		Returns the length of each entry, including the line break
+		"""
+		width = self.TIME_WIDTH + self.POWER_WIDTH + 2
+		if self.attack_column:
+			width += self.ATTACKS_WIDTH + 1
+		return width
+
+	def _get_status_line(self) -> bytes:
+		return (str(self._head).zfill(self.HEAD_WIDTH) + "," + str(self._seq).zfill(self.SEQ_WIDTH) + "," +
+			str(self._gen).zfill(self.GEN_WIDTH) + "\n").encode()
+
+	def _get_entry(self, power: "float | None", timestamp: float, attacks: int) -> bytes:
+		"""
+		Returns the fixed-width line that represents an entry in the file
+		"""
+		values = [self._pad(None if timestamp == -1 else timestamp, self.TIME_WIDTH)]
+		if self.attack_column:
+			values.append(self._pad(None if attacks == -1 else attacks, self.ATTACKS_WIDTH))
+		values.append(self._pad(power, self.POWER_WIDTH))
+		return (",".join(values) + "\n").encode()
+
+	@staticmethod
+	def _pad(value: "float | None", width: int) -> str:
+		"""
+		Converts a value to a string of the given width, adding leading zeros. None is converted to spaces.
+		If the value doesn't fit, throws ValueError.
+		"""
+		if value is None:
+			return " " * width
+		string = str(value).zfill(width)
+		if len(string) > width:
+			raise ValueError("Value " + str(value) + " doesn't fit in a buffer column (max " + str(width) +
+				" characters)")
+		return string
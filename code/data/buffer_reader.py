@@ -0,0 +1,100 @@
+import time
+from typing import List, Tuple
+
+from defs.constants import Constants as Cst
+
+"""
+Functions used to read the CSV buffer files written by BufferDataWriter while they are being written by another
+process, without getting torn reads.
+"""
+
+# Amount of failed attempts to get a consistent snapshot after which the reader waits for SNAPSHOT_RETRY_DELAY
+# seconds before trying again
+SNAPSHOT_SPIN_ATTEMPTS = 100
+SNAPSHOT_RETRY_DELAY = 0.0001
+
+
+class BufferSnapshot:
+	"""
+	Consistent copy of the contents of a CSV buffer file
+	"""
+
+	# True if the file contains the end keyword, which means the execution that wrote it has ended. If true, the rest
+	# of the fields are empty.
+	over: bool
+	# Column names
+	header: List[str]
+	# Entries in chronological order. Each entry contains one value per column, with padding removed (empty values
+	# are empty strings).
+	entries: List[List[str]]
+	# Total amount of entries written to the file so far
+	seq: int
+
+	def __init__(self, over: bool, header: List[str], entries: List[List[str]], seq: int):
+		self.over = over
+		self.header = header
+		self.entries = entries
+		self.seq = seq
+
+
+def read_snapshot(file_path: str) -> BufferSnapshot:
+	"""
+	Reads a CSV buffer file, making sure the writer didn't modify it during the read. No locks are used: if the writer
+	modifies the file during the read, the read is retried.
+	"""
+	contents = read_consistent(file_path)
+	if contents is None:
+		return BufferSnapshot(True, [], [], 0)
+	data, status_end, head, seq = contents
+	return _parse(data[status_end:].decode(), head, seq)
+
+
+def read_consistent(file_path: str) -> "Tuple[bytes, int, int, int] | None":
+	"""
+	Reads the raw contents of a CSV buffer file, retrying the read until the writer didn't modify the file during it.
+	return: None if the file contains the end keyword. Otherwise, the contents of the file, the length of its first
+	line, the number of the most recently written entry and the total amount of entries written so far.
+	"""
+	attempts = 0
+	with open(file_path, "rb") as file:
+		while True:
+			file.seek(0)
+			data = file.read()
+			if data.strip() == Cst.BUFFER_OVER_KEYWORD.encode():
+				return None
+
+			status_end = data.index(b"\n") + 1
+			head, seq, gen = [int(v) for v in data[:status_end].split(b",")]
+			if gen % 2 == 0:
+				# Read the first line again to check that the generation counter hasn't changed
+				file.seek(0)
+				if file.read(status_end) == data[:status_end]:
+					return data, status_end, head, seq
+
+			attempts += 1
+			if attempts % SNAPSHOT_SPIN_ATTEMPTS == 0:
+				# The writer is being slow, stop spinning for a while
+				time.sleep(SNAPSHOT_RETRY_DELAY)
+
+
+def _parse(text: str, head: int, seq: int) -> BufferSnapshot:
+	"""
+	Parses the contents of a buffer file after the first line
+	head: Number of the most recently written entry
+	seq: Total amount of entries written
+	"""
+	lines = text.split("\n")
+	header = lines[0].split(",")
+	entry_lines = lines[1:]
+	if entry_lines[-1] == "":
+		entry_lines.pop(-1)
+	capacity = len(entry_lines)
+
+	count = min(seq, capacity)
+	start = head + 1 - count
+	if start >= 0:
+		ordered_lines = entry_lines[start:head + 1]
+	else:
+		ordered_lines = entry_lines[start + capacity:] + entry_lines[:head + 1]
+	entries = [[value.strip() for value in line.split(",")] for line in ordered_lines]
+	return BufferSnapshot(False, header, entries, seq)
@@ -0,0 +1,141 @@
+import math
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from data.data_writer import DataWriter
+from defs.constants import Constants as Cst
+from defs.exceptions import IllegalOperationError
+
+INDEX_FILE = "index.csv"
+INDEX_HEADER = "File,Entries,Time min,Time max"
+
+
+class ColumnarDataWriter(DataWriter):
+	"""
+	Class that can be used to write power and attacks data in columnar format, which is much smaller than CSV and can
+	be loaded without any parsing (see data.columnar_reader).
+	Entries are accumulated in typed arrays and written to a directory in chunks. Each chunk is an uncompressed NumPy
+	.npz file containing one array per column:
+		time (int64): UNIX timestamp in ms
+		attacks (uint32): Active attacks on the device. Not present if attack data is not being logged.
+		power (float32): Power usage of the device. NaN if the measurement couldn't be taken.
+	Chunks are listed in an index file (INDEX_FILE), which contains the number of entries and the min and max
+	timestamps of each chunk, so readers can skip chunks outside the time range they need.
+	Chunks are written under a temporary name and then renamed, and they are added to the index afterwards, so
+	readers never see incomplete chunks.
+	"""
+
+	dir_path: str
+	attack_column: bool
+	# Max number of entries in each chunk
+	chunk_size: int
+	# Max number of seconds an entry can be kept in memory before writing its chunk
+	chunk_interval: float
+
+	# Columns of the current chunk
+	_times: np.ndarray
+	_attacks: np.ndarray
+	_powers: np.ndarray
+	# Number of entries in the current chunk
+	_count: int
+	# Monotonic time at which the first entry of the current chunk was added
+	_chunk_since: float
+	# Number of chunks written so far
+	_num_chunks: int
+	_closed: bool
+
+	def __init__(self, dir_path: str, attack_column: bool, chunk_size: int = Cst.COLUMNAR_CHUNK_SIZE,
+		chunk_interval: float = Cst.COLUMNAR_CHUNK_INTERVAL):
+		"""
+		Instantiates the class to write to the specified directory, which will be created if it doesn't exist.
+		attack_column: True to include a column listing active attacks.
+		"""
+		self.dir_path = dir_path
+		self.attack_column = attack_column
+		self.chunk_size = chunk_size
+		self.chunk_interval = chunk_interval
+		self._times = np.zeros(chunk_size, np.int64)
+		self._attacks = np.zeros(chunk_size, np.uint32)
+		self._powers = np.zeros(chunk_size, np.float32)
+		self._count = 0
+		self._chunk_since = 0
+		self._num_chunks = 0
+		self._closed = False
+
+		os.makedirs(dir_path, exist_ok=True)
+		with open(os.path.join(dir_path, INDEX_FILE), "w") as index:
+			index.write(INDEX_HEADER + "\n")
+
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
+		"""
+		Adds an entry to the current chunk. The chunk is written once it's full or it has been waiting for too long.
+		If close() has already been called, throws IllegalOperationError.
+		See DataWriter.write for the description of the base method.
+		"""
+		if self._closed:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		if timestamp == -1:
+			timestamp = int(time.time() * 1000)
+
+		if self._count == 0:
+			self._chunk_since = time.monotonic()
+		self._times[self._count] = timestamp
+		self._attacks[self._count] = 0 if attacks == -1 else attacks
+		self._powers[self._count] = math.nan if power is None else power
+		self._count += 1
+		if self._count == self.chunk_size:
+			self.flush()
+
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Adds several entries at once, checking if the chunk is due only at the end.
+		See DataWriter.write_batch for the description of the base method.
+		"""
+		for power, attacks, timestamp in rows:
+			self.write(power, attacks, timestamp)
+		self.poll()
+
+	def poll(self):
+		"""
+		Writes the current chunk if its first entry has been waiting for too long
+		"""
+		if not self._closed and self._count > 0 and time.monotonic() - self._chunk_since >= self.chunk_interval:
+			self.flush()
+
+	def flush(self):
+		"""
+		Writes the entries in the current chunk to a new chunk file and adds it to the index
+		"""
+		if self._count == 0:
+			return
+
+		count = self._count
+		columns = {"time": self._times[:count], "power": self._powers[:count]}
+		if self.attack_column:
+			columns["attacks"] = self._attacks[:count]
+		file_name = "chunk-" + str(self._num_chunks).zfill(6) + ".npz"
+		tmp_path = os.path.join(self.dir_path, file_name + ".tmp")
+		with open(tmp_path, "wb") as file:
+			np.savez(file, **columns)
+		os.replace(tmp_path, os.path.join(self.dir_path, file_name))
+		with open(os.path.join(self.dir_path, INDEX_FILE), "a") as index:
+			index.write(file_name + "," + str(count) + "," + str(self._times[:count].min()) + "," +
+				str(self._times[:count].max()) + "\n")
+
+		self._num_chunks += 1
+		self._count = 0
+
+	def close(self):
+		"""
+		Writes the last chunk. Attempting to call write() after calling this method will throw an exception.
+		"""
+		if not self._closed:
+			self.flush()
+			self._closed = True
+
+	def _has_attack_column(self):
+		return self.attack_column
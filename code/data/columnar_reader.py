@@ -0,0 +1,72 @@
+import csv
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from data.columnar_data_writer import INDEX_FILE
+
+"""
+Functions used to load the data written by ColumnarDataWriter
+"""
+
+
+class ChunkInfo:
+	"""
+	Entry of the index of a columnar output directory
+	"""
+
+	file_name: str
+	entries: int
+	time_min: int
+	time_max: int
+
+	def __init__(self, file_name: str, entries: int, time_min: int, time_max: int):
+		self.file_name = file_name
+		self.entries = entries
+		self.time_min = time_min
+		self.time_max = time_max
+
+
+def read_index(dir_path: str) -> List[ChunkInfo]:
+	"""
+	Returns the list of chunks in a columnar output directory, in the order they were written
+	"""
+	chunks = []
+	with open(os.path.join(dir_path, INDEX_FILE), newline="") as index:
+		reader = csv.reader(index)
+		next(reader)
+		for row in reader:
+			if len(row) == 4:
+				chunks.append(ChunkInfo(row[0], int(row[1]), int(row[2]), int(row[3])))
+	return chunks
+
+
+def load(dir_path: str, time_start: int = None, time_end: int = None) -> Dict[str, np.ndarray]:
+	"""
+	Loads the data in a columnar output directory.
+	time_start, time_end: If specified, only entries with a timestamp in the range [time_start, time_end] are returned.
+	Chunks that don't overlap the range are not read.
+	return: Dict containing one array per column ("time", "power" and, if attacks were logged, "attacks")
+	"""
+	chunks = [c for c in read_index(dir_path) if (time_start is None or c.time_max >= time_start) and
+		(time_end is None or c.time_min <= time_end)]
+
+	parts = {}
+	for chunk in chunks:
+		with np.load(os.path.join(dir_path, chunk.file_name)) as data:
+			for name in data.files:
+				parts.setdefault(name, []).append(data[name])
+	if len(parts) == 0:
+		return {"time": np.zeros(0, np.int64), "power": np.zeros(0, np.float32)}
+
+	columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+	if time_start is not None or time_end is not None:
+		times = columns["time"]
+		mask = np.ones(len(times), bool)
+		if time_start is not None:
+			mask &= times >= time_start
+		if time_end is not None:
+			mask &= times <= time_end
+		columns = {name: values[mask] for name, values in columns.items()}
+	return columns
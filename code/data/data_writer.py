@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import TextIO
+from typing import List, TextIO, Tuple
 
 
 class DataWriter(ABC):
@@ -12,15 +12,44 @@ class DataWriter(ABC):
 	COLUMN_POWER = "Power"
 
 	@abstractmethod
-	def write(self, power: float, attacks: int = -1, timestamp: float = -1):
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
 		"""
 		Writes a new entry to the file.
-		power: Power usage of the device
+		power: Power usage of the device. None to leave the power column empty.
 		attacks: Active attacks on the device. If not specified, no attack data will be written.
 		timestamp: Timestamp to write to the file. If not specified, the current system time in ms will be written.
 		"""
 		...
 
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Writes several entries to the file at once.
+		rows: List of (power, attacks, timestamp) tuples. See write() for the meaning of each value.
+		"""
+		for power, attacks, timestamp in rows:
+			self.write(power, attacks, timestamp)
+
+	def write_gap(self, timestamp: float):
+		"""
+		Writes an entry with no power or attack data, used to mark a measurement that was scheduled but could not be
+		taken in time.
+		timestamp: Timestamp of the missing measurement
+		"""
+		self.write(None, -1, timestamp)
+
+	def poll(self):
+		"""
+		Called periodically, even if no new entries have been written, so the writer can perform time-based tasks
+		such as writing data it has kept in memory for too long.
+		"""
+		pass
+
+	def close(self):
+		"""
+		Releases any resources used by the writer. write() shouldn't be called after calling this method.
+		"""
+		pass
+
 	@abstractmethod
 	def _has_attack_column(self):
 		"""
@@ -38,11 +67,12 @@ class DataWriter(ABC):
 		else:
 			file.write(",".join([self.COLUMN_TIME, self.COLUMN_POWER]) + "\n")
 
-	def _get_csv_line(self, power: float, timestamp: float, attacks: int = -1) -> str:
+	def _get_csv_line(self, power: "float | None", timestamp: float, attacks: int = -1) -> str:
 		"""
 		Gets the text string that needs to be written to the output file
 		"""
+		power_str = "" if power is None else str(power)
 		if self._has_attack_column():
-			return str(timestamp) + "," + ("" if attacks == -1 else str(attacks)) + "," + str(power)
+			return str(timestamp) + "," + ("" if attacks == -1 else str(attacks)) + "," + power_str
 		else:
-			return str(timestamp) + "," + str(power)
+			return str(timestamp) + "," + power_str
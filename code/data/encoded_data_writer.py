@@ -0,0 +1,86 @@
+import time
+from typing import BinaryIO, List, Tuple
+
+from data.data_writer import DataWriter
+from data.timeseries_codec import TimeSeriesEncoder
+from defs.constants import Constants as Cst
+from defs.exceptions import IllegalOperationError
+
+
+class EncodedDataWriter(DataWriter):
+	"""
+	Class that can be used to write power and attacks data to a file encoded with the time-series codec (see
+	data.timeseries_codec), which takes a fraction of the space of a CSV file. The file can be decoded with
+	timeseries_codec.decode_file().
+	Entries are kept in memory until a full block can be encoded or the oldest one has been waiting for
+	flush_interval seconds.
+	"""
+
+	file: BinaryIO
+	file_path: str
+	attack_column: bool
+	# Max number of seconds an entry can be kept in memory before being written
+	flush_interval: float
+	encoder: TimeSeriesEncoder
+
+	# Monotonic time at which the oldest pending entry was added
+	_pending_since: float
+
+	def __init__(self, file_path: str, attack_column: bool, mantissa_bits: int = 0,
+		block_size: int = Cst.CODEC_BLOCK_SIZE, flush_interval: float = Cst.CODEC_FLUSH_INTERVAL):
+		"""
+		Instantiates the class to write to the specified file. If the file already exists, it will be truncated.
+		The file will remain open until close() is called.
+		attack_column: True to include the active attacks in the output file
+		mantissa_bits: If > 0, power values are rounded to this many mantissa bits (see TimeSeriesEncoder)
+		"""
+		self.file_path = file_path
+		self.attack_column = attack_column
+		self.flush_interval = flush_interval
+		self.file = open(file_path, "wb")
+		self.encoder = TimeSeriesEncoder(self.file, attack_column, block_size, mantissa_bits)
+		self._pending_since = 0
+
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
+		"""
+		Adds an entry to the output file. The entry might not be written until later (see the class description).
+		If close() has already been called, throws IllegalOperationError.
+		See DataWriter.write for the description of the base method.
+		"""
+		self.write_batch([(power, attacks, timestamp)])
+
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Adds several entries to the output file at once.
+		See DataWriter.write_batch for the description of the base method.
+		"""
+		if self.file.closed:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		for power, attacks, timestamp in rows:
+			if len(self.encoder) == 0:
+				self._pending_since = time.monotonic()
+			if timestamp == -1:
+				timestamp = int(time.time() * 1000)
+			self.encoder.add(power, attacks, timestamp)
+		self.poll()
+
+	def poll(self):
+		"""
+		Writes the pending entries if they have been waiting for too long
+		"""
+		if not self.file.closed and len(self.encoder) > 0 and \
+			time.monotonic() - self._pending_since >= self.flush_interval:
+			self.encoder.flush()
+
+	def close(self):
+		"""
+		Writes the pending entries and closes the file. Attempting to call write() after calling this method will
+		throw an exception.
+		"""
+		if not self.file.closed:
+			self.encoder.flush()
+			self.file.close()
+
+	def _has_attack_column(self):
+		return self.attack_column
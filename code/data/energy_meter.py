@@ -0,0 +1,68 @@
+from typing import Dict, List, Tuple
+
+from data.sample_consumer import SampleConsumer
+from defs.utils import log
+
+# Milliseconds in an hour, used to convert mW * ms to mWh
+_MS_PER_HOUR = 3600 * 1000
+
+
+class EnergyMeter(SampleConsumer):
+	"""
+	Keeps running totals of the energy used by each device, both overall and for each combination of active attacks.
+	Energy is integrated using the trapezoidal rule between consecutive samples of the same device. Intervals that
+	contain a gap (a measurement that couldn't be taken) are not counted.
+	Power values must be in mW.
+	"""
+
+	# Energy used by each device, in mWh, indexed by device number
+	device_energy: Dict[int, float]
+	# Energy used by each device while each attack bitmask was active, in mWh, indexed by (device, attacks)
+	attack_energy: Dict[Tuple[int, int], float]
+	# Time spent by each device with each attack bitmask active, in ms, indexed by (device, attacks)
+	attack_duration: Dict[Tuple[int, int], int]
+
+	# Last sample of each device, as a (timestamp, power, attacks) tuple. Power is None after a gap.
+	_last_samples: Dict[int, Tuple[int, "float | None", int]]
+
+	def __init__(self):
+		self.device_energy = {}
+		self.attack_energy = {}
+		self.attack_duration = {}
+		self._last_samples = {}
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		for timestamp, device_num, power, attacks in batch:
+			last = self._last_samples.get(device_num)
+			if last is not None and last[1] is not None and power is not None and timestamp > last[0]:
+				elapsed = timestamp - last[0]
+				energy = (last[1] + power) / 2 * elapsed / _MS_PER_HOUR
+				# The interval is attributed to the attacks that were active at its start
+				key = (device_num, last[2])
+				self.device_energy[device_num] = self.device_energy.get(device_num, 0) + energy
+				self.attack_energy[key] = self.attack_energy.get(key, 0) + energy
+				self.attack_duration[key] = self.attack_duration.get(key, 0) + elapsed
+			self._last_samples[device_num] = (timestamp, power, attacks)
+
+	def get_summary_lines(self) -> List[str]:
+		"""
+		Returns the energy totals as CSV lines, including the header. There's one line for each device and attack
+		bitmask combination. The attack column is empty if attack data was not available.
+		"""
+		lines = ["Device,Attacks,Duration (s),Energy (mWh),Average power (mW)"]
+		for device_num, attacks in sorted(self.attack_energy.keys()):
+			energy = self.attack_energy[(device_num, attacks)]
+			duration = self.attack_duration[(device_num, attacks)]
+			lines.append(str(device_num) + "," + ("" if attacks == -1 else str(attacks)) + "," +
+				str(duration / 1000) + "," + str(energy) + "," + str(energy * _MS_PER_HOUR / duration))
+		return lines
+
+	def write_summary(self, file_path: str):
+		"""
+		Writes the energy totals to a CSV file and logs the total energy used by each device
+		"""
+		with open(file_path, "w") as file:
+			file.write("\n".join(self.get_summary_lines()) + "\n")
+		for device_num in sorted(self.device_energy.keys()):
+			log("Device " + str(device_num) + ": " + "{:.3f}".format(self.device_energy[device_num]) + " mWh")
+		log("Energy summary written to " + file_path)
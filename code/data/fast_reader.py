@@ -0,0 +1,274 @@
+import io
+import os
+import re
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from data.buffer_reader import read_consistent
+from data.segment_compressor import Compression
+from defs.constants import Constants as Cst
+
+"""
+Fast readers for the CSV files written by this project (output files of each device, multiplexed outputs, CSV
+buffers and the attack log). Values are parsed into typed NumPy arrays in bulk instead of line by line.
+Time, device and attack columns are returned as int64 arrays, with -1 for empty values. The rest are returned as
+float64 arrays, with NaN for empty values (e.g. the power of a gap).
+All the readers stop at the end keyword (Cst.BUFFER_OVER_KEYWORD) and ignore a partially written line at the end.
+"""
+
+_END_PATTERN = re.compile("^" + Cst.BUFFER_OVER_KEYWORD + "\r?$", re.MULTILINE)
+
+
+class CsvData:
+	"""
+	Contents of a CSV file
+	"""
+
+	header: List[str]
+	# One array per column, indexed by column name
+	columns: Dict[str, np.ndarray]
+	# True if the end keyword was found
+	over: bool
+	# True if the file ended with a partially written line, which was ignored
+	truncated: bool
+
+	def __init__(self, header: List[str], columns: Dict[str, np.ndarray], over: bool, truncated: bool):
+		self.header = header
+		self.columns = columns
+		self.over = over
+		self.truncated = truncated
+
+
+class BufferData(CsvData):
+	"""
+	Contents of a CSV buffer file, with its entries in chronological order
+	"""
+
+	# Total amount of entries written to the buffer so far
+	seq: int
+
+	def __init__(self, header: List[str], columns: Dict[str, np.ndarray], over: bool, truncated: bool, seq: int):
+		super().__init__(header, columns, over, truncated)
+		self.seq = seq
+
+
+def is_int_column(name: str) -> bool:
+	"""
+	Returns true if the values of a column should be parsed as integers
+	"""
+	return name.startswith("Time") or name.startswith("Attack") or name == "Device"
+
+
+def parse_lines(text: str, header: List[str]) -> Dict[str, np.ndarray]:
+	"""
+	Parses complete CSV lines that only contain numbers or empty values
+	return: One array per column, indexed by column name
+	"""
+	if text.strip() == "":
+		return _get_empty_columns(header)
+	# Replace empty values so they can be parsed as numbers. Runs of empty values need two passes.
+	text = text.replace(",,", ",nan,").replace(",,", ",nan,").replace(",\n", ",nan\n")
+	values = np.loadtxt(io.StringIO(text), delimiter=",", dtype=np.float64, ndmin=2)
+	columns = {}
+	for i, name in enumerate(header):
+		if is_int_column(name):
+			columns[name] = np.where(np.isnan(values[:, i]), -1, values[:, i]).astype(np.int64)
+		else:
+			columns[name] = values[:, i].copy()
+	return columns
+
+
+class ChunkedLoader:
+	"""
+	Loads a CSV file in chunks of at most chunk_size characters, so files of any size can be processed with bounded
+	memory. Segments compressed with gzip or zstd (see SegmentCompressor) are decompressed as they are read.
+	Iterating over the loader returns the columns of each chunk. Once the iteration ends, over and truncated contain
+	the status of the file (see CsvData).
+	"""
+
+	file_path: str
+	chunk_size: int
+	# Column names. Empty until the first chunk has been read, or if the file only contains the end keyword.
+	header: List[str]
+	over: bool
+	truncated: bool
+
+	def __init__(self, file_path: str, chunk_size: int = Cst.READER_CHUNK_SIZE):
+		self.file_path = file_path
+		self.chunk_size = chunk_size
+		self.header = []
+		self.over = False
+		self.truncated = False
+
+	def __iter__(self) -> Iterator[Dict[str, np.ndarray]]:
+		self.over = False
+		self.truncated = False
+		with Compression.from_path(self.file_path).open_text(self.file_path) as file:
+			first_line = file.readline()
+			if first_line.strip() == Cst.BUFFER_OVER_KEYWORD:
+				self.over = True
+				return
+			self.header = first_line.strip().split(",")
+			leftover = ""
+			while True:
+				data = file.read(self.chunk_size)
+				if data == "":
+					break
+				text = leftover + data
+				end = text.rfind("\n") + 1
+				text, leftover = text[:end], text[end:]
+				match = _END_PATTERN.search(text)
+				if match is not None:
+					self.over = True
+					leftover = ""
+					text = text[:match.start()]
+				if text != "":
+					yield parse_lines(text, self.header)
+				if self.over:
+					return
+			if leftover.strip() == Cst.BUFFER_OVER_KEYWORD:
+				self.over = True
+			elif leftover != "":
+				self.truncated = True
+
+
+def load_csv(file_path: str, chunk_size: int = Cst.READER_CHUNK_SIZE) -> CsvData:
+	"""
+	Loads a whole CSV file. The file is parsed in chunks (see ChunkedLoader), so only the resulting arrays and a single
+	chunk of text are kept in memory.
+	"""
+	loader = ChunkedLoader(file_path, chunk_size)
+	parts = {}
+	for chunk in loader:
+		for name, values in chunk.items():
+			parts.setdefault(name, []).append(values)
+	if len(parts) == 0:
+		columns = _get_empty_columns(loader.header)
+	else:
+		columns = {name: np.concatenate(values) for name, values in parts.items()}
+	return CsvData(loader.header, columns, loader.over, loader.truncated)
+
+
+class CsvTailer:
+	"""
+	Reads the lines appended to a CSV file that is still being written (such as the output of a device in standard
+	mode) since the last read. Only the new bytes are read each time. A partially written line at the end is left for
+	the next read.
+	If the file shrinks (e.g. because it was replaced), it's read again from the start.
+	"""
+
+	file_path: str
+	# Position of the file up to which lines have been read
+	offset: int
+	# Column names. Empty until the header has been read.
+	header: List[str]
+	# True if the end keyword has been found. No more lines will be read.
+	over: bool
+	# True if the last read found a partially written line at the end
+	truncated: bool
+
+	def __init__(self, file_path: str, offset: int = 0, header: List[str] = None):
+		"""
+		offset, header: If specified, the tailer will continue reading from the given position of the file, whose
+		header must be specified as well. This allows resuming a previous tailer.
+		"""
+		if offset > 0 and header is None:
+			raise ValueError("The header must be specified when starting at an offset")
+		self.file_path = file_path
+		self.offset = offset
+		self.header = [] if header is None else header
+		self.over = False
+		self.truncated = False
+
+	def read(self, max_bytes: int = Cst.READER_CHUNK_SIZE) -> "Dict[str, np.ndarray] | None":
+		"""
+		Reads the complete lines appended to the file since the last read, up to max_bytes bytes. If more bytes are
+		available, they will be returned by the next read.
+		return: One array per column, indexed by column name, which are empty if there are no new lines. None if the
+		file doesn't exist or its header hasn't been written yet.
+		"""
+		try:
+			size = os.path.getsize(self.file_path)
+		except FileNotFoundError:
+			return None
+		if size < self.offset:
+			self.offset = 0
+			self.header = []
+			self.over = False
+		if self.over:
+			return _get_empty_columns(self.header)
+
+		with open(self.file_path, "rb") as file:
+			file.seek(self.offset)
+			data = file.read(max_bytes)
+		end = data.rfind(b"\n") + 1
+		self.truncated = end < len(data)
+		text = data[:end].decode()
+		self.offset += end
+
+		if len(self.header) == 0:
+			header_end = text.find("\n") + 1
+			if header_end == 0:
+				return None
+			first_line = text[:header_end].strip()
+			if first_line == Cst.BUFFER_OVER_KEYWORD:
+				self.over = True
+				return {}
+			self.header = first_line.split(",")
+			text = text[header_end:]
+		match = _END_PATTERN.search(text)
+		if match is not None:
+			self.over = True
+			text = text[:match.start()]
+		return parse_lines(text, self.header)
+
+
+def read_buffer(file_path: str) -> BufferData:
+	"""
+	Reads a CSV buffer file written by BufferDataWriter or MultiplexedDataWriter, returning its entries in
+	chronological order. The read is consistent even if the buffer is being written (see data.buffer_reader).
+	Since all entries have the same width, the buffer is reordered and each column is parsed with a single pass over
+	the file, without splitting it into lines.
+	"""
+	contents = read_consistent(file_path)
+	if contents is None:
+		return BufferData([], {}, True, False, 0)
+	data, status_end, head, seq = contents
+
+	header_end = data.index(b"\n", status_end) + 1
+	header = data[status_end:header_end].decode().strip().split(",")
+	entry_end = data.find(b"\n", header_end)
+	if entry_end == -1:
+		return BufferData(header, _get_empty_columns(header), False, header_end < len(data), seq)
+	entry_width = entry_end - header_end + 1
+	capacity = (len(data) - header_end) // entry_width
+	truncated = (len(data) - header_end) % entry_width != 0
+	count = min(seq, capacity)
+	if count == 0:
+		return BufferData(header, _get_empty_columns(header), False, truncated, seq)
+
+	entries = np.frombuffer(data, np.uint8, capacity * entry_width, header_end).reshape(capacity, entry_width)
+	order = (np.arange(count) + head + 1 - count) % capacity
+	entries = entries[order]
+
+	# Columns are separated by commas at the same position in every entry
+	commas = np.flatnonzero(entries[0] == ord(","))
+	starts = np.concatenate(([0], commas + 1))
+	ends = np.concatenate((commas, [entry_width - 1]))
+	columns = {}
+	for name, start, end in zip(header, starts.tolist(), ends.tolist()):
+		field = entries[:, start:end]
+		empty = (field == ord(" ")).all(axis=1)
+		values = np.ascontiguousarray(field).view("S" + str(end - start)).ravel()
+		if is_int_column(name):
+			values[empty] = b"-1"
+			columns[name] = values.astype(np.int64)
+		else:
+			values[empty] = b"nan"
+			columns[name] = values.astype(np.float64)
+	return BufferData(header, columns, False, truncated, seq)
+
+
+def _get_empty_columns(header: List[str]) -> Dict[str, np.ndarray]:
+	return {name: np.zeros(0, np.int64 if is_int_column(name) else np.float64) for name in header}
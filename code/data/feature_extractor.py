@@ -0,0 +1,199 @@
+import os
+import time
+from typing import Callable, Dict, List, TextIO, Tuple
+
+import numpy as np
+
+from data.sample_consumer import SampleConsumer
+from defs.constants import Constants as Cst
+
+# Receives the features of the windows completed in a batch of samples: timestamp of the last sample of each window,
+# device number, bitmask of the attacks active at any point of the window (-1 if attack data is not available) and a
+# 2D array with one row of features per window, in the order returned by get_feature_names().
+FeatureListener = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], None]
+
+
+def get_feature_names(spectral_bands: int) -> List[str]:
+	"""
+	Returns the name of each feature computed by FeatureExtractor, in the order they are output
+	"""
+	return ["Mean", "Std", "Min", "Max", "Slope"] + ["Spectral energy " + str(i + 1) for i in range(spectral_bands)]
+
+
+def compute_features(times: np.ndarray, power: np.ndarray, spectral_bands: int) -> np.ndarray:
+	"""
+	Computes the features of a set of windows at once.
+	times, power: 2D arrays with one window per row, in chronological order. Times must be in milliseconds.
+	spectral_bands: Number of equally wide frequency bands the spectrum of each window is split into.
+	return: 2D array with one row per window, with the features listed by get_feature_names(). Slope is the slope of
+	the least squares line fitted to the window, in power units per second. Spectral energy is the energy of the
+	window (after removing its mean) contained in each band, from lowest to highest frequency. Bands add up to the
+	variance of the window.
+	"""
+	size = power.shape[1]
+	mean = power.mean(axis=1)
+	centered = power - mean[:, np.newaxis]
+	seconds = (times - times[:, :1]) / 1000
+	seconds -= seconds.mean(axis=1)[:, np.newaxis]
+	time_var = (seconds ** 2).sum(axis=1)
+	slope = np.divide((seconds * centered).sum(axis=1), time_var, out=np.zeros(len(power)), where=time_var > 0)
+
+	# One-sided power spectrum, scaled so it adds up to the variance (Parseval's theorem)
+	spectrum = np.abs(np.fft.rfft(centered, axis=1)) ** 2 * 2 / size ** 2
+	if size % 2 == 0:
+		# The Nyquist bin has no negative frequency counterpart
+		spectrum[:, -1] /= 2
+	bands = [band.sum(axis=1) for band in np.array_split(spectrum[:, 1:], spectral_bands, axis=1)]
+
+	return np.column_stack([mean, np.sqrt((centered ** 2).mean(axis=1)), power.min(axis=1), power.max(axis=1),
+		slope] + bands)
+
+
+class FeatureExtractor(SampleConsumer):
+	"""
+	Computes rolling-window features of the power usage of each device as samples are read, so detectors don't need to
+	parse the raw output files.
+	Each device has a sliding window with the last window_size samples, stored in fixed NumPy buffers. Every
+	hop_size samples, once the window is full, the features of the window are computed (see compute_features()).
+	All the windows completed in the same batch of samples are computed at once.
+	Gaps (measurements that couldn't be taken) are skipped, so windows always contain window_size actual samples.
+	Results can be written to a CSV file and/or passed to listeners registered with add_listener().
+	"""
+
+	window_size: int
+	hop_size: int
+	spectral_bands: int
+	file: "TextIO | None"
+	fsync_interval: float
+
+	_windows: Dict[int, "_DeviceWindow"]
+	_listeners: List[FeatureListener]
+	_last_fsync: float
+	_unsynced: bool
+
+	def __init__(self, window_size: int = Cst.FEATURE_WINDOW_SIZE, hop_size: int = Cst.FEATURE_HOP_SIZE,
+		spectral_bands: int = Cst.FEATURE_SPECTRAL_BANDS, file_path: str = None,
+		fsync_interval: float = Cst.FILE_FSYNC_INTERVAL):
+		"""
+		window_size: Number of samples in each window. Must be at least twice the number of spectral bands.
+		hop_size: Number of samples between consecutive windows of the same device
+		spectral_bands: Number of frequency bands whose energy is computed
+		file_path: If specified, the features of each window will be written to this CSV file, which will be truncated
+		if it already exists.
+		fsync_interval: Seconds between syncs of the output file to disk
+		"""
+		if window_size < 2 * spectral_bands:
+			raise ValueError("The window size must be at least twice the number of spectral bands")
+		if hop_size <= 0:
+			raise ValueError("The hop size must be positive")
+		self.window_size = window_size
+		self.hop_size = hop_size
+		self.spectral_bands = spectral_bands
+		self.fsync_interval = fsync_interval
+		self._windows = {}
+		self._listeners = []
+		self._last_fsync = time.monotonic()
+		self._unsynced = False
+		if file_path is None:
+			self.file = None
+		else:
+			self.file = open(file_path, "w")
+			self.file.write(",".join(["Time", "Device", "Attacks"] + get_feature_names(spectral_bands)) + "\n")
+			self.file.flush()
+
+	def add_listener(self, listener: FeatureListener):
+		"""
+		Registers a function that will be called with the features of every completed window. Listeners are called from
+		the WriterThread, so they should return quickly.
+		"""
+		self._listeners.append(listener)
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		completed = []
+		for timestamp, device_num, power, attacks in batch:
+			if power is None:
+				continue
+			window = self._windows.get(device_num)
+			if window is None:
+				window = _DeviceWindow(self.window_size)
+				self._windows[device_num] = window
+			if window.add(timestamp, power, attacks, self.hop_size):
+				completed.append((device_num, window.get_ordered()))
+		if len(completed) > 0:
+			self._emit(completed)
+
+	def poll(self):
+		if self._unsynced and 0 < self.fsync_interval <= time.monotonic() - self._last_fsync:
+			os.fsync(self.file.fileno())
+			self._last_fsync = time.monotonic()
+			self._unsynced = False
+
+	def close(self):
+		if self.file is not None and not self.file.closed:
+			if self._unsynced:
+				os.fsync(self.file.fileno())
+			self.file.close()
+
+	def _emit(self, completed: List[Tuple[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]]):
+		device_nums = np.array([device_num for device_num, _ in completed], np.int32)
+		times = np.stack([window[0] for _, window in completed])
+		features = compute_features(times, np.stack([window[1] for _, window in completed]), self.spectral_bands)
+		timestamps = times[:, -1]
+		# OR of the attacks of every sample of the window. Stays -1 if attack data is not available.
+		attacks = np.bitwise_or.reduce(np.stack([window[2] for _, window in completed]), axis=1)
+
+		if self.file is not None:
+			self.file.writelines([str(t) + "," + str(d) + "," + ("" if a == -1 else str(a)) + "," +
+				",".join([str(f) for f in row]) + "\n" for t, d, a, row in
+				zip(timestamps.tolist(), device_nums.tolist(), attacks.tolist(), features.tolist())])
+			self.file.flush()
+			self._unsynced = True
+		for listener in self._listeners:
+			listener(timestamps, device_nums, attacks, features)
+
+
+class _DeviceWindow:
+	"""
+	Sliding window with the last samples of a device, stored in circular NumPy buffers
+	"""
+
+	times: np.ndarray
+	power: np.ndarray
+	attacks: np.ndarray
+	# Position where the next sample will be written
+	pos: int
+	# Number of samples in the window
+	count: int
+	# Number of samples added since the last completed window
+	since_hop: int
+
+	def __init__(self, size: int):
+		self.times = np.zeros(size, np.int64)
+		self.power = np.zeros(size, np.float64)
+		self.attacks = np.zeros(size, np.int64)
+		self.pos = 0
+		self.count = 0
+		self.since_hop = 0
+
+	def add(self, timestamp: int, power: float, attacks: int, hop_size: int) -> bool:
+		"""
+		Adds a sample to the window, replacing the oldest one if it's full
+		return: True if a new window has been completed
+		"""
+		self.times[self.pos] = timestamp
+		self.power[self.pos] = power
+		self.attacks[self.pos] = attacks
+		self.pos = (self.pos + 1) % len(self.power)
+		self.count = min(self.count + 1, len(self.power))
+		self.since_hop += 1
+		if self.count == len(self.power) and self.since_hop >= hop_size:
+			self.since_hop = 0
+			return True
+		return False
+
+	def get_ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+		"""
+		Returns a copy of the times, power and attacks of the window, from oldest to newest
+		"""
+		order = np.roll(np.arange(len(self.power)), -self.pos)
+		return self.times[order], self.power[order], self.attacks[order]
@@ -0,0 +1,224 @@
+import csv
+import os
+import time
+from typing import Dict, List, TextIO, Tuple
+
+from data.buffer_data_writer import BufferDataWriter
+from data.buffer_reader import BufferSnapshot
+from data.data_writer import DataWriter
+from data.sample_consumer import SampleConsumer
+from defs.constants import Constants as Cst
+
+# Power and attacks of each device in a tick, in the order the devices were specified
+TickValues = List[Tuple["float | None", int]]
+
+
+class MultiplexedDataWriter(SampleConsumer):
+	"""
+	Writes the samples of all the devices to a single output, with one record per tick: the timestamp of the tick,
+	followed by the attacks and power columns of each device ("Attacks <n>" and "Power <n>", where <n> is the device
+	number). This keeps the channels aligned and requires a single write per batch of ticks, regardless of the
+	number of devices.
+	The output can be a regular CSV file or a cyclic buffer with the same layout as the ones written by
+	BufferDataWriter, so it can be read with data.buffer_reader.
+	Consumers that expect the output of a single device can use demux_snapshot() or demux_file().
+	"""
+
+	device_nums: List[int]
+	attack_column: bool
+	output: "_MultiplexedFile | _MultiplexedBuffer"
+
+	# Timestamp and values of the tick currently being assembled
+	_tick_time: int
+	_tick_values: Dict[int, Tuple["float | None", int]]
+
+	def __init__(self, file_path: str, device_nums: List[int], attack_column: bool, buffer_size: int = 0):
+		"""
+		Instantiates the class to write to the specified file. If the file already exists, it will be truncated.
+		device_nums: Number of each device, in the order their columns will be written
+		attack_column: True to include a column listing the active attacks of each device
+		buffer_size: If > 0, the output will be a cyclic buffer with this amount of entries.
+		"""
+		self.device_nums = device_nums
+		self.attack_column = attack_column
+		if buffer_size > 0:
+			self.output = _MultiplexedBuffer(file_path, device_nums, attack_column, buffer_size)
+		else:
+			self.output = _MultiplexedFile(file_path, device_nums, attack_column)
+		self._tick_time = -1
+		self._tick_values = {}
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		"""
+		Groups the samples by tick and writes all the completed ticks at once. A tick is complete once all the devices
+		have been received or a sample from the next tick arrives. Devices missing from a tick (e.g. because their
+		sample was dropped) are written as empty values.
+		"""
+		ticks = []
+		for timestamp, device_num, power, attacks in batch:
+			if len(self._tick_values) > 0 and timestamp != self._tick_time:
+				ticks.append(self._pop_tick())
+			self._tick_time = timestamp
+			self._tick_values[device_num] = (power, attacks)
+			if len(self._tick_values) == len(self.device_nums):
+				ticks.append(self._pop_tick())
+		if len(ticks) > 0:
+			self.output.write_ticks(ticks)
+
+	def poll(self):
+		self.output.poll()
+
+	def close(self):
+		"""
+		Writes the last tick, even if it's incomplete, and closes the output
+		"""
+		if len(self._tick_values) > 0:
+			self.output.write_ticks([self._pop_tick()])
+		self.output.close()
+
+	def _pop_tick(self) -> Tuple[int, TickValues]:
+		values = [self._tick_values.get(device_num, (None, -1)) for device_num in self.device_nums]
+		self._tick_values = {}
+		return self._tick_time, values
+
+
+class _MultiplexedFile:
+	"""
+	Regular CSV output of a MultiplexedDataWriter. Each batch of ticks is written with a single call, and the file is
+	synced to disk every fsync_interval seconds.
+	"""
+
+	file: TextIO
+	attack_column: bool
+	fsync_interval: float
+
+	_last_fsync: float
+	_unsynced: bool
+
+	def __init__(self, file_path: str, device_nums: List[int], attack_column: bool,
+		fsync_interval: float = Cst.FILE_FSYNC_INTERVAL):
+		self.attack_column = attack_column
+		self.fsync_interval = fsync_interval
+		self.file = open(file_path, "w")
+		self.file.write(",".join(get_multiplexed_header(device_nums, attack_column)) + "\n")
+		self.file.flush()
+		self._last_fsync = time.monotonic()
+		self._unsynced = False
+
+	def write_ticks(self, ticks: List[Tuple[int, TickValues]]):
+		self.file.writelines([self._get_line(timestamp, values) for timestamp, values in ticks])
+		self.file.flush()
+		self._unsynced = True
+
+	def poll(self):
+		if self._unsynced and 0 < self.fsync_interval <= time.monotonic() - self._last_fsync:
+			os.fsync(self.file.fileno())
+			self._last_fsync = time.monotonic()
+			self._unsynced = False
+
+	def close(self):
+		if not self.file.closed:
+			if self._unsynced:
+				os.fsync(self.file.fileno())
+			self.file.close()
+
+	def _get_line(self, timestamp: int, values: TickValues) -> str:
+		fields = [str(timestamp)]
+		for power, attacks in values:
+			if self.attack_column:
+				fields.append("" if attacks == -1 else str(attacks))
+			fields.append("" if power is None else str(power))
+		return ",".join(fields) + "\n"
+
+
+class _MultiplexedBuffer(BufferDataWriter):
+	"""
+	Cyclic buffer output of a MultiplexedDataWriter. Each entry contains a whole tick.
+	"""
+
+	device_nums: List[int]
+
+	def __init__(self, file_path: str, device_nums: List[int], attack_column: bool, buffer_size: int):
+		self.device_nums = device_nums
+		super().__init__(file_path, attack_column, buffer_size)
+
+	def write_ticks(self, ticks: List[Tuple[int, TickValues]]):
+		self._begin_update()
+		for timestamp, values in ticks:
+			self._write_line(self._get_tick_entry(timestamp, values))
+		self._end_update()
+
+	def _get_entry_width(self) -> int:
+		device_width = self.POWER_WIDTH + 1
+		if self.attack_column:
+			device_width += self.ATTACKS_WIDTH + 1
+		return self.TIME_WIDTH + device_width * len(self.device_nums) + 1
+
+	def _write_header(self, file: TextIO):
+		file.write(",".join(get_multiplexed_header(self.device_nums, self.attack_column)) + "\n")
+
+	def _get_tick_entry(self, timestamp: int, values: TickValues) -> bytes:
+		fields = [self._pad(timestamp, self.TIME_WIDTH)]
+		for power, attacks in values:
+			if self.attack_column:
+				fields.append(self._pad(None if attacks == -1 else attacks, self.ATTACKS_WIDTH))
+			fields.append(self._pad(power, self.POWER_WIDTH))
+		return (",".join(fields) + "\n").encode()
+
+
+def get_multiplexed_header(device_nums: List[int], attack_column: bool) -> List[str]:
+	"""
+	Returns the column names of a multiplexed output
+	"""
+	header = [DataWriter.COLUMN_TIME]
+	for device_num in device_nums:
+		if attack_column:
+			header.append(DataWriter.COLUMN_ATTACKS + " " + str(device_num))
+		header.append(DataWriter.COLUMN_POWER + " " + str(device_num))
+	return header
+
+
+def get_channel_columns(header: List[str], device_num: int) -> List[int]:
+	"""
+	Given the header of a multiplexed output, returns the position of the columns that make up the output of a single
+	device (time, attacks if present and power), in the same order used for single-device files.
+	If the output doesn't contain the device, throws ValueError.
+	"""
+	columns = [header.index(DataWriter.COLUMN_TIME)]
+	attacks_name = DataWriter.COLUMN_ATTACKS + " " + str(device_num)
+	if attacks_name in header:
+		columns.append(header.index(attacks_name))
+	columns.append(header.index(DataWriter.COLUMN_POWER + " " + str(device_num)))
+	return columns
+
+
+def demux_snapshot(snapshot: BufferSnapshot, device_num: int) -> BufferSnapshot:
+	"""
+	Given a snapshot of a multiplexed buffer, returns a view that only contains the columns of a single device, with
+	the same header used for single-device buffers.
+	"""
+	if snapshot.over:
+		return snapshot
+	columns = get_channel_columns(snapshot.header, device_num)
+	header = [DataWriter.COLUMN_TIME, DataWriter.COLUMN_POWER]
+	if len(columns) == 3:
+		header.insert(1, DataWriter.COLUMN_ATTACKS)
+	return BufferSnapshot(False, header, [[entry[c] for c in columns] for entry in snapshot.entries], snapshot.seq)
+
+
+def demux_file(file_path: str, device_num: int, output_path: str):
+	"""
+	Writes the columns of a single device in a multiplexed CSV file to a separate file, with the same format used
+	by StandardDataWriter
+	"""
+	with open(file_path, newline="") as src, open(output_path, "w", newline="") as dst:
+		reader = csv.reader(src)
+		header = next(reader)
+		columns = get_channel_columns(header, device_num)
+		names = [DataWriter.COLUMN_TIME, DataWriter.COLUMN_POWER]
+		if len(columns) == 3:
+			names.insert(1, DataWriter.COLUMN_ATTACKS)
+		dst.write(",".join(names) + "\n")
+		for row in reader:
+			if len(row) == len(header):
+				dst.write(",".join([row[c] for c in columns]) + "\n")
@@ -0,0 +1,140 @@
+import glob
+from typing import Dict, Tuple
+
+import numpy as np
+
+from data.rollup_writer import HEADER_STRUCT, MAGIC, RECORD_DTYPE, VERSION
+
+"""
+Functions used to query the rollup files written by RollupWriter
+"""
+
+
+class RollupFormatError(Exception):
+	"""
+	Thrown when a file doesn't contain a valid rollup
+	"""
+	pass
+
+
+def load_rollup(file_path: str) -> Tuple[int, np.ndarray]:
+	"""
+	Loads a rollup file. A partially written record at the end of the file is ignored.
+	return: Size of the buckets of the rollup (in ms) and array with one RECORD_DTYPE record per bucket
+	"""
+	with open(file_path, "rb") as file:
+		resolution = _read_header(file.read(HEADER_STRUCT.size), file_path)
+		data = file.read()
+	num_records = len(data) // RECORD_DTYPE.itemsize
+	return resolution, np.frombuffer(data, RECORD_DTYPE, num_records)
+
+
+def find_rollups(base_path: str) -> Dict[int, str]:
+	"""
+	Returns the path of each rollup file of a run, indexed by resolution (in ms)
+	base_path: Path of the output of the device, without extension
+	"""
+	rollups = {}
+	for path in glob.glob(glob.escape(base_path) + "-rollup-*.bin"):
+		with open(path, "rb") as file:
+			rollups[_read_header(file.read(HEADER_STRUCT.size), path)] = path
+	return rollups
+
+
+def read_range(base_path: str, time_start: int, time_end: int, max_points: int) -> Tuple[int, np.ndarray]:
+	"""
+	Returns the buckets that overlap the range [time_start, time_end), using the finest resolution that returns at
+	most max_points buckets (or the coarsest one, if all of them return more). Only the chosen rollup is read.
+	return: Resolution of the buckets (in ms) and array of RECORD_DTYPE records
+	"""
+	rollups = find_rollups(base_path)
+	if len(rollups) == 0:
+		raise FileNotFoundError("No rollups found for " + base_path)
+	resolutions = sorted(rollups.keys())
+	chosen = resolutions[-1]
+	for resolution in resolutions:
+		if (time_end - time_start) / resolution <= max_points:
+			chosen = resolution
+			break
+	_, records = load_rollup(rollups[chosen])
+	return chosen, records[_get_overlapping(records, chosen, time_start, time_end)]
+
+
+def summarize(base_path: str, time_start: int, time_end: int) -> np.ndarray:
+	"""
+	Returns the aggregate of every sample in the range [time_start, time_end) as a single RECORD_DTYPE record, whose
+	time is time_start. Min and max are NaN if there are no samples in the range.
+	The inside of the range is covered with buckets of the coarsest resolution that fit in it, and the remaining
+	parts at the edges with finer ones. Buckets of the finest resolution that are only partially inside the range
+	are included, so the range is effectively rounded outwards to the finest resolution.
+	"""
+	rollups = find_rollups(base_path)
+	if len(rollups) == 0:
+		raise FileNotFoundError("No rollups found for " + base_path)
+	resolutions = sorted(rollups.keys(), reverse=True)
+	parts = []
+	# Parts of the range that haven't been covered yet
+	ranges = [(time_start, time_end)]
+	for i, resolution in enumerate(resolutions):
+		if len(ranges) == 0:
+			break
+		_, records = load_rollup(rollups[resolution])
+		remaining = []
+		for start, end in ranges:
+			if i == len(resolutions) - 1:
+				parts.append(records[_get_overlapping(records, resolution, start, end)])
+				continue
+			# Buckets fully inside the range
+			full_start = -(-start // resolution) * resolution
+			full_end = end // resolution * resolution
+			if full_start >= full_end:
+				remaining.append((start, end))
+				continue
+			parts.append(records[_get_overlapping(records, resolution, full_start, full_end)])
+			remaining.extend([r for r in [(start, full_start), (full_end, end)] if r[0] < r[1]])
+		ranges = remaining
+
+	return merge(np.concatenate(parts) if len(parts) > 0 else np.zeros(0, RECORD_DTYPE), time_start)
+
+
+def merge(records: np.ndarray, timestamp: int) -> np.ndarray:
+	"""
+	Aggregates a set of records into a single one with the specified time
+	"""
+	result = np.zeros(1, RECORD_DTYPE)[0]
+	result["time"] = timestamp
+	count = int(records["count"].sum())
+	result["count"] = count
+	if count == 0:
+		result["attacks"] = 0
+		result["min"] = result["max"] = result["mean"] = np.nan
+		return result
+	result["attacks"] = np.bitwise_or.reduce(records["attacks"])
+	result["min"] = records["min"].min()
+	result["max"] = records["max"].max()
+	result["mean"] = (records["mean"].astype(np.float64) * records["count"]).sum() / count
+	return result
+
+
+def _get_overlapping(records: np.ndarray, resolution: int, time_start: int, time_end: int) -> slice:
+	"""
+	Returns the slice of records whose bucket overlaps the range [time_start, time_end)
+	"""
+	first = np.searchsorted(records["time"], time_start - resolution, side="right")
+	last = np.searchsorted(records["time"], time_end, side="left")
+	return slice(int(first), int(last))
+
+
+def _read_header(data: bytes, file_path: str) -> int:
+	"""
+	Validates the header of a rollup file
+	return: Resolution of the rollup, in ms
+	"""
+	if len(data) < HEADER_STRUCT.size:
+		raise RollupFormatError(file_path + " is not a rollup file")
+	magic, version, resolution = HEADER_STRUCT.unpack(data)
+	if magic != MAGIC:
+		raise RollupFormatError(file_path + " is not a rollup file")
+	if version != VERSION:
+		raise RollupFormatError("Unsupported rollup version " + str(version) + " in " + file_path)
+	return resolution
@@ -0,0 +1,160 @@
+import struct
+import time
+from typing import BinaryIO, Dict, List, Tuple
+
+import numpy as np
+
+from data.sample_consumer import SampleConsumer
+from defs.constants import Constants as Cst
+
+"""
+Rollup files contain aggregates of the power usage of a device over fixed-size time buckets, so long time ranges can
+be plotted or scanned without reading every sample.
+
+File layout (all values are little-endian):
+	Header (HEADER_STRUCT): magic (MAGIC), version (uint16), resolution (uint32): size of each bucket, in ms
+	Records (RECORD_DTYPE), one per bucket that contains at least one sample, sorted by time. Buckets are aligned to
+	multiples of the resolution.
+Records are only appended, so readers must ignore a partially written record at the end.
+"""
+
+MAGIC = b"IOTPROLL"
+VERSION = 1
+HEADER_STRUCT = struct.Struct("<8sHxxI")
+# time: Start of the bucket. count: Number of samples in the bucket (gaps are not counted). attacks: Bitwise OR of
+# the attacks active on every sample of the bucket, -1 if attack data is not available.
+RECORD_DTYPE = np.dtype([("time", "<i8"), ("count", "<u4"), ("attacks", "<i4"), ("min", "<f4"), ("max", "<f4"),
+	("mean", "<f4")])
+
+
+def get_rollup_path(base_path: str, resolution: int) -> str:
+	"""
+	Returns the path of the rollup file of a run with the given resolution
+	base_path: Path of the output of the device, without extension
+	resolution: Size of each bucket, in ms
+	"""
+	if resolution % 60000 == 0:
+		name = str(resolution // 60000) + "min"
+	elif resolution % 1000 == 0:
+		name = str(resolution // 1000) + "s"
+	else:
+		name = str(resolution) + "ms"
+	return base_path + "-rollup-" + name + ".bin"
+
+
+class RollupWriter(SampleConsumer):
+	"""
+	Maintains rollup files at several resolutions for each device as samples are read (see the module description).
+	Every batch of samples is aggregated at once with NumPy. The bucket currently being filled is kept in memory, and
+	completed buckets are appended to their files every flush_interval seconds and once the execution ends.
+	"""
+
+	resolutions: List[int]
+	flush_interval: float
+
+	_files: Dict[Tuple[int, int], BinaryIO]
+	# Bucket currently being filled, as a record, indexed by (device, resolution)
+	_open: Dict[Tuple[int, int], np.ndarray]
+	# Completed buckets waiting to be written, indexed by (device, resolution)
+	_pending: Dict[Tuple[int, int], List[np.ndarray]]
+	_last_flush: float
+
+	def __init__(self, base_paths: Dict[int, str], resolutions: List[int] = Cst.ROLLUP_RESOLUTIONS,
+		flush_interval: float = Cst.ROLLUP_FLUSH_INTERVAL):
+		"""
+		Creates the rollup files of each device. Existing files will be truncated.
+		base_paths: Path of the output of each device without extension, indexed by device number. Rollup files are
+		created next to it (see get_rollup_path()).
+		resolutions: Size of the buckets of each rollup, in ms
+		flush_interval: Max number of seconds completed buckets are kept in memory before being written
+		"""
+		self.resolutions = resolutions
+		self.flush_interval = flush_interval
+		self._files = {}
+		self._open = {}
+		self._pending = {}
+		self._last_flush = time.monotonic()
+		for device_num, base_path in base_paths.items():
+			for resolution in resolutions:
+				file = open(get_rollup_path(base_path, resolution), "wb")
+				file.write(HEADER_STRUCT.pack(MAGIC, VERSION, resolution))
+				file.flush()
+				self._files[(device_num, resolution)] = file
+				self._pending[(device_num, resolution)] = []
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		samples = [sample for sample in batch if sample[2] is not None]
+		if len(samples) == 0:
+			return
+		times = np.array([sample[0] for sample in samples], np.int64)
+		devices = np.array([sample[1] for sample in samples], np.int32)
+		power = np.array([sample[2] for sample in samples], np.float64)
+		attacks = np.array([sample[3] for sample in samples], np.int32)
+		for device_num in np.unique(devices).tolist():
+			selected = devices == device_num
+			for resolution in self.resolutions:
+				if (device_num, resolution) in self._files:
+					self._aggregate(device_num, resolution, times[selected], power[selected], attacks[selected])
+
+	def poll(self):
+		if time.monotonic() - self._last_flush >= self.flush_interval:
+			self._flush()
+
+	def close(self):
+		"""
+		Writes all the buckets, including the ones that haven't been completed, and closes the files
+		"""
+		for key, record in self._open.items():
+			self._pending[key].append(record)
+		self._open = {}
+		self._flush()
+		for file in self._files.values():
+			file.close()
+
+	def _aggregate(self, device_num: int, resolution: int, times: np.ndarray, power: np.ndarray,
+		attacks: np.ndarray):
+		"""
+		Adds the samples of a device to its buckets of the given resolution
+		"""
+		buckets = times // resolution
+		# Position of the first sample of each bucket
+		firsts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+		records = np.zeros(len(firsts), RECORD_DTYPE)
+		records["time"] = buckets[firsts] * resolution
+		records["count"] = np.diff(np.append(firsts, len(times)))
+		records["attacks"] = np.bitwise_or.reduceat(attacks, firsts)
+		records["min"] = np.minimum.reduceat(power, firsts)
+		records["max"] = np.maximum.reduceat(power, firsts)
+		records["mean"] = np.add.reduceat(power, firsts) / records["count"]
+
+		key = (device_num, resolution)
+		current = self._open.get(key)
+		if current is not None:
+			if current["time"] == records[0]["time"]:
+				records[0] = _merge_records(current, records[0])
+			else:
+				self._pending[key].append(current)
+		self._pending[key].extend(records[:-1])
+		self._open[key] = records[-1].copy()
+
+	def _flush(self):
+		for key, records in self._pending.items():
+			if len(records) > 0:
+				self._files[key].write(np.array(records, RECORD_DTYPE).tobytes())
+				self._files[key].flush()
+				records.clear()
+		self._last_flush = time.monotonic()
+
+
+def _merge_records(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+	"""
+	Returns a record that aggregates two records of the same bucket
+	"""
+	result = a.copy()
+	count = int(a["count"]) + int(b["count"])
+	result["mean"] = (float(a["mean"]) * int(a["count"]) + float(b["mean"]) * int(b["count"])) / count
+	result["count"] = count
+	result["attacks"] = a["attacks"] | b["attacks"]
+	result["min"] = min(a["min"], b["min"])
+	result["max"] = max(a["max"], b["max"])
+	return result
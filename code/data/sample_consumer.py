@@ -0,0 +1,31 @@
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+
+class SampleConsumer(ABC):
+	"""
+	Base class for pipeline stages that receive every sample read by the main loop, in addition to the output files.
+	Consumers are run by the WriterThread, so they don't delay measurements.
+	"""
+
+	@abstractmethod
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		"""
+		Processes a batch of samples.
+		batch: List of (timestamp, device number, power, attacks) tuples, in the order they were read. Power is None
+		for measurements that couldn't be taken, and attacks is -1 if attack data is not available.
+		"""
+		...
+
+	def poll(self):
+		"""
+		Called periodically by the WriterThread, even if no new samples have been received, so the consumer can
+		perform time-based tasks
+		"""
+		pass
+
+	def close(self):
+		"""
+		Called once after the last batch has been consumed
+		"""
+		pass
@@ -0,0 +1,336 @@
+import math
+import os
+import socket
+import struct
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from data.sample_consumer import SampleConsumer
+from defs.constants import Constants as Cst
+
+"""
+Live feed of samples for other processes running on the same host. The publisher (run by the WriterThread of the
+main loop) copies every sample to a ring in shared memory, and subscribers read them from there without touching the
+disk or parsing anything.
+
+Shared memory layout (all values are little-endian):
+	Header (HEADER_SIZE bytes):
+		0  magic (8 bytes): MAGIC
+		8  version (uint16): VERSION
+		10 flags (uint16): Combination of FLAG_* values
+		12 record size (uint32): Size of each record, in bytes
+		16 capacity (uint64): Number of records in the ring
+		24 reserved (uint64): Number of records the publisher has started writing
+		32 seq (uint64): Number of records the publisher has finished writing
+		40 gen (uint64): Generation counter of the header (see below)
+	Records (capacity * record size bytes). Record #n is stored at position n % capacity. See RECORD_DTYPE.
+The publisher increases reserved before writing a batch of records and seq once they have been written. Records
+older than reserved - capacity might have been overwritten, so subscribers discard them if that happened while they
+were copying them. Header updates follow the same seqlock protocol as the buffer files (gen is odd while the header
+is being modified).
+
+Wakeups: each subscriber binds a UNIX datagram socket in the directory returned by get_wakeup_dir(). After publishing
+a batch, the publisher sends an empty datagram to each socket in the directory without blocking, and subscribers
+wait for it with select(). Subscribers that are too slow to empty their socket simply miss some wakeups, which
+doesn't matter since they read all the records published so far when they wake up.
+"""
+
+MAGIC = b"IOTPFEED"
+VERSION = 1
+# Set once the execution that publishes the feed has ended
+FLAG_END = 1
+HEADER_SIZE = 64
+RECORD_DTYPE = np.dtype([("time", "<i8"), ("device", "<i4"), ("attacks", "<i4"), ("power", "<f8")])
+
+HEADER_STRUCT = struct.Struct("<8sHHIQ")
+FLAGS_STRUCT = struct.Struct("<H")
+COUNTERS_STRUCT = struct.Struct("<QQ")
+GEN_STRUCT = struct.Struct("<Q")
+FLAGS_OFFSET = 10
+COUNTERS_OFFSET = 24
+GEN_OFFSET = 40
+
+# Amount of failed attempts to read the header consistently after which the reader waits for HEADER_RETRY_DELAY
+# seconds before trying again
+HEADER_SPIN_ATTEMPTS = 100
+HEADER_RETRY_DELAY = 0.0001
+
+
+class FeedError(Exception):
+	"""
+	Thrown when the feed doesn't exist or its shared memory doesn't contain a valid feed
+	"""
+	pass
+
+
+def get_wakeup_dir(name: str) -> str:
+	"""
+	Returns the directory where subscribers of the given feed create their wakeup sockets
+	"""
+	return os.path.join(tempfile.gettempdir(), name + "-subscribers")
+
+
+class SampleFeedPublisher(SampleConsumer):
+	"""
+	Publishes the samples of all the devices to a shared memory ring (see the module description). Never blocks: if a
+	subscriber falls behind, older samples are overwritten and the subscriber is told how many it lost.
+	"""
+
+	name: str
+	capacity: int
+
+	_shm: shared_memory.SharedMemory
+	_records: np.ndarray
+	_flags: int
+	_reserved: int
+	_seq: int
+	_gen: int
+	_wakeup_dir: str
+	_socket: socket.socket
+
+	def __init__(self, name: str = Cst.FEED_NAME, capacity: int = Cst.FEED_CAPACITY):
+		"""
+		Creates the shared memory of the feed. If a feed with the same name was left behind by a previous execution,
+		it's replaced.
+		"""
+		self.name = name
+		self.capacity = capacity
+		size = HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+		try:
+			self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+		except FileExistsError:
+			stale = shared_memory.SharedMemory(name)
+			stale.close()
+			stale.unlink()
+			self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+		self._flags = 0
+		self._reserved = 0
+		self._seq = 0
+		self._gen = 0
+		HEADER_STRUCT.pack_into(self._shm.buf, 0, MAGIC, VERSION, self._flags, RECORD_DTYPE.itemsize, capacity)
+		self._write_counters()
+		self._records = np.ndarray(capacity, RECORD_DTYPE, self._shm.buf, HEADER_SIZE)
+
+		self._wakeup_dir = get_wakeup_dir(name)
+		os.makedirs(self._wakeup_dir, exist_ok=True)
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		self._socket.setblocking(False)
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		"""
+		Copies a batch of samples to the ring and wakes up the subscribers
+		"""
+		if len(batch) == 0:
+			return
+		# Batches larger than the ring would overwrite themselves, so only their last records are copied. The sequence
+		# still advances by the whole batch, so subscribers count the skipped samples as lost.
+		rows = np.array([(timestamp, device_num, attacks, math.nan if power is None else power)
+			for timestamp, device_num, power, attacks in batch[-self.capacity:]], RECORD_DTYPE)
+
+		self._reserved = self._seq + len(batch)
+		self._write_counters()
+		start = (self._reserved - len(rows)) % self.capacity
+		first_part = min(len(rows), self.capacity - start)
+		self._records[start:start + first_part] = rows[:first_part]
+		self._records[:len(rows) - first_part] = rows[first_part:]
+		self._seq = self._reserved
+		self._write_counters()
+		self._wake_subscribers()
+
+	def close(self):
+		"""
+		Sets the end flag, wakes up the subscribers and removes the shared memory. Subscribers that are already
+		attached can still read the records published so far.
+		"""
+		self._flags |= FLAG_END
+		self._begin_update()
+		FLAGS_STRUCT.pack_into(self._shm.buf, FLAGS_OFFSET, self._flags)
+		self._end_update()
+		self._wake_subscribers()
+		self._socket.close()
+		# The array must be released before the shared memory can be closed
+		del self._records
+		self._shm.close()
+		self._shm.unlink()
+
+	def _write_counters(self):
+		self._begin_update()
+		COUNTERS_STRUCT.pack_into(self._shm.buf, COUNTERS_OFFSET, self._reserved, self._seq)
+		self._end_update()
+
+	def _begin_update(self):
+		self._gen += 1
+		GEN_STRUCT.pack_into(self._shm.buf, GEN_OFFSET, self._gen)
+
+	def _end_update(self):
+		self._gen += 1
+		GEN_STRUCT.pack_into(self._shm.buf, GEN_OFFSET, self._gen)
+
+	def _wake_subscribers(self):
+		try:
+			names = os.listdir(self._wakeup_dir)
+		except FileNotFoundError:
+			return
+		for name in names:
+			path = os.path.join(self._wakeup_dir, name)
+			try:
+				self._socket.sendto(b"", path)
+			except BlockingIOError:
+				# The subscriber hasn't processed its previous wakeups yet
+				pass
+			except (ConnectionRefusedError, FileNotFoundError):
+				# The subscriber exited without removing its socket
+				try:
+					os.remove(path)
+				except FileNotFoundError:
+					pass
+
+
+class SampleFeedSubscriber:
+	"""
+	Reads the samples published by a SampleFeedPublisher running on another process. Each subscriber keeps its own
+	read position, so any number of them can be attached to the same feed.
+	"""
+
+	name: str
+	capacity: int
+	# Number of samples that were overwritten before this subscriber could read them
+	lost: int
+
+	_shm: shared_memory.SharedMemory
+	_records: np.ndarray
+	# Number of the next record to read
+	_next: int
+	_socket: socket.socket
+	_socket_path: str
+
+	def __init__(self, name: str = Cst.FEED_NAME, from_start: bool = False):
+		"""
+		Attaches to a feed. If the feed doesn't exist, throws FeedError.
+		from_start: If true, the first read will return all the samples still in the ring. Otherwise, only samples
+		published after attaching will be returned.
+		"""
+		self.name = name
+		self.lost = 0
+		try:
+			self._shm = shared_memory.SharedMemory(name)
+		except FileNotFoundError:
+			raise FeedError("Feed " + name + " doesn't exist. Is the main loop running with --feed?")
+		# The shared memory belongs to the publisher. Without this, it would be removed when this process exits.
+		resource_tracker.unregister(self._shm._name, "shared_memory")
+
+		magic, version, _, record_size, capacity = HEADER_STRUCT.unpack_from(self._shm.buf, 0)
+		if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+			self._shm.close()
+			raise FeedError("Shared memory " + name + " doesn't contain a supported feed")
+		self.capacity = capacity
+		self._records = np.ndarray(capacity, RECORD_DTYPE, self._shm.buf, HEADER_SIZE)
+
+		# Bind the socket before reading the position, so no wakeups are missed
+		self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+		self._socket.setblocking(False)
+		self._socket_path = os.path.join(get_wakeup_dir(name), str(os.getpid()) + "-" + str(id(self)) + ".sock")
+		os.makedirs(os.path.dirname(self._socket_path), exist_ok=True)
+		self._socket.bind(self._socket_path)
+
+		reserved, seq, over = self._read_header()
+		self._next = max(0, seq - capacity) if from_start else seq
+
+	def read(self) -> np.ndarray:
+		"""
+		Returns the samples published since the last read without blocking, as a structured array with the fields
+		"time", "device", "attacks" (-1 if not available) and "power" (NaN for measurements that couldn't be taken).
+		The fields can be accessed as NumPy views (e.g. samples["power"]).
+		The returned array is a copy: records in the ring get overwritten by the publisher, so views over the ring
+		itself would change under the caller.
+		"""
+		reserved, seq, over = self._read_header()
+		start = max(self._next, seq - self.capacity)
+		samples = self._copy(start, seq)
+		# Discard the records the publisher might have started overwriting during the copy
+		reserved, _, _ = self._read_header()
+		first_valid = max(start, reserved - self.capacity)
+		self.lost += first_valid - self._next
+		self._next = seq
+		return samples[first_valid - start:]
+
+	def wait(self, timeout: float = None) -> "np.ndarray | None":
+		"""
+		Blocks until new samples are published and returns them (see read()).
+		timeout: Max number of seconds to wait. If it runs out, an empty array is returned.
+		return: New samples, or None if the feed has ended and all its samples have been read.
+		"""
+		end_time = None if timeout is None else time.monotonic() + timeout
+		while True:
+			self._drain_wakeups()
+			reserved, seq, over = self._read_header()
+			if seq > self._next:
+				return self.read()
+			if over:
+				return None
+
+			remaining = None if end_time is None else end_time - time.monotonic()
+			if remaining is not None and remaining <= 0:
+				return np.zeros(0, RECORD_DTYPE)
+			# Wake up once in a while even without notifications, in case the publisher crashed
+			wait_time = Cst.FEED_POLL_INTERVAL if remaining is None else min(remaining, Cst.FEED_POLL_INTERVAL)
+			self._socket.settimeout(wait_time)
+			try:
+				self._socket.recv(1)
+			except (socket.timeout, BlockingIOError):
+				pass
+			finally:
+				self._socket.setblocking(False)
+
+	def is_over(self) -> bool:
+		"""
+		Returns true if the publisher has ended its execution
+		"""
+		return self._read_header()[2]
+
+	def close(self):
+		self._socket.close()
+		try:
+			os.remove(self._socket_path)
+		except FileNotFoundError:
+			pass
+		del self._records
+		self._shm.close()
+
+	def _drain_wakeups(self):
+		try:
+			while True:
+				self._socket.recv(1)
+		except BlockingIOError:
+			pass
+
+	def _copy(self, start: int, end: int) -> np.ndarray:
+		"""
+		Copies the records in the range [start, end) to a new array
+		"""
+		first = start % self.capacity
+		count = end - start
+		if first + count <= self.capacity:
+			return self._records[first:first + count].copy()
+		return np.concatenate((self._records[first:], self._records[:first + count - self.capacity]))
+
+	def _read_header(self) -> Tuple[int, int, bool]:
+		"""
+		Reads the header consistently.
+		return: Reserved records, published records and true if the end flag is set
+		"""
+		attempts = 0
+		while True:
+			gen, = GEN_STRUCT.unpack_from(self._shm.buf, GEN_OFFSET)
+			if gen % 2 == 0:
+				flags, = FLAGS_STRUCT.unpack_from(self._shm.buf, FLAGS_OFFSET)
+				reserved, seq = COUNTERS_STRUCT.unpack_from(self._shm.buf, COUNTERS_OFFSET)
+				if GEN_STRUCT.unpack_from(self._shm.buf, GEN_OFFSET)[0] == gen:
+					return reserved, seq, bool(flags & FLAG_END)
+			attempts += 1
+			if attempts % HEADER_SPIN_ATTEMPTS == 0:
+				time.sleep(HEADER_RETRY_DELAY)
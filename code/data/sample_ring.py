@@ -0,0 +1,74 @@
+import math
+from array import array
+from typing import List, Tuple
+
+
+class SampleRing:
+	"""
+	Fixed-size ring of power samples, used to pass samples from the acquisition loop to the thread that writes them.
+	Storage is preallocated on typed arrays, so pushing a sample doesn't allocate memory.
+	Meant to be used with a single producer thread and a single consumer thread. If the ring is full, new samples
+	are dropped instead of blocking the producer, and the amount of dropped samples is counted.
+	"""
+
+	capacity: int
+	# Number of samples that couldn't be pushed because the ring was full
+	dropped: int
+
+	# Record fields. Missing power values (gaps) are stored as NaN.
+	_timestamps: array
+	_devices: array
+	_powers: array
+	_attacks: array
+	# Total number of samples pushed and popped. Only modified by the producer and the consumer, respectively.
+	_write_count: int
+	_read_count: int
+
+	def __init__(self, capacity: int):
+		if capacity <= 0:
+			raise ValueError("Capacity must be positive")
+		self.capacity = capacity
+		self.dropped = 0
+		self._timestamps = array("q", [0]) * capacity
+		self._devices = array("i", [0]) * capacity
+		self._powers = array("d", [0]) * capacity
+		self._attacks = array("q", [0]) * capacity
+		self._write_count = 0
+		self._read_count = 0
+
+	def __len__(self):
+		return self._write_count - self._read_count
+
+	def push(self, timestamp: int, device_num: int, power: "float | None", attacks: int = -1) -> bool:
+		"""
+		Adds a sample to the ring.
+		power: Power usage of the device, or None to push a gap (a measurement that couldn't be taken).
+		attacks: Active attacks on the device, or -1 if no attack data is available.
+		return: True if the sample was added, false if it was dropped because the ring is full.
+		"""
+		if self._write_count - self._read_count >= self.capacity:
+			self.dropped += 1
+			return False
+		pos = self._write_count % self.capacity
+		self._timestamps[pos] = timestamp
+		self._devices[pos] = device_num
+		self._powers[pos] = math.nan if power is None else power
+		self._attacks[pos] = attacks
+		# Publish the sample only once all of its fields have been written
+		self._write_count += 1
+		return True
+
+	def pop_batch(self, max_count: int) -> List[Tuple[int, int, "float | None", int]]:
+		"""
+		Removes up to max_count samples from the ring, oldest first.
+		return: List of (timestamp, device number, power, attacks) tuples. Power is None for gaps.
+		"""
+		count = min(max_count, self._write_count - self._read_count)
+		batch = []
+		for i in range(self._read_count, self._read_count + count):
+			pos = i % self.capacity
+			power = self._powers[pos]
+			batch.append((self._timestamps[pos], self._devices[pos], None if math.isnan(power) else power,
+				self._attacks[pos]))
+		self._read_count += count
+		return batch
@@ -0,0 +1,170 @@
+import gzip
+import io
+import os
+import queue
+import shutil
+from enum import Enum
+from threading import Thread
+from typing import TextIO, Tuple
+
+from defs.utils import log
+
+try:
+	import zstandard
+except ImportError:
+	# Only required when using Compression.ZSTD
+	zstandard = None
+
+MANIFEST_HEADER = "File,Time start,Time end,Entries"
+
+
+class Compression(Enum):
+	"""
+	Compression formats that can be applied to closed output segments
+	"""
+	NONE = 0
+	GZIP = 1
+	ZSTD = 2  # Requires the zstandard package
+
+	@classmethod
+	def from_str(cls, string: str):
+		"""
+		Given the name of a compression format (none, gzip or zstd), returns the corresponding enum value.
+		If the input doesn't represent a valid format, throws ValueError.
+		"""
+		if string == "none":
+			return cls.NONE
+		elif string == "gzip":
+			return cls.GZIP
+		elif string == "zstd":
+			return cls.ZSTD
+		else:
+			raise ValueError("Unrecognized compression format: " + string)
+
+	def is_available(self) -> bool:
+		"""
+		Returns false if the format requires a package that isn't installed
+		"""
+		return self != Compression.ZSTD or zstandard is not None
+
+	def get_extension(self) -> str:
+		if self == Compression.GZIP:
+			return ".gz"
+		elif self == Compression.ZSTD:
+			return ".zst"
+		else:
+			return ""
+
+	@classmethod
+	def from_path(cls, file_path: str):
+		"""
+		Returns the compression format of a file based on its extension
+		"""
+		if file_path.endswith(".gz"):
+			return cls.GZIP
+		elif file_path.endswith(".zst"):
+			return cls.ZSTD
+		else:
+			return cls.NONE
+
+	def open_text(self, file_path: str) -> TextIO:
+		"""
+		Opens a file compressed with this format for reading, returning its decompressed contents as text.
+		If the format requires a package that isn't installed, throws ImportError.
+		"""
+		if not self.is_available():
+			raise ImportError("The zstandard package is required to read " + file_path)
+		if self == Compression.GZIP:
+			return gzip.open(file_path, "rt", newline="")
+		elif self == Compression.ZSTD:
+			return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True),
+				newline="")
+		else:
+			return open(file_path, newline="")
+
+
+class SegmentCompressor:
+	"""
+	Compresses closed output segments on a separate thread, so compression never delays writes, and records each
+	segment in the manifest of the run it belongs to once it's done.
+	Manifests are CSV files with one line per segment, listing the name of the segment file (relative to the
+	manifest), the timestamps of its first and last entries and its number of entries.
+	"""
+
+	compression: Compression
+
+	# Segments waiting to be processed, as (segment path, manifest path, first timestamp, last timestamp, entries)
+	# tuples. None is used to stop the thread.
+	_queue: "queue.Queue[Tuple[str, str, int, int, int] | None]"
+	_thread: "Thread | None"
+
+	def __init__(self, compression: Compression):
+		"""
+		If the compression format requires a package that isn't installed, throws ImportError.
+		"""
+		if not compression.is_available():
+			raise ImportError("The zstandard package is required to use zstd compression")
+		self.compression = compression
+		self._queue = queue.Queue()
+		self._thread = None
+
+	def start(self):
+		self._thread = Thread(target=self._run)
+		self._thread.start()
+
+	def submit(self, segment_path: str, manifest_path: str, time_start: int, time_end: int, entries: int):
+		"""
+		Queues a closed segment so it gets compressed and added to a manifest
+		time_start, time_end: Timestamps of the first and last entries in the segment
+		entries: Number of entries in the segment
+		"""
+		self._queue.put((segment_path, manifest_path, time_start, time_end, entries))
+
+	def stop(self):
+		"""
+		Processes all the queued segments and stops the thread
+		"""
+		if self._thread is not None:
+			self._queue.put(None)
+			self._thread.join()
+			self._thread = None
+
+	def _run(self):
+		while True:
+			job = self._queue.get()
+			if job is None:
+				break
+			segment_path, manifest_path, time_start, time_end, entries = job
+			try:
+				final_path = self._compress(segment_path)
+			except OSError as e:
+				log("Error: Could not compress " + segment_path + " (" + str(e) + "). It will be kept uncompressed.")
+				final_path = segment_path
+			self._add_to_manifest(manifest_path, final_path, time_start, time_end, entries)
+
+	def _compress(self, segment_path: str) -> str:
+		"""
+		Compresses a segment, replacing the original file. Returns the path of the compressed file.
+		"""
+		if self.compression == Compression.NONE:
+			return segment_path
+
+		compressed_path = segment_path + self.compression.get_extension()
+		with open(segment_path, "rb") as src:
+			if self.compression == Compression.GZIP:
+				with gzip.open(compressed_path, "wb") as dst:
+					shutil.copyfileobj(src, dst)
+			else:
+				with open(compressed_path, "wb") as dst:
+					zstandard.ZstdCompressor().copy_stream(src, dst)
+		os.remove(segment_path)
+		return compressed_path
+
+	@staticmethod
+	def _add_to_manifest(manifest_path: str, segment_path: str, time_start: int, time_end: int, entries: int):
+		file_exists = os.path.isfile(manifest_path)
+		with open(manifest_path, "a") as manifest:
+			if not file_exists:
+				manifest.write(MANIFEST_HEADER + "\n")
+			manifest.write(os.path.relpath(segment_path, os.path.dirname(manifest_path)) + "," + str(time_start) +
+				"," + str(time_end) + "," + str(entries) + "\n")
@@ -1,32 +1,99 @@
+import os
 import time
-from typing import TextIO
+from typing import List, TextIO, Tuple
 
 from data.data_writer import DataWriter
+from data.segment_compressor import SegmentCompressor
+from data.write_stats import WriteStats
+from defs.constants import Constants as Cst
 from defs.exceptions import IllegalOperationError
 
 
 class StandardDataWriter(DataWriter):
 	"""
 	Class that can be used to write power and attacks data to a regular file, appending new lines at the end.
+	Lines are grouped before being written: they are kept in memory until flush_count lines are waiting or the oldest
+	one has been waiting for flush_interval seconds, and then all of them are written with a single call. Separately,
+	the file is synced to disk every fsync_interval seconds, so a sudden power loss can only lose the most recent data.
+
+	The output can optionally be split into segments. A new segment is started once the current one reaches a certain
+	size or has been open for a certain time. Closed segments are passed to a SegmentCompressor, which compresses them
+	in the background and lists them in a manifest file along with the time range they cover.
 	"""
 
-	# File used when buffer_mode is false
+	# File the data is currently being written to
 	file: TextIO
+	# Path of the output file. If rotation is enabled, segment paths are derived from it (see get_segment_path()).
+	file_path: str
 	attack_column: bool
+	# Max number of lines kept in memory before writing them
+	flush_count: int
+	# Max number of seconds a line can be kept in memory before writing it
+	flush_interval: float
+	# Seconds between syncs of the file to disk. If <= 0, the file is only synced when it's closed.
+	fsync_interval: float
+	stats: WriteStats
+	# Size (in bytes) and time (in seconds) after which a new segment is started. Rotation is disabled if both of them
+	# are <= 0.
+	rotate_size: int
+	rotate_interval: float
+	# Receives closed segments. Required if rotation is enabled.
+	compressor: "SegmentCompressor | None"
+
+	# Lines waiting to be written
+	_pending: List[str]
+	# Monotonic time at which the oldest pending line was added
+	_pending_since: float
+	# Monotonic time of the last fsync
+	_last_fsync: float
+	# True if data has been written to the file since the last fsync
+	_unsynced: bool
+	# Number of the current segment, starting at 1
+	_segment_num: int
+	# Path of the current segment
+	_segment_path: str
+	# Monotonic time at which the current segment was created
+	_segment_start: float
+	# Bytes written to the current segment
+	_segment_size: int
+	# Number of entries added to the current segment and timestamps of the first and last one
+	_segment_entries: int
+	_segment_time_start: int
+	_segment_time_end: int
 
-	def __init__(self, file_path: str, attack_column: bool):
+	def __init__(self, file_path: str, attack_column: bool, flush_count: int = Cst.FILE_FLUSH_COUNT,
+		flush_interval: float = Cst.FILE_FLUSH_INTERVAL, fsync_interval: float = Cst.FILE_FSYNC_INTERVAL,
+		rotate_size: int = 0, rotate_interval: float = 0, compressor: SegmentCompressor = None):
 		"""
 		Instantiates the class to write to the specified file. If the file already exists, it will be truncated.
 		The file will remain open until close() is called.
 		attack_column: True to include a column in the output file listing active attacks.
+		rotate_size, rotate_interval: If either of them is > 0, the output will be split into segments, and a new one
+		will be started once the current one reaches rotate_size bytes or has been open for rotate_interval seconds.
+		compressor: Used to compress closed segments and add them to the manifest. Required if rotation is enabled.
 		"""
-		self.file = open(file_path, "w")
+		if (rotate_size > 0 or rotate_interval > 0) and compressor is None:
+			raise ValueError("A compressor must be specified when rotation is enabled")
+		self.file_path = file_path
 		self.attack_column = attack_column
-		self._write_header(self.file)
+		self.flush_count = flush_count
+		self.flush_interval = flush_interval
+		self.fsync_interval = fsync_interval
+		self.stats = WriteStats()
+		self._pending = []
+		self._pending_since = 0
+		self._last_fsync = time.monotonic()
+		self._unsynced = False
+		self.rotate_size = rotate_size
+		self.rotate_interval = rotate_interval
+		self.compressor = compressor
+		self._segment_num = 1
+		self._open_segment()
 
-	def write(self, power: float, attacks: int = -1, timestamp: float = -1):
+	def write(self, power: "float | None", attacks: int = -1, timestamp: float = -1):
 		"""
-		Writes one line to the output file. If close() has already been called, throws IllegalOperationError.
+		Adds one line to the output file. The line might not be written until later (see the class description).
+		If close() has already been called, throws IllegalOperationError.
 		See DataWriter.write for the description of the base method.
 		"""
 		if self.file.closed:
@@ -35,14 +102,162 @@ class StandardDataWriter(DataWriter):
 		if timestamp == -1:
 			timestamp = int(time.time() * 1000)
 
-		self.file.write(self._get_csv_line(power, timestamp, attacks) + "\n")
+		if len(self._pending) == 0:
+			self._pending_since = time.monotonic()
+		self._pending.append(self._get_csv_line(power, timestamp, attacks) + "\n")
+		self._add_to_segment(timestamp, timestamp, 1)
+		self._flush_if_due()
+
+	def write_batch(self, rows: List[Tuple["float | None", int, float]]):
+		"""
+		Adds several lines to the output file at once.
+		See DataWriter.write_batch for the description of the base method.
+		"""
+		if self.file.closed:
+			raise IllegalOperationError("Cannot write to a file that has already been closed.")
+
+		if len(self._pending) == 0:
+			self._pending_since = time.monotonic()
+		self._pending.extend([self._get_csv_line(power, timestamp, attacks) + "\n"
+			for power, attacks, timestamp in rows])
+		if len(rows) > 0:
+			self._add_to_segment(rows[0][2], rows[-1][2], len(rows))
+		self._flush_if_due()
+
+	def poll(self):
+		"""
+		Writes the pending lines if they have been waiting for too long, syncs the file to disk if it's time to, and
+		starts a new segment if the current one has been open for too long.
+		"""
+		if not self.file.closed:
+			self._flush_if_due()
+			self._fsync_if_due()
+			self._rotate_if_due()
+
+	def flush(self):
+		"""
+		Writes all the pending lines to the file with a single call, then starts a new segment if the current one is
+		full
+		"""
+		if len(self._pending) > 0:
+			self._write_pending()
+			self._rotate_if_due()
+
+	def fsync(self):
+		"""
+		Makes sure all the data written so far is stored on disk
+		"""
+		start = time.perf_counter_ns()
+		os.fsync(self.file.fileno())
+		self.stats.add_fsync(time.perf_counter_ns() - start)
+		self._last_fsync = time.monotonic()
+		self._unsynced = False
 
 	def close(self):
 		"""
-		Closes the file that was opened when instantiating the class. Attempting to call write() file after calling
+		Writes the pending lines, syncs the file to disk and closes it. Attempting to call write() file after calling
 		this method will throw an exception.
+		If rotation is enabled, the last segment is passed to the compressor. The compressor must be stopped after
+		calling this method to make sure all segments are processed.
+		"""
+		if not self.file.closed:
+			try:
+				self.flush()
+			finally:
+				self._close_segment()
+
+	def is_rotation_enabled(self) -> bool:
+		return self.rotate_size > 0 or self.rotate_interval > 0
+
+	def get_segment_path(self, segment_num: int) -> str:
+		"""
+		Returns the path of a segment. If rotation is disabled, the output file path is returned.
+		"""
+		if not self.is_rotation_enabled():
+			return self.file_path
+		base, extension = os.path.splitext(self.file_path)
+		return base + "-" + str(segment_num).zfill(3) + extension
+
+	def get_manifest_path(self) -> str:
+		"""
+		Returns the path of the manifest that lists the segments of the output
+		"""
+		return os.path.splitext(self.file_path)[0] + "-manifest.csv"
+
+	def _flush_if_due(self):
+		if len(self._pending) >= self.flush_count or \
+			len(self._pending) > 0 and time.monotonic() - self._pending_since >= self.flush_interval:
+			self.flush()
+
+	def _write_pending(self):
+		"""
+		Writes all the pending lines to the current segment with a single call, without checking if it has to be
+		rotated
+		"""
+		if len(self._pending) > 0:
+			start = time.perf_counter_ns()
+			self.file.writelines(self._pending)
+			self.file.flush()
+			self.stats.add_flush(len(self._pending), time.perf_counter_ns() - start)
+			self._segment_size += sum([len(line) for line in self._pending])
+			self._pending = []
+			self._unsynced = True
+
+	def _fsync_if_due(self):
+		if self._unsynced and 0 < self.fsync_interval <= time.monotonic() - self._last_fsync:
+			self.fsync()
+
+	def _rotate_if_due(self):
+		if self.is_rotation_enabled() and self._segment_entries > 0 and \
+			(0 < self.rotate_size <= self._segment_size or
+			0 < self.rotate_interval <= time.monotonic() - self._segment_start):
+			self._write_pending()
+			self._close_segment()
+			self._segment_num += 1
+			self._open_segment()
+
+	def _open_segment(self):
+		self._segment_path = self.get_segment_path(self._segment_num)
+		self.file = open(self._segment_path, "w")
+		self._segment_start = time.monotonic()
+		self._segment_size = 0
+		self._segment_entries = 0
+		self._segment_time_start = -1
+		self._segment_time_end = -1
+		self._write_header(self.file)
+		self.file.flush()
+
+	def _close_segment(self):
+		"""
+		Syncs and closes the current segment and passes it to the compressor. The file is closed and the segment is
+		passed to the compressor even if syncing or closing it fails, in which case the error is thrown afterwards.
+		"""
+		try:
+			if self._unsynced:
+				self.fsync()
+		finally:
+			try:
+				self.file.close()
+			finally:
+				self._submit_segment()
+
+	def _submit_segment(self):
+		if self.is_rotation_enabled():
+			if self._segment_entries == 0:
+				# Nothing was written after the last rotation
+				os.remove(self._segment_path)
+				return
+			self.compressor.submit(self._segment_path, self.get_manifest_path(), self._segment_time_start,
+				self._segment_time_end, self._segment_entries)
+
+	def _add_to_segment(self, time_start: int, time_end: int, entries: int):
+		"""
+		Updates the time range and number of entries of the current segment after adding entries to it
 		"""
-		self.file.close()
+		if self._segment_entries == 0:
+			self._segment_time_start = time_start
+		self._segment_time_end = time_end
+		self._segment_entries += entries
 
 	def _has_attack_column(self):
 		return self.attack_column
@@ -0,0 +1,380 @@
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import deque
+from enum import Enum
+from threading import Lock, Thread
+from typing import Deque, Dict, List, Tuple
+
+import numpy as np
+
+from data.sample_consumer import SampleConsumer
+from data.sample_feed import RECORD_DTYPE
+from defs.constants import Constants as Cst
+from defs.utils import log
+
+"""
+Streaming of samples to other hosts over TCP (or to local processes over a UNIX socket).
+
+Samples are sent in frames. Each frame starts with its length (uint32, not including the length itself), followed
+by FRAME_HEADER_STRUCT (magic, version and number of samples) and the samples, encoded as an array of
+sample_feed.RECORD_DTYPE records (time, device, attacks and power, little-endian). Attacks are -1 if attack data is
+not available, and power is NaN for measurements that couldn't be taken.
+"""
+
+FRAME_MAGIC = b"IOTP"
+FRAME_VERSION = 1
+LENGTH_STRUCT = struct.Struct("<I")
+FRAME_HEADER_STRUCT = struct.Struct("<4sHxxI")
+
+
+class SlowClientPolicy(Enum):
+	"""
+	What to do when a subscriber doesn't receive frames as fast as they are produced and its queue fills up
+	"""
+	# Drop the oldest queued frame
+	DROP = 0
+	# Close the connection
+	DISCONNECT = 1
+
+	@classmethod
+	def from_str(cls, string: str):
+		"""
+		Given the name of a policy (drop or disconnect), returns the corresponding enum value.
+		If the input doesn't represent a valid policy, throws ValueError.
+		"""
+		if string == "drop":
+			return cls.DROP
+		elif string == "disconnect":
+			return cls.DISCONNECT
+		else:
+			raise ValueError("Unrecognized slow client policy: " + string)
+
+
+def parse_address(address: str) -> Tuple[int, "str | Tuple[str, int]"]:
+	"""
+	Parses the address of a stream, which can be either "<host>:<port>" for TCP or "unix:<path>" for a UNIX socket.
+	If the address is not valid, throws ValueError.
+	return: Socket family and address in the format expected by the socket module
+	"""
+	if address.startswith("unix:"):
+		return socket.AF_UNIX, address[len("unix:"):]
+	host, sep, port = address.rpartition(":")
+	if sep == "" or not port.isdigit():
+		raise ValueError("Invalid stream address: " + address)
+	return socket.AF_INET, (host, int(port))
+
+
+def encode_frame(batch: List[Tuple[int, int, "float | None", int]]) -> bytes:
+	"""
+	Encodes a batch of (timestamp, device number, power, attacks) samples as a frame, including its length prefix
+	"""
+	records = np.array([(timestamp, device_num, attacks, np.nan if power is None else power)
+		for timestamp, device_num, power, attacks in batch], RECORD_DTYPE).tobytes()
+	header = FRAME_HEADER_STRUCT.pack(FRAME_MAGIC, FRAME_VERSION, len(batch))
+	return LENGTH_STRUCT.pack(len(header) + len(records)) + header + records
+
+
+class _Client:
+	"""
+	Connection to a subscriber
+	"""
+
+	sock: socket.socket
+	# Frames waiting to be sent
+	frames: Deque[bytes]
+	# Part of the frame currently being sent that hasn't been sent yet
+	current: "memoryview | None"
+	# Number of frames that were dropped because the queue was full
+	dropped: int
+	# Set if the client must be disconnected
+	disconnect: bool
+
+	def __init__(self, sock: socket.socket):
+		self.sock = sock
+		self.frames = deque()
+		self.current = None
+		self.dropped = 0
+		self.disconnect = False
+
+
+class SampleStreamPublisher(SampleConsumer):
+	"""
+	Sends the samples of all the devices to every connected subscriber (see the module description).
+	Samples are grouped in frames of up to batch_count samples, and a frame is also sent if its oldest sample has been
+	waiting for batch_interval seconds. Frames are queued separately for each subscriber, and a separate thread sends
+	them, so slow or dead subscribers never delay the WriterThread (and thus the main loop). When a subscriber's queue
+	is full, the slow client policy decides whether frames are dropped or the subscriber is disconnected.
+	"""
+
+	address: str
+	batch_count: int
+	batch_interval: float
+	queue_frames: int
+	policy: SlowClientPolicy
+
+	_listener: socket.socket
+	_selector: selectors.DefaultSelector
+	_clients: Dict[socket.socket, _Client]
+	# Protects the client queues, which are accessed from both threads
+	_lock: Lock
+	# Used to wake up the sender thread when new frames are queued
+	_wakeup_r: socket.socket
+	_wakeup_w: socket.socket
+	_thread: "Thread | None"
+	_stop_flag: bool
+	# Samples waiting to be sent and monotonic time at which the oldest one was added
+	_pending: List[Tuple[int, int, "float | None", int]]
+	_pending_since: float
+
+	def __init__(self, address: str, batch_count: int = Cst.STREAM_BATCH_COUNT,
+		batch_interval: float = Cst.STREAM_BATCH_INTERVAL, queue_frames: int = Cst.STREAM_QUEUE_FRAMES,
+		policy: SlowClientPolicy = SlowClientPolicy.DROP):
+		"""
+		Starts listening for subscribers on the specified address (see parse_address()).
+		If the address is not valid, throws ValueError. If it's already in use, throws OSError.
+		queue_frames: Max number of frames queued for each subscriber
+		"""
+		self.address = address
+		self.batch_count = batch_count
+		self.batch_interval = batch_interval
+		self.queue_frames = queue_frames
+		self.policy = policy
+		family, sock_address = parse_address(address)
+		self._listener = socket.socket(family, socket.SOCK_STREAM)
+		if family == socket.AF_UNIX:
+			if os.path.exists(sock_address):
+				# Left behind by a previous execution
+				os.remove(sock_address)
+		else:
+			self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self._listener.bind(sock_address)
+		self._listener.listen()
+		self._listener.setblocking(False)
+		self._wakeup_r, self._wakeup_w = socket.socketpair()
+		self._wakeup_r.setblocking(False)
+		self._wakeup_w.setblocking(False)
+		self._selector = selectors.DefaultSelector()
+		self._selector.register(self._listener, selectors.EVENT_READ)
+		self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+		self._clients = {}
+		self._lock = Lock()
+		self._pending = []
+		self._pending_since = 0
+		self._stop_flag = False
+		self._thread = Thread(target=self._run)
+		self._thread.start()
+
+	def consume(self, batch: List[Tuple[int, int, "float | None", int]]):
+		if len(self._pending) == 0:
+			self._pending_since = time.monotonic()
+		self._pending.extend(batch)
+		while len(self._pending) >= self.batch_count:
+			self._publish(self._pending[:self.batch_count])
+			self._pending = self._pending[self.batch_count:]
+			self._pending_since = time.monotonic()
+		self.poll()
+
+	def poll(self):
+		if len(self._pending) > 0 and time.monotonic() - self._pending_since >= self.batch_interval:
+			self._publish(self._pending)
+			self._pending = []
+
+	def close(self):
+		"""
+		Sends the remaining samples to the subscribers that can receive them without blocking, then closes all the
+		connections
+		"""
+		if len(self._pending) > 0:
+			self._publish(self._pending)
+			self._pending = []
+		self._stop_flag = True
+		self._wake()
+		self._thread.join()
+		for client in list(self._clients.values()):
+			self._remove_client(client)
+		self._selector.close()
+		self._listener.close()
+		self._wakeup_r.close()
+		self._wakeup_w.close()
+		family, sock_address = parse_address(self.address)
+		if family == socket.AF_UNIX and os.path.exists(sock_address):
+			os.remove(sock_address)
+
+	def _publish(self, batch: List[Tuple[int, int, "float | None", int]]):
+		"""
+		Queues a frame for every subscriber
+		"""
+		frame = encode_frame(batch)
+		with self._lock:
+			for client in self._clients.values():
+				if len(client.frames) >= self.queue_frames:
+					if self.policy == SlowClientPolicy.DROP:
+						client.frames.popleft()
+						client.dropped += 1
+					else:
+						client.disconnect = True
+						continue
+				client.frames.append(frame)
+		self._wake()
+
+	def _wake(self):
+		try:
+			self._wakeup_w.send(b"\0")
+		except BlockingIOError:
+			# A wakeup is already pending
+			pass
+
+	def _run(self):
+		while True:
+			for key, mask in self._selector.select():
+				if key.fileobj is self._listener:
+					self._accept()
+				elif key.fileobj is self._wakeup_r:
+					self._drain_wakeups()
+				else:
+					client = self._clients.get(key.fileobj)
+					if client is not None:
+						self._handle_client(client, mask)
+			if self._stop_flag:
+				# Send whatever can be sent right away
+				for client in list(self._clients.values()):
+					if not client.disconnect:
+						self._send(client)
+				break
+			self._update_clients()
+
+	def _accept(self):
+		try:
+			sock, _ = self._listener.accept()
+		except BlockingIOError:
+			return
+		sock.setblocking(False)
+		if sock.family != socket.AF_UNIX:
+			sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		with self._lock:
+			self._clients[sock] = _Client(sock)
+		self._selector.register(sock, selectors.EVENT_READ)
+
+	def _drain_wakeups(self):
+		try:
+			while self._wakeup_r.recv(4096):
+				pass
+		except BlockingIOError:
+			pass
+
+	def _handle_client(self, client: _Client, mask: int):
+		if mask & selectors.EVENT_READ:
+			# Subscribers don't send anything, so this means the connection was closed
+			try:
+				data = client.sock.recv(4096)
+			except BlockingIOError:
+				data = None
+			except OSError:
+				data = b""
+			if data == b"":
+				self._remove_client(client)
+				return
+		if mask & selectors.EVENT_WRITE:
+			self._send(client)
+
+	def _send(self, client: _Client):
+		"""
+		Sends as much queued data to a client as possible without blocking
+		"""
+		while True:
+			if client.current is None:
+				with self._lock:
+					if len(client.frames) == 0:
+						return
+					client.current = memoryview(client.frames.popleft())
+			try:
+				sent = client.sock.send(client.current)
+			except BlockingIOError:
+				return
+			except OSError:
+				self._remove_client(client)
+				return
+			client.current = client.current[sent:]
+			if len(client.current) == 0:
+				client.current = None
+
+	def _update_clients(self):
+		"""
+		Disconnects clients marked to be disconnected, and makes sure the selector waits for clients with queued
+		frames to be writable
+		"""
+		for client in list(self._clients.values()):
+			if client.disconnect:
+				log("Stream subscriber disconnected because it couldn't keep up")
+				self._remove_client(client)
+				continue
+			with self._lock:
+				waiting = client.current is not None or len(client.frames) > 0
+			events = selectors.EVENT_READ | (selectors.EVENT_WRITE if waiting else 0)
+			if self._selector.get_key(client.sock).events != events:
+				self._selector.modify(client.sock, events)
+
+	def _remove_client(self, client: _Client):
+		with self._lock:
+			self._clients.pop(client.sock, None)
+		try:
+			self._selector.unregister(client.sock)
+		except (KeyError, ValueError):
+			pass
+		if client.dropped > 0:
+			log("Dropped " + str(client.dropped) + " frames for a stream subscriber that couldn't keep up")
+		client.sock.close()
+
+
+class SampleStreamSubscriber:
+	"""
+	Receives the samples sent by a SampleStreamPublisher
+	"""
+
+	sock: socket.socket
+
+	def __init__(self, address: str, timeout: float = None):
+		"""
+		Connects to a publisher (see parse_address() for the address format).
+		timeout: Max number of seconds to wait when connecting and receiving frames. If not specified, calls block
+		until they are complete.
+		"""
+		family, sock_address = parse_address(address)
+		self.sock = socket.socket(family, socket.SOCK_STREAM)
+		self.sock.settimeout(timeout)
+		self.sock.connect(sock_address)
+
+	def read(self) -> "np.ndarray | None":
+		"""
+		Blocks until a frame is received.
+		return: Samples in the frame, as a structured array with the fields "time", "device", "attacks" and "power",
+		or None if the publisher closed the connection. If the timeout runs out, throws socket.timeout.
+		"""
+		length_data = self._recv_exact(LENGTH_STRUCT.size)
+		if length_data is None:
+			return None
+		frame = self._recv_exact(LENGTH_STRUCT.unpack(length_data)[0])
+		if frame is None:
+			return None
+		magic, version, count = FRAME_HEADER_STRUCT.unpack_from(frame)
+		if magic != FRAME_MAGIC or version != FRAME_VERSION:
+			raise ValueError("Received an invalid frame")
+		return np.frombuffer(frame, RECORD_DTYPE, count, FRAME_HEADER_STRUCT.size)
+
+	def close(self):
+		self.sock.close()
+
+	def _recv_exact(self, size: int) -> "bytes | None":
+		"""
+		Receives exactly size bytes. Returns None if the connection is closed before that.
+		"""
+		data = bytearray()
+		while len(data) < size:
+			chunk = self.sock.recv(size - len(data))
+			if chunk == b"":
+				return None
+			data += chunk
+		return bytes(data)
@@ -0,0 +1,293 @@
+import struct
+from typing import BinaryIO, Dict, List, Tuple
+
+import numpy as np
+
+"""
+Compact encoding for power traces. Entries are grouped in blocks, each one encoding three separate streams:
+	Timestamps: Delta-of-delta encoding. Since measurements are taken at a fixed interval, almost all the values are 0.
+	Power: Float32 values XORed with the previous one (as in Gorilla). Consecutive values usually share their sign,
+	exponent and most significant mantissa bits, so most bits of the result are 0.
+	Attacks: Run-length encoded, since the active attacks rarely change.
+Timestamp and power values are stored with a sparse bit packing: a bitmap marks the values that aren't 0, and those
+are stored using the minimum number of bits required by the largest one in the block, after removing the trailing
+bits that are 0 in all of them. Unlike in Gorilla, the bit window is shared by the whole block instead of being
+adjusted for each value, which allows decoding each block with a few vectorized NumPy operations.
+
+Block layout (little-endian):
+	Header (BLOCK_HEADER_STRUCT): magic, version, flags, number of entries, size of the body in bytes, timestamp of the
+	first entry, power bits of the first entry.
+	Body: Timestamp stream, power stream and, if FLAG_ATTACKS is set, attack stream.
+	Sparse stream (timestamps and power): SPARSE_HEADER_STRUCT (value width in bits, shift, number of non-zero values),
+	bitmap of non-zero values, packed non-zero values.
+	Attack stream: Number of runs (uint32), value of each run (uint32 array), length of each run (uint32 array).
+Blocks are independent from each other, so a file containing several of them can be decoded even if the last one
+was only partially written.
+"""
+
+MAGIC = b"TSC\0"
+VERSION = 1
+FLAG_ATTACKS = 1
+BLOCK_HEADER_STRUCT = struct.Struct("<4sBBxxIIqI")
+SPARSE_HEADER_STRUCT = struct.Struct("<BBxxI")
+RUN_COUNT_STRUCT = struct.Struct("<I")
+
+
+class CodecFormatError(Exception):
+	"""
+	Raised when trying to decode data that wasn't encoded with this codec
+	"""
+	pass
+
+
+class TimeSeriesEncoder:
+	"""
+	Streaming encoder. Entries are added one at a time (or in batches) and written to the output file as encoded
+	blocks once block_size of them have been added. Can be used by any DataWriter that writes to a binary file.
+	"""
+
+	file: BinaryIO
+	attack_column: bool
+	# Number of entries in each block. Larger blocks compress better, but entries stay in memory for longer.
+	block_size: int
+	# If > 0, power values are rounded to this many mantissa bits before being encoded. Removing the bits that are
+	# below the resolution of the sensor greatly reduces the size of the power stream.
+	mantissa_bits: int
+
+	# Entries waiting to be encoded
+	_times: List[int]
+	_attacks: List[int]
+	_powers: List[float]
+
+	def __init__(self, file: BinaryIO, attack_column: bool, block_size: int, mantissa_bits: int = 0):
+		"""
+		file: Binary file the encoded blocks will be written to
+		attack_column: True to encode the active attacks of each entry
+		"""
+		if not 0 <= mantissa_bits <= 23:
+			raise ValueError("Mantissa bits must be between 0 and 23")
+		self.file = file
+		self.attack_column = attack_column
+		self.block_size = block_size
+		self.mantissa_bits = mantissa_bits
+		self._times = []
+		self._attacks = []
+		self._powers = []
+
+	def __len__(self) -> int:
+		"""
+		Returns the number of entries that haven't been written to the file yet
+		"""
+		return len(self._times)
+
+	def add(self, power: "float | None", attacks: int, timestamp: int):
+		"""
+		Adds an entry. If it completes a block, the block is written to the file.
+		power: Power usage of the device. None if the measurement couldn't be taken.
+		attacks: Active attacks on the device, or -1 if unknown
+		timestamp: Timestamp of the entry (in ms)
+		"""
+		self._times.append(timestamp)
+		self._attacks.append(0 if attacks == -1 else attacks)
+		self._powers.append(np.nan if power is None else power)
+		if len(self._times) >= self.block_size:
+			self.flush()
+
+	def add_batch(self, rows: List[Tuple["float | None", int, int]]):
+		"""
+		Adds several entries at once
+		rows: List of (power, attacks, timestamp) tuples
+		"""
+		for power, attacks, timestamp in rows:
+			self.add(power, attacks, timestamp)
+
+	def flush(self):
+		"""
+		Encodes the pending entries as a block (which might be smaller than block_size) and writes it to the file
+		"""
+		if len(self._times) > 0:
+			powers = np.array(self._powers, np.float32)
+			if self.mantissa_bits > 0:
+				powers = round_mantissa(powers, self.mantissa_bits)
+			self.file.write(encode_block(np.array(self._times, np.int64), powers,
+				np.array(self._attacks, np.uint32) if self.attack_column else None))
+			self.file.flush()
+			self._times = []
+			self._attacks = []
+			self._powers = []
+
+
+def round_mantissa(values: np.ndarray, mantissa_bits: int) -> np.ndarray:
+	"""
+	Rounds float32 values so only the specified number of mantissa bits can be different from 0.
+	NaN and infinite values are kept as is.
+	"""
+	bits = values.view(np.uint32)
+	drop = 23 - mantissa_bits
+	if drop == 0:
+		return values.copy()
+	half = np.uint32(1 << (drop - 1))
+	mask = np.uint32((0xFFFFFFFF << drop) & 0xFFFFFFFF)
+	rounded = ((bits + half) & mask).view(np.float32)
+	return np.where(np.isfinite(values), rounded, values)
+
+
+def encode_block(times: np.ndarray, powers: np.ndarray, attacks: "np.ndarray | None") -> bytes:
+	"""
+	Encodes a block of entries
+	times: Timestamps (int64)
+	powers: Power values (float32). NaN for missing measurements.
+	attacks: Active attacks (uint32), or None to leave them out
+	"""
+	count = len(times)
+	deltas = np.diff(times)
+	dods = np.diff(deltas, prepend=np.int64(0))
+	power_bits = powers.view(np.uint32)
+	body = [
+		_pack_sparse(_zigzag(dods)),
+		_pack_sparse((power_bits[1:] ^ power_bits[:-1]).astype(np.uint64))
+	]
+	flags = 0
+	if attacks is not None:
+		flags |= FLAG_ATTACKS
+		body.append(_encode_runs(attacks))
+	body = b"".join(body)
+	return BLOCK_HEADER_STRUCT.pack(MAGIC, VERSION, flags, count, len(body), int(times[0]), int(power_bits[0])) + body
+
+
+def decode(data: bytes) -> Dict[str, np.ndarray]:
+	"""
+	Decodes all the blocks in a buffer. A block at the end that has only been partially written is ignored.
+	If the data wasn't encoded with this codec, throws CodecFormatError.
+	return: Dict containing the "time" (int64), "power" (float32) and, if all the blocks include them, "attacks"
+	(uint32) columns.
+	"""
+	blocks = []
+	offset = 0
+	while offset + BLOCK_HEADER_STRUCT.size <= len(data):
+		block, size = decode_block(data, offset)
+		if block is None:
+			break
+		blocks.append(block)
+		offset += size
+
+	if len(blocks) == 0:
+		return {"time": np.zeros(0, np.int64), "power": np.zeros(0, np.float32)}
+	columns = {"time": np.concatenate([b["time"] for b in blocks]),
+		"power": np.concatenate([b["power"] for b in blocks])}
+	if all(["attacks" in b for b in blocks]):
+		columns["attacks"] = np.concatenate([b["attacks"] for b in blocks])
+	return columns
+
+
+def decode_file(file_path: str) -> Dict[str, np.ndarray]:
+	"""
+	Decodes a file written by TimeSeriesEncoder. See decode().
+	"""
+	with open(file_path, "rb") as file:
+		return decode(file.read())
+
+
+def decode_block(data: bytes, offset: int = 0) -> Tuple["Dict[str, np.ndarray] | None", int]:
+	"""
+	Decodes the block that starts at the given offset.
+	If the data wasn't encoded with this codec, throws CodecFormatError.
+	return: Decoded columns (see decode()) and total size of the block, or (None, 0) if the block is incomplete.
+	"""
+	if offset + BLOCK_HEADER_STRUCT.size > len(data):
+		return None, 0
+	magic, version, flags, count, body_size, first_time, first_power = \
+		BLOCK_HEADER_STRUCT.unpack_from(data, offset)
+	if magic != MAGIC:
+		raise CodecFormatError("Invalid block at offset " + str(offset))
+	if version != VERSION:
+		raise CodecFormatError("Unsupported codec version: " + str(version))
+	start = offset + BLOCK_HEADER_STRUCT.size
+	end = start + body_size
+	if end > len(data):
+		return None, 0
+
+	dods, pos = _unpack_sparse(data, start, count - 1)
+	xors, pos = _unpack_sparse(data, pos, count - 1)
+	times = np.empty(count, np.int64)
+	times[0] = first_time
+	times[1:] = first_time + np.cumsum(np.cumsum(_unzigzag(dods)))
+	power_bits = np.empty(count, np.uint32)
+	power_bits[0] = first_power
+	power_bits[1:] = xors.astype(np.uint32)
+	columns = {"time": times, "power": np.bitwise_xor.accumulate(power_bits).view(np.float32)}
+	if flags & FLAG_ATTACKS:
+		columns["attacks"], pos = _decode_runs(data, pos)
+	return columns, end - offset
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+	"""
+	Maps signed values to unsigned ones so values close to 0 stay small (0, -1, 1, -2... -> 0, 1, 2, 3...)
+	"""
+	return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+	return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _pack_sparse(values: np.ndarray) -> bytes:
+	"""
+	Packs uint64 values using the sparse bit packing described in the module description
+	"""
+	present = values != 0
+	non_zero = values[present]
+	combined = int(np.bitwise_or.reduce(non_zero)) if len(non_zero) > 0 else 0
+	shift = 0
+	if combined != 0:
+		shift = (combined & -combined).bit_length() - 1
+	width = (combined >> shift).bit_length()
+
+	bitmap = np.packbits(present).tobytes()
+	if width > 0:
+		shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+		bits = ((non_zero[:, None] >> np.uint64(shift)) >> shifts) & np.uint64(1)
+		packed = np.packbits(bits.astype(np.uint8)).tobytes()
+	else:
+		packed = b""
+	return SPARSE_HEADER_STRUCT.pack(width, shift, len(non_zero)) + bitmap + packed
+
+
+def _unpack_sparse(data: bytes, offset: int, count: int) -> Tuple[np.ndarray, int]:
+	"""
+	Unpacks count values packed by _pack_sparse() starting at the given offset.
+	return: Values (uint64) and offset of the first byte after them
+	"""
+	width, shift, num_non_zero = SPARSE_HEADER_STRUCT.unpack_from(data, offset)
+	offset += SPARSE_HEADER_STRUCT.size
+	bitmap_size = (count + 7) // 8
+	present = np.unpackbits(np.frombuffer(data, np.uint8, bitmap_size, offset), count=count).astype(bool)
+	offset += bitmap_size
+
+	values = np.zeros(count, np.uint64)
+	if width > 0:
+		packed_size = (num_non_zero * width + 7) // 8
+		bits = np.unpackbits(np.frombuffer(data, np.uint8, packed_size, offset), count=num_non_zero * width)
+		offset += packed_size
+		shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+		non_zero = np.bitwise_or.reduce(bits.reshape(num_non_zero, width).astype(np.uint64) << shifts, axis=1)
+		values[present] = non_zero << np.uint64(shift)
+	return values, offset
+
+
+def _encode_runs(values: np.ndarray) -> bytes:
+	starts = np.concatenate(([0], np.flatnonzero(np.diff(values)) + 1))
+	lengths = np.diff(np.append(starts, len(values)))
+	return RUN_COUNT_STRUCT.pack(len(starts)) + values[starts].astype("<u4").tobytes() + \
+		lengths.astype("<u4").tobytes()
+
+
+def _decode_runs(data: bytes, offset: int) -> Tuple[np.ndarray, int]:
+	num_runs, = RUN_COUNT_STRUCT.unpack_from(data, offset)
+	offset += RUN_COUNT_STRUCT.size
+	run_values = np.frombuffer(data, "<u4", num_runs, offset)
+	offset += num_runs * 4
+	lengths = np.frombuffer(data, "<u4", num_runs, offset)
+	offset += num_runs * 4
+	return np.repeat(run_values, lengths).astype(np.uint32), offset
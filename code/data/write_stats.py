@@ -0,0 +1,51 @@
+class WriteStats:
+	"""
+	Statistics about the flush and fsync operations performed by a DataWriter
+	"""
+
+	# Number of times buffered lines have been written to the file
+	flushes: int
+	# Total amount of lines written by all flushes
+	flushed_lines: int
+	# Accumulated and max time spent on flushes, in ns
+	flush_time_sum_ns: int
+	flush_time_max_ns: int
+	# Number of times the file has been synced to disk
+	fsyncs: int
+	# Accumulated and max time spent on fsyncs, in ns
+	fsync_time_sum_ns: int
+	fsync_time_max_ns: int
+
+	def __init__(self):
+		self.flushes = 0
+		self.flushed_lines = 0
+		self.flush_time_sum_ns = 0
+		self.flush_time_max_ns = 0
+		self.fsyncs = 0
+		self.fsync_time_sum_ns = 0
+		self.fsync_time_max_ns = 0
+
+	def add_flush(self, lines: int, time_ns: int):
+		self.flushes += 1
+		self.flushed_lines += lines
+		self.flush_time_sum_ns += time_ns
+		if time_ns > self.flush_time_max_ns:
+			self.flush_time_max_ns = time_ns
+
+	def add_fsync(self, time_ns: int):
+		self.fsyncs += 1
+		self.fsync_time_sum_ns += time_ns
+		if time_ns > self.fsync_time_max_ns:
+			self.fsync_time_max_ns = time_ns
+
+	def get_flush_mean_ms(self) -> float:
+		return 0 if self.flushes == 0 else self.flush_time_sum_ns / self.flushes / 1e6
+
+	def get_fsync_mean_ms(self) -> float:
+		return 0 if self.fsyncs == 0 else self.fsync_time_sum_ns / self.fsyncs / 1e6
+
+	def __str__(self) -> str:
+		return "Flushes: " + str(self.flushes) + " (" + str(self.flushed_lines) + " lines), flush time (ms): mean " + \
+			"{:.3f}".format(self.get_flush_mean_ms()) + ", max " + "{:.3f}".format(self.flush_time_max_ns / 1e6) + \
+			", fsyncs: " + str(self.fsyncs) + ", fsync time (ms): mean " + \
+			"{:.3f}".format(self.get_fsync_mean_ms()) + ", max " + "{:.3f}".format(self.fsync_time_max_ns / 1e6)
@@ -0,0 +1,120 @@
+from threading import Thread, Event
+from typing import Callable, Dict, List, Set, Tuple
+
+from data.data_writer import DataWriter
+from data.sample_consumer import SampleConsumer
+from data.sample_ring import SampleRing
+from defs.utils import log
+
+
+class WriterThread:
+	"""
+	Writer stage of the acquisition pipeline. Runs on its own thread, draining the samples pushed to a SampleRing in
+	batches and passing them to the DataWriter of their device. This way, slow writes don't delay measurements.
+	If a writer or consumer throws an exception, the error is logged and that output is disabled, while the rest keep
+	receiving samples.
+	"""
+
+	ring: SampleRing
+	# Writer used for each device, indexed by device number. Can be empty if the output is written by a consumer
+	# instead (see MultiplexedDataWriter).
+	writers: Dict[int, DataWriter]
+	# Additional stages that receive every batch of samples
+	consumers: List[SampleConsumer]
+	# Max number of samples written on each batch
+	batch_size: int
+	# Max number of seconds samples can stay in the ring before being written
+	flush_interval: float
+
+	# Writers and consumers that threw an exception and no longer receive samples, identified by id()
+	_failed: Set[int]
+	_thread: "Thread | None"
+	_wakeup: Event
+	_stop_flag: Event
+
+	def __init__(self, ring: SampleRing, writers: Dict[int, DataWriter], batch_size: int, flush_interval: float,
+		consumers: List[SampleConsumer] = None):
+		self.ring = ring
+		self.writers = writers
+		self.consumers = [] if consumers is None else consumers
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self._failed = set()
+		self._thread = None
+		self._wakeup = Event()
+		self._stop_flag = Event()
+
+	def start(self):
+		self._stop_flag.clear()
+		self._thread = Thread(target=self._run)
+		self._thread.start()
+
+	def notify(self):
+		"""
+		Wakes up the thread if enough samples are waiting to fill a batch. Should be called after pushing samples
+		to the ring.
+		"""
+		if len(self.ring) >= self.batch_size:
+			self._wakeup.set()
+
+	def stop(self):
+		"""
+		Writes all the samples left in the ring, stops the thread and closes the consumers
+		"""
+		if self._thread is not None:
+			self._stop_flag.set()
+			self._wakeup.set()
+			self._thread.join()
+			self._thread = None
+			# Failed consumers are closed as well, to release their resources
+			self._failed.clear()
+			for consumer in self.consumers:
+				self._call(consumer, consumer.close)
+
+	def _run(self):
+		while not self._stop_flag.is_set():
+			self._wakeup.wait(self.flush_interval)
+			self._wakeup.clear()
+			self._drain()
+			for writer in self.writers.values():
+				self._call(writer, writer.poll)
+			for consumer in self.consumers:
+				self._call(consumer, consumer.poll)
+		# Write anything that was pushed before the thread was stopped
+		self._drain()
+
+	def _drain(self):
+		while len(self.ring) > 0:
+			batch = self.ring.pop_batch(self.batch_size)
+			if len(self.writers) > 0:
+				self._write(batch)
+			for consumer in self.consumers:
+				self._call(consumer, consumer.consume, batch)
+
+	def _write(self, batch: List[Tuple[int, int, "float | None", int]]):
+		"""
+		Passes a batch of samples to the writers of their devices
+		"""
+		# Group the samples by device so each writer receives a single batch
+		batches = {}
+		for timestamp, device_num, power, attacks in batch:
+			batches.setdefault(device_num, []).append((power, attacks, timestamp))
+		for device_num, rows in batches.items():
+			writer = self.writers.get(device_num)
+			if writer is None:
+				log("Error: Received a sample for device " + str(device_num) + ", which has no output file")
+			else:
+				self._call(writer, writer.write_batch, rows)
+
+	def _call(self, output: "DataWriter | SampleConsumer", method: Callable, *args):
+		"""
+		Calls a method of a writer or consumer, unless it has failed before. If the method throws an exception, the
+		error is logged and the output is disabled.
+		"""
+		if id(output) in self._failed:
+			return
+		try:
+			method(*args)
+		except Exception as e:
+			self._failed.add(id(output))
+			log("Error: " + type(output).__name__ + " failed and will be disabled: " + repr(e))
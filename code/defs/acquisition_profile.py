@@ -0,0 +1,62 @@
+from defs.exceptions import ConfigurationError
+
+
+class AcquisitionProfile:
+	"""
+	Set of sensor settings that determine how power usage is measured. Profiles are declared in the config file and
+	selected when running the main loop.
+	The channels enabled on each sensor are not part of the profile, since they depend on which devices are connected
+	to each sensor (see MeasuredDevice).
+	"""
+
+	# Averaging count, conversion times (in µs) and modes supported by the sensor
+	AVERAGING_VALUES = [1, 4, 16, 64, 128, 256, 512, 1024]
+	CONVERSION_TIME_VALUES = [140, 204, 332, 588, 1100, 2116, 4156, 8244]
+	MODE_SHUNT_BUS = "shunt-bus"
+	MODE_SHUNT = "shunt"
+
+	name: str
+	# Number of samples averaged by the sensor for each value
+	averaging: int
+	# Time spent measuring each bus voltage value, in µs
+	bus_conversion_time: int
+	# Time spent measuring each shunt voltage value, in µs
+	shunt_conversion_time: int
+	# Values measured continuously by the sensor (MODE_SHUNT_BUS or MODE_SHUNT)
+	mode: str
+
+	def __init__(self, name: str, averaging: int, bus_conversion_time: int, shunt_conversion_time: int, mode: str):
+		"""
+		Creates a new profile. If any of the values is not supported by the sensor, throws ConfigurationError.
+		"""
+		if averaging not in self.AVERAGING_VALUES:
+			raise ConfigurationError("Invalid averaging value in acquisition profile \"" + name + "\": " +
+				str(averaging) + ". Possible values: " + ", ".join([str(v) for v in self.AVERAGING_VALUES]))
+		for conversion_time in (bus_conversion_time, shunt_conversion_time):
+			if conversion_time not in self.CONVERSION_TIME_VALUES:
+				raise ConfigurationError("Invalid conversion time in acquisition profile \"" + name + "\": " +
+					str(conversion_time) + ". Possible values: " +
+					", ".join([str(v) for v in self.CONVERSION_TIME_VALUES]))
+		if mode != self.MODE_SHUNT_BUS and mode != self.MODE_SHUNT:
+			raise ConfigurationError("Invalid mode in acquisition profile \"" + name + "\": " + mode + ". Possible "
+				"values: " + self.MODE_SHUNT_BUS + ", " + self.MODE_SHUNT)
+
+		self.name = name
+		self.averaging = averaging
+		self.bus_conversion_time = bus_conversion_time
+		self.shunt_conversion_time = shunt_conversion_time
+		self.mode = mode
+
+	def measures_bus_voltage(self) -> bool:
+		return self.mode == self.MODE_SHUNT_BUS
+
+	def get_conversion_time(self, num_channels: int) -> float:
+		"""
+		Returns the time it takes a sensor to produce a new value for all of its enabled channels with this profile,
+		in seconds. This is the shortest measurement delay that can be used without reading duplicate values.
+		num_channels: Number of channels enabled on the sensor
+		"""
+		channel_time = self.shunt_conversion_time
+		if self.measures_bus_voltage():
+			channel_time += self.bus_conversion_time
+		return channel_time * self.averaging * num_channels / 1e6
@@ -1,9 +1,11 @@
 import xml.etree.ElementTree as ElementTree
 
-from typing import List
+from typing import Dict, List
 from xml.etree.ElementTree import Element
 
 from attacks.attack_type import AttackType
+from defs.acquisition_profile import AcquisitionProfile
+from defs.measured_device import MeasuredDevice
 from defs.exceptions import ConfigurationError
 
 # Config file location
@@ -46,6 +48,12 @@ class Config:
 	remote_python_command: str
 	# Power measurement delay
 	measurement_delay: float
+	# Sensor channel used to measure each device. Element 0 corresponds to device 1.
+	measured_devices: List[MeasuredDevice]
+	# Sensor acquisition profiles, indexed by name
+	acquisition_profiles: Dict[str, AcquisitionProfile]
+	# Name of the profile used when none is specified
+	default_acquisition_profile: str
 
 	def __init__(self):
 		"""
@@ -84,6 +92,27 @@ class Config:
 		self.remote_python_command = root.find("RemotePythonCommand").text
 		self.measurement_delay = float(root.find("MeasurementDelay").text)
 
+		measured_devices_element = root.find("MeasuredDevices")
+		self.measured_devices = []
+		for i, device_element in enumerate(measured_devices_element.findall("Device")):
+			self.measured_devices.append(MeasuredDevice(i + 1, int(device_element.find("Bus").text),
+				int(device_element.find("Address").text, 0), int(device_element.find("Channel").text)))
+		self._check_measured_devices()
+
+		profiles_element = root.find("AcquisitionProfiles")
+		self.acquisition_profiles = {}
+		for profile_element in profiles_element.findall("Profile"):
+			name = profile_element.get("name")
+			self.acquisition_profiles[name] = AcquisitionProfile(name,
+				int(profile_element.find("Averaging").text),
+				int(profile_element.find("BusConversionTime").text),
+				int(profile_element.find("ShuntConversionTime").text),
+				profile_element.find("Mode").text)
+		self.default_acquisition_profile = profiles_element.get("default")
+		if self.default_acquisition_profile not in self.acquisition_profiles:
+			raise ConfigurationError("The default acquisition profile (\"" + str(self.default_acquisition_profile) +
+				"\") must be one of the profiles listed in \"AcquisitionProfiles\".")
+
 	@classmethod
 	def get(cls):
 		"""
@@ -115,6 +144,22 @@ class Config:
 		else:
 			raise ValueError("Attack " + attack.name + " does not require sending a file.")
 
+	def _check_measured_devices(self):
+		"""
+		Ensures that at least one measured device is specified and that no sensor channel is used by more than one
+		device. Throws ConfigurationError otherwise.
+		"""
+		if len(self.measured_devices) == 0:
+			raise ConfigurationError("At least one device must be specified in \"MeasuredDevices\".")
+		used_channels = {}
+		for device in self.measured_devices:
+			key = (device.bus, device.address, device.channel)
+			if key in used_channels:
+				raise ConfigurationError("Devices " + str(used_channels[key]) + " and " + str(device.device_num) +
+					" are both assigned to channel " + str(device.channel) + " of the sensor at address " +
+					hex(device.address) + " on bus " + str(device.bus) + ".")
+			used_channels[key] = device.device_num
+
 	def _set_files_to_send(self, parent_element: Element, attack: AttackType):
 		"""
 		Given a config XML element that might contain child <FileToSend> and <FilesToSend> tags, sets the appropriate
@@ -9,6 +9,52 @@ class Constants:
 	ATTACK_FOLDER = "data/attacks"
 	# Prefix of the name used for active attack files
 	ATTACK_FILE_PREFIX = "attack-"
+	# Seconds between full rescans of the attack folder performed to keep the active attack cache up to date
+	ATTACK_RESCAN_INTERVAL = 1
+	# Max number of samples that can be waiting to be written. If more samples are read, they will be dropped.
+	SAMPLE_RING_CAPACITY = 4096
+	# Max number of samples written to the output files at once
+	WRITER_BATCH_SIZE = 64
+	# Max number of seconds a sample can wait before being written
+	WRITER_FLUSH_INTERVAL = 0.5
+	# Max number of lines kept in memory by a StandardDataWriter before writing them to its file
+	FILE_FLUSH_COUNT = 256
+	# Max number of seconds a line can be kept in memory by a StandardDataWriter before being written to its file
+	FILE_FLUSH_INTERVAL = 1
+	# Seconds between syncs of StandardDataWriter files to disk
+	FILE_FSYNC_INTERVAL = 10
+	# Max number of entries in each chunk written by a ColumnarDataWriter
+	COLUMNAR_CHUNK_SIZE = 65536
+	# Max number of seconds an entry can be kept in memory by a ColumnarDataWriter before its chunk is written
+	COLUMNAR_CHUNK_INTERVAL = 60
+	# Number of entries in each block written by an EncodedDataWriter
+	CODEC_BLOCK_SIZE = 4096
+	# Max number of seconds an entry can be kept in memory by an EncodedDataWriter before being written
+	CODEC_FLUSH_INTERVAL = 60
+	# Name of the shared memory used to publish the live feed of samples
+	FEED_NAME = "iot-power-feed"
+	# Number of samples kept in the live feed. Subscribers that fall further behind lose samples.
+	FEED_CAPACITY = 65536
+	# Max number of seconds feed subscribers wait before checking for new samples if they don't receive a wakeup
+	FEED_POLL_INTERVAL = 1
+	# Max number of samples sent to stream subscribers in each frame
+	STREAM_BATCH_COUNT = 64
+	# Max number of seconds a sample can wait before being sent to stream subscribers
+	STREAM_BATCH_INTERVAL = 0.2
+	# Max number of frames queued for each stream subscriber
+	STREAM_QUEUE_FRAMES = 256
+	# Size of the buckets of the rollups written when running with --rollups, in ms
+	ROLLUP_RESOLUTIONS = [1000, 10000, 60000]
+	# Max number of seconds completed rollup buckets are kept in memory before being written
+	ROLLUP_FLUSH_INTERVAL = 10
+	# Number of samples in each window used to compute features when running with --features
+	FEATURE_WINDOW_SIZE = 256
+	# Number of samples between consecutive feature windows of the same device
+	FEATURE_HOP_SIZE = 64
+	# Number of frequency bands whose energy is included in the features
+	FEATURE_SPECTRAL_BANDS = 4
+	# Max number of bytes of text parsed at once by the readers in data/fast_reader.py
+	READER_CHUNK_SIZE = 4 * 1024 * 1024
 	# Keyword written to a prediction buffer to signal that the execution is over
 	BUFFER_OVER_KEYWORD = "END"
 
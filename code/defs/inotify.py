@@ -0,0 +1,110 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+from typing import List, Tuple
+
+"""
+Minimal wrapper around the Linux inotify API, accessed through ctypes since the standard library doesn't expose it.
+Used to get notified when files are created or deleted inside a folder without having to poll it.
+"""
+
+# Event masks (see inotify(7))
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+# Header of a struct inotify_event: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def is_available() -> bool:
+	"""
+	Returns true if inotify can be used on this system
+	"""
+	return _get_libc() is not None
+
+
+def _get_libc():
+	global _libc
+	if _libc is None:
+		lib_name = ctypes.util.find_library("c")
+		if lib_name is None:
+			return None
+		try:
+			libc = ctypes.CDLL(lib_name, use_errno=True)
+			# Accessing a missing symbol raises AttributeError (e.g. on non-Linux systems)
+			libc.inotify_init1.argtypes = [ctypes.c_int]
+			libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+		except (OSError, AttributeError):
+			return None
+		_libc = libc
+	return _libc
+
+
+class INotify:
+	"""
+	Represents an inotify instance watching one or more paths. The file descriptor can be passed to select() to
+	wait for events.
+	"""
+
+	fd: int
+
+	def __init__(self):
+		"""
+		Creates a new inotify instance. Throws OSError if inotify is not available or the instance can't be created.
+		"""
+		libc = _get_libc()
+		if libc is None:
+			raise OSError("inotify is not available on this system")
+		fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if fd < 0:
+			errno = ctypes.get_errno()
+			raise OSError(errno, os.strerror(errno))
+		self.fd = fd
+
+	def add_watch(self, path: str, mask: int) -> int:
+		"""
+		Starts watching the specified path for the events included in the mask. Returns the watch descriptor.
+		"""
+		wd = _get_libc().inotify_add_watch(self.fd, os.fsencode(path), mask)
+		if wd < 0:
+			errno = ctypes.get_errno()
+			raise OSError(errno, os.strerror(errno), path)
+		return wd
+
+	def read_events(self) -> List[Tuple[int, int, str]]:
+		"""
+		Reads all the events that are currently pending. Does not block if there are no events.
+		return: List of (watch descriptor, mask, file name) tuples. The name is empty for events that refer to the
+		watched path itself.
+		"""
+		try:
+			data = os.read(self.fd, _READ_SIZE)
+		except BlockingIOError:
+			return []
+
+		events = []
+		pos = 0
+		while pos + _EVENT_HEADER.size <= len(data):
+			wd, mask, _cookie, name_len = _EVENT_HEADER.unpack_from(data, pos)
+			pos += _EVENT_HEADER.size
+			name = data[pos:pos + name_len].rstrip(b"\0").decode("utf-8", "replace")
+			pos += name_len
+			events.append((wd, mask, name))
+		return events
+
+	def close(self):
+		os.close(self.fd)
@@ -0,0 +1,28 @@
+from defs.exceptions import ConfigurationError
+
+
+class MeasuredDevice:
+	"""
+	Represents the sensor channel used to read the power usage of a device
+	"""
+
+	# Number that identifies the device
+	device_num: int
+	# Number of the I2C bus the sensor is connected to
+	bus: int
+	# I2C address of the sensor
+	address: int
+	# Sensor channel the device is connected to
+	channel: int
+
+	def __init__(self, device_num: int, bus: int, address: int, channel: int):
+		"""
+		Creates a new instance. If the channel is not valid, throws ConfigurationError.
+		"""
+		if channel < 1 or channel > 3:
+			raise ConfigurationError("Invalid sensor channel for device " + str(device_num) + ": " + str(channel) +
+				". Channels must be between 1 and 3.")
+		self.device_num = device_num
+		self.bus = bus
+		self.address = address
+		self.channel = channel
@@ -0,0 +1,193 @@
+import math
+import time
+from enum import Enum
+
+from defs.utils import log
+
+
+class OverrunPolicy(Enum):
+	"""
+	Determines what a DeadlineScheduler does when one or more ticks are missed because the previous one took too long
+	"""
+	SKIP = 0  # Skip the missed ticks and wait for the next deadline on the original schedule
+	CATCH_UP = 1  # Run the missed ticks immediately, one after another, until the schedule is met again
+	STRETCH = 2  # Shift the schedule so the next tick takes place one period after the current time
+
+	@classmethod
+	def from_str(cls, string: str):
+		"""
+		Given the name of a policy (skip, catch-up or stretch), returns the corresponding enum value.
+		If the input doesn't represent a valid policy, throws ValueError.
+		"""
+		if string == "skip":
+			return cls.SKIP
+		elif string == "catch-up":
+			return cls.CATCH_UP
+		elif string == "stretch":
+			return cls.STRETCH
+		else:
+			raise ValueError("Unrecognized overrun policy: " + string)
+
+
+class SchedulerStats:
+	"""
+	Timing statistics collected by a DeadlineScheduler
+	"""
+
+	# Number of ticks that have been run
+	ticks: int
+	# Number of times a deadline had already passed when the scheduler was asked to wait for it
+	overruns: int
+	# Number of ticks skipped because of overruns (only when using OverrunPolicy.SKIP)
+	missed_ticks: int
+	# Accumulated delay between each deadline and the moment the tick actually started, in ns
+	jitter_sum_ns: int
+	# Accumulated squared delay, used to compute the standard deviation
+	jitter_sq_sum_ns: int
+	# Max delay between a deadline and the moment the tick actually started, in ns
+	jitter_max_ns: int
+	# Max amount of time a deadline was exceeded by, in ns
+	overrun_max_ns: int
+
+	def __init__(self):
+		self.ticks = 0
+		self.overruns = 0
+		self.missed_ticks = 0
+		self.jitter_sum_ns = 0
+		self.jitter_sq_sum_ns = 0
+		self.jitter_max_ns = 0
+		self.overrun_max_ns = 0
+
+	def add_jitter(self, jitter_ns: int):
+		self.ticks += 1
+		self.jitter_sum_ns += jitter_ns
+		self.jitter_sq_sum_ns += jitter_ns * jitter_ns
+		if jitter_ns > self.jitter_max_ns:
+			self.jitter_max_ns = jitter_ns
+
+	def add_overrun(self, overrun_ns: int, missed_ticks: int):
+		self.overruns += 1
+		self.missed_ticks += missed_ticks
+		if overrun_ns > self.overrun_max_ns:
+			self.overrun_max_ns = overrun_ns
+
+	def get_jitter_mean_ms(self) -> float:
+		return 0 if self.ticks == 0 else self.jitter_sum_ns / self.ticks / 1e6
+
+	def get_jitter_std_ms(self) -> float:
+		if self.ticks == 0:
+			return 0
+		mean = self.jitter_sum_ns / self.ticks
+		return math.sqrt(max(0.0, self.jitter_sq_sum_ns / self.ticks - mean * mean)) / 1e6
+
+	def __str__(self) -> str:
+		return "Ticks: " + str(self.ticks) + ", overruns: " + str(self.overruns) + ", missed ticks: " + \
+			str(self.missed_ticks) + ", jitter (ms): mean " + "{:.3f}".format(self.get_jitter_mean_ms()) + \
+			", std " + "{:.3f}".format(self.get_jitter_std_ms()) + ", max " + \
+			"{:.3f}".format(self.jitter_max_ns / 1e6) + ", max overrun (ms): " + \
+			"{:.3f}".format(self.overrun_max_ns / 1e6)
+
+
+class DeadlineScheduler:
+	"""
+	Class used to run a loop at a fixed rate. Deadlines are computed as absolute times on a monotonic clock
+	(start + tick * period), so the time spent on each tick doesn't accumulate as drift and changes to the system
+	clock don't affect the spacing between ticks.
+	Usage: call start(), then call next_tick() at the start of each iteration until finished() returns true.
+	"""
+
+	# Time between ticks, in ns
+	period_ns: int
+	policy: OverrunPolicy
+	# Total number of ticks to run (including skipped ones), or -1 to run indefinitely
+	num_ticks: int
+	# Number of the current tick, with the first tick being #0. -1 if next_tick() hasn't been called yet.
+	tick: int
+	stats: SchedulerStats
+
+	# Monotonic time of tick #0, in ns
+	_start_ns: int
+	# Wall clock time of tick #0, in ns. Used to compute the timestamp of each tick.
+	_start_wall_ns: int
+
+	def __init__(self, period: float, policy: OverrunPolicy = OverrunPolicy.SKIP, num_ticks: int = -1):
+		"""
+		period: Time between ticks, in seconds
+		policy: What to do when a tick takes longer than the period
+		num_ticks: Total number of ticks to run, or -1 to run until the caller stops calling next_tick()
+		"""
+		if period <= 0:
+			raise ValueError("Period must be positive")
+		self.period_ns = int(period * 1e9)
+		self.policy = policy
+		self.num_ticks = num_ticks
+		self.tick = -1
+		self.stats = SchedulerStats()
+		self._start_ns = 0
+		self._start_wall_ns = 0
+
+	def start(self):
+		"""
+		Sets the current time as the deadline for the first tick
+		"""
+		self._start_ns = time.monotonic_ns()
+		self._start_wall_ns = time.time_ns()
+		self.tick = -1
+
+	def finished(self) -> bool:
+		"""
+		Returns true if all the ticks specified when creating the instance have been run
+		"""
+		return self.num_ticks != -1 and self.tick + 1 >= self.num_ticks
+
+	def next_tick(self) -> int:
+		"""
+		Waits until the deadline of the next tick and advances to it.
+		return: Number of ticks that were skipped before this one. They are the ticks right before the current one
+		(self.tick). Always 0 unless the policy is OverrunPolicy.SKIP.
+		"""
+		next_tick = self.tick + 1
+		now = time.monotonic_ns()
+		late_ns = now - self._get_deadline(next_tick)
+		skipped = 0
+
+		if late_ns > 0 and self.tick != -1:
+			# The previous tick didn't end before this deadline
+			if self.policy == OverrunPolicy.SKIP:
+				# Skip all the deadlines that have already passed, except for the most recent one
+				skipped = late_ns // self.period_ns
+				if self.num_ticks != -1:
+					skipped = min(skipped, self.num_ticks - 1 - next_tick)
+			elif self.policy == OverrunPolicy.STRETCH:
+				# Move the schedule so the current tick happens right now
+				self._start_ns += late_ns
+				self._start_wall_ns += late_ns
+			self.stats.add_overrun(late_ns, skipped)
+			if skipped > 0:
+				log("Warning: Can't keep up with the set measurement delay! " + str(skipped) +
+					" measurement(s) were skipped.")
+			elif self.policy == OverrunPolicy.STRETCH:
+				log("Warning: Can't keep up with the set measurement delay! " + str(late_ns / 1e6) +
+					" ms of additional delay were introduced.")
+			next_tick += skipped
+		else:
+			# Sleep until the deadline
+			while late_ns < 0:
+				time.sleep(-late_ns / 1e9)
+				late_ns = time.monotonic_ns() - self._get_deadline(next_tick)
+
+		self.tick = next_tick
+		self.stats.add_jitter(max(0, time.monotonic_ns() - self._get_deadline(next_tick)))
+		return skipped
+
+	def get_tick_timestamp(self, tick: int = None) -> int:
+		"""
+		Returns the nominal timestamp of a tick (the moment it was scheduled to run) as UNIX time in ms.
+		tick: Tick whose timestamp should be returned. Defaults to the current tick.
+		"""
+		if tick is None:
+			tick = self.tick
+		return (self._start_wall_ns + tick * self.period_ns) // 1000000
+
+	def _get_deadline(self, tick: int) -> int:
+		return self._start_ns + tick * self.period_ns
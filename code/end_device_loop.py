@@ -5,8 +5,8 @@ import sys
 import time
 
 from data.buffer_data_writer import BufferDataWriter
-from defs.utils import log
 from defs.config import Config as Cfg
+from defs.scheduler import DeadlineScheduler
 
 """
 Script run by an end device. It generates fake power usage data and writes it to a cyclic buffer CSV file.
@@ -47,8 +47,16 @@ def run(output_path: str, buffer_size: int):
 	time_until_status_change = random.randrange(10, 21)
 	last_print = math.ceil(time_until_status_change)
 
+	scheduler = DeadlineScheduler(get_measurement_delay())
+	scheduler.start()
+	last_tick_time = time.monotonic()
 	while True:
-		time_start = time.time()
+		skipped = scheduler.next_tick()
+		for tick in range(scheduler.tick - skipped, scheduler.tick):
+			writer.write_gap(scheduler.get_tick_timestamp(tick))
+		time_start = time.monotonic()
+		time_until_status_change -= time_start - last_tick_time
+		last_tick_time = time_start
 
 		if time_until_status_change <= 0:
 			time_until_status_change = random.randrange(10, 21)
@@ -60,18 +68,21 @@ def run(output_path: str, buffer_size: int):
 				str(math.floor(time_until_status_change)))
 			last_print = math.floor(time_until_status_change)
 
-		writer.write(random.randrange(400, 651) if attack_status else 300)
+		writer.write(random.randrange(400, 651) if attack_status else 300, timestamp=scheduler.get_tick_timestamp())
 
-		time_end = time.time()
-		# Time to wait until the next measurement
-		time_wait = time_start + Cfg.get().measurement_delay - time_end
-		if time_wait >= 0:
-			time.sleep(time_wait)
-		else:
-			log("Warning: Can't keep up with the set measurement delay! " + str(time_wait * -1000) +
-				" ms of additional delay were introduced.")
 
-		time_until_status_change -= time.time() - time_start
+def get_measurement_delay() -> float:
+	"""
+	Returns the delay between measurements, in seconds. If the delay in the config file is 0, the delay of a sensor
+	that measures a single channel with the default acquisition profile is returned instead.
+	"""
+	measurement_delay = Cfg.get().measurement_delay
+	if measurement_delay <= 0:
+		profile = Cfg.get().acquisition_profiles[Cfg.get().default_acquisition_profile]
+		measurement_delay = profile.get_conversion_time(1)
+		print("Using the shortest measurement delay allowed by acquisition profile \"" + profile.name + "\": " +
+			str(measurement_delay * 1000) + " ms")
+	return measurement_delay
 
 
 def get_script_name(argv0: str):
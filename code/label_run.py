@@ -0,0 +1,130 @@
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import attacks.attack_util as attack_util
+from attacks.attack_index import AttackIndex
+from data.attack_labeler import find_disagreements, load_channel_data
+from data.data_writer import DataWriter
+from main_loop import pop_flag_param
+
+"""
+Script used to label the output of a run after it has ended. The attack bitmask of every sample is rebuilt from the
+intervals in the attack log, which are exact, instead of relying on the attacks column written during the run, which
+can be slightly off around the start and end of each attack and is missing if the run used -na.
+Every range of samples where the attacks column written during the run doesn't match the rebuilt one is reported.
+"""
+
+DEFAULT_MAX_RANGES = 20
+
+
+def main():
+	args = sys.argv
+
+	if "--help" in args or len(args) == 1:
+		print_help()
+		return 0
+
+	log_path = pop_flag_param(args, "-l")
+	if log_path is None:
+		log_path = attack_util.ATTACK_LOG_PATH
+	device_num = pop_flag_param(args, "-d")
+	if device_num is not None:
+		device_num = int(device_num)
+	output_dir = pop_flag_param(args, "-o")
+	max_ranges = DEFAULT_MAX_RANGES
+	value = pop_flag_param(args, "--max-ranges")
+	if value is not None:
+		max_ranges = int(value)
+
+	paths = args[1:]
+	if len(paths) == 0:
+		print_help()
+		return 1
+	if not os.path.isfile(log_path):
+		print("Error: Attack log " + log_path + " not found")
+		return 1
+	index = AttackIndex(log_path)
+
+	for path in paths:
+		path_device = device_num if device_num is not None else get_device_num(path)
+		if path_device is None:
+			print("Error: Couldn't get the device number of " + path + " from its path. Specify it with -d.")
+			return 1
+
+		start = time.perf_counter()
+		try:
+			columns = load_channel_data(path)
+		except (ValueError, ImportError, OSError) as e:
+			print("Error: Couldn't load " + path + ": " + str(e))
+			return 1
+		labels = index.get_attacks_batch(path_device, columns["time"])
+		elapsed = time.perf_counter() - start
+
+		print(path + " (device " + str(path_device) + "): " + str(len(labels)) + " samples labeled in " +
+			str(round(elapsed, 3)) + " s")
+		if "attacks" in columns:
+			live = columns["attacks"]
+			compared = np.count_nonzero(live != -1)
+			ranges = find_disagreements(columns["time"], live, labels)
+			mismatched = sum([r.count for r in ranges])
+			print("\t" + str(mismatched) + " of " + str(compared) + " samples with live attack data disagree with "
+				"the attack log (" + str(round(mismatched / max(compared, 1) * 100, 3)) + "%), in " + str(len(ranges)) +
+				" ranges")
+			for disagreement in ranges[:max_ranges]:
+				print("\t\t" + str(disagreement))
+			if len(ranges) > max_ranges:
+				print("\t\t... (" + str(len(ranges) - max_ranges) + " more)")
+		else:
+			print("\tThe output doesn't include live attack data")
+
+		if output_dir is not None:
+			os.makedirs(output_dir, exist_ok=True)
+			output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(path.rstrip("/")))[0] +
+				"-device-" + str(path_device) + "-labeled.csv")
+			write_labeled(output_path, columns["time"], labels, columns["power"])
+			print("\tLabeled output written to " + output_path)
+	return 0
+
+
+def get_device_num(path: str) -> "int | None":
+	"""
+	Returns the number of the device whose output is stored in the given path, based on the name of its
+	data-channel-<n> directory. Returns None if the path doesn't contain one.
+	"""
+	match = re.search(r"data-channel-(\d+)", path)
+	return None if match is None else int(match.group(1))
+
+
+def write_labeled(file_path: str, times: np.ndarray, labels: np.ndarray, powers: np.ndarray):
+	"""
+	Writes a CSV file with the same format as the output of a run, using the rebuilt labels as the attacks column
+	"""
+	power_strs = ["" if np.isnan(p) else str(p) for p in powers.tolist()]
+	with open(file_path, "w") as file:
+		file.write(",".join([DataWriter.COLUMN_TIME, DataWriter.COLUMN_ATTACKS, DataWriter.COLUMN_POWER]) + "\n")
+		file.writelines([str(t) + "," + str(a) + "," + p + "\n"
+			for t, a, p in zip(times.tolist(), labels.tolist(), power_strs)])
+
+
+def print_help():
+	print("Usage: python label_run.py [flags] <output>...\n"
+		"Rebuilds the attacks active on each sample of the specified outputs using the attack log, and reports the "
+		"samples where the attacks column written during the run disagrees with it. Outputs can be CSV files, "
+		"columnar output directories (-c), encoded files (-e), rotated segments (including compressed ones) or the "
+		"<time>-manifest.csv file of a rotated output, which loads all its segments.\n"
+		"Flags:\n"
+		"--help: Prints this help\n"
+		"-l <file>: Attack log to use. Default: " + attack_util.ATTACK_LOG_PATH + ".\n"
+		"-d <device>: Number of the device the outputs belong to. By default, it's taken from the data-channel-<n> "
+		"directory the output is in.\n"
+		"-o <dir>: Write a copy of each output to <dir>, with the attacks column replaced by the rebuilt one.\n"
+		"--max-ranges <n>: Max number of disagreement ranges listed for each output. Default: " +
+		str(DEFAULT_MAX_RANGES) + ".")
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -7,9 +7,19 @@
 
 #encoding: utf-8
 
+import ctypes
+import errno
+import fcntl
+import os
+import struct
+import time
 from datetime import datetime
 
-import smbus
+try:
+	import smbus
+except ImportError:
+	# Only required when no bus object is passed to the constructor
+	smbus = None
 
 # constants
 
@@ -61,8 +71,71 @@ INA3221_REG_SHUNTVOLTAGE_1   =             (0x01)
 INA3221_REG_BUSVOLTAGE_1     =             (0x02)
 #/*=========================================================================*/
 
+#/*=========================================================================
+#    MASK/ENABLE REGISTER (R/W)
+#    -----------------------------------------------------------------------*/
+INA3221_REG_MASKENABLE       =             (0x0F)
+#    /*---------------------------------------------------------------------*/
+INA3221_MASKENABLE_CVRF      =             (0x0001)  # Conversion Ready Flag. Cleared when the register is read
+#/*=========================================================================*/
+
+# Number of samples averaged for each value of the AVG bits - See table 3 spec
+INA3221_AVG_SAMPLES          = (1, 4, 16, 64, 128, 256, 512, 1024)
+# Conversion time in microseconds for each value of the VBUS_CT and VSH_CT bits - See tables 4 and 5 spec
+INA3221_CONVERSION_TIMES     = (140, 204, 332, 588, 1100, 2116, 4156, 8244)
+
 SHUNT_RESISTOR_VALUE         = (0.1)   # default shunt resistor value of 0.1 Ohm
 
+#/*=========================================================================
+#    LINUX I2C_RDWR IOCTL (see linux/i2c-dev.h and linux/i2c.h)
+#    -----------------------------------------------------------------------*/
+I2C_RDWR                     =             (0x0707)
+I2C_M_RD                     =             (0x0001)
+#/*=========================================================================*/
+
+
+class _i2c_msg(ctypes.Structure):
+	_fields_ = [("addr", ctypes.c_uint16), ("flags", ctypes.c_uint16), ("len", ctypes.c_uint16),
+		("buf", ctypes.POINTER(ctypes.c_uint8))]
+
+
+class _i2c_rdwr_ioctl_data(ctypes.Structure):
+	_fields_ = [("msgs", ctypes.POINTER(_i2c_msg)), ("nmsgs", ctypes.c_uint32)]
+
+
+class INA3221Reading():
+	# Values read from one channel as part of a multi-channel read. All the readings returned by the same
+	# readChannels() call share the same timestamp.
+
+	def __init__(self, timestamp, channel, shunt_voltage_mV, bus_voltage_V=None, new=True):
+		self.timestamp = timestamp                # UNIX time in ms at which the read started
+		self.channel = channel
+		self.shunt_voltage_mV = shunt_voltage_mV
+		self.current_mA = shunt_voltage_mV / SHUNT_RESISTOR_VALUE
+		self.bus_voltage_V = bus_voltage_V        # None if the bus voltage was not read
+		self.new = new                            # False if the chip was not done with a new conversion yet
+		# Power used by the load in mW. None if the bus voltage was not read.
+		self.power_mW = None if bus_voltage_V is None else bus_voltage_V * self.current_mA
+
+
+class _BulkRead():
+	# Preallocated I2C_RDWR request that reads a fixed list of registers in a single combined transaction
+	# (write register pointer, repeated start, read 2 bytes; once per register)
+
+	def __init__(self, addr, registers):
+		num_regs = len(registers)
+		self.pointers = (ctypes.c_uint8 * num_regs)(*registers)
+		self.data = (ctypes.c_uint8 * (2 * num_regs))()
+		self.msgs = (_i2c_msg * (2 * num_regs))()
+		for i in range(num_regs):
+			self.msgs[2 * i] = _i2c_msg(addr, 0, 1, ctypes.cast(ctypes.byref(self.pointers, i),
+				ctypes.POINTER(ctypes.c_uint8)))
+			self.msgs[2 * i + 1] = _i2c_msg(addr, I2C_M_RD, 2, ctypes.cast(ctypes.byref(self.data, 2 * i),
+				ctypes.POINTER(ctypes.c_uint8)))
+		self.request = _i2c_rdwr_ioctl_data(self.msgs, 2 * num_regs)
+		# All registers are big endian signed 16-bit integers
+		self.format = ">" + "h" * num_regs
+
 
 
 class SDL_Pi_INA3221():
@@ -72,9 +145,27 @@ class SDL_Pi_INA3221():
 	###########################
 	# INA3221 Code
 	###########################
-	def __init__(self, twi=1, addr=INA3221_ADDRESS, shunt_resistor = SHUNT_RESISTOR_VALUE  ):
-		self._bus = smbus.SMBus(twi)
+	def __init__(self, twi=1, addr=INA3221_ADDRESS, shunt_resistor = SHUNT_RESISTOR_VALUE, bus=None):
+		# bus: Object with the same interface as smbus.SMBus to use instead of opening I2C bus #twi. Used to run the
+		# driver against an emulated chip.
 		self._addr = addr
+		self._channels = (1, 2, 3)
+		if bus is None:
+			if smbus is None:
+				raise ImportError("The smbus module is required to access a real INA3221")
+			self._bus = smbus.SMBus(twi)
+			# Raw I2C device used for combined multi-register transactions. None if it can't be opened, in which
+			# case multi-channel reads fall back to one SMBus transaction per register.
+			try:
+				self._i2c_fd = os.open("/dev/i2c-" + str(twi), os.O_RDWR)
+			except OSError:
+				self._i2c_fd = None
+		else:
+			self._bus = bus
+			self._i2c_fd = None
+		self._bulk_reads = {}
+		# Monotonic time at which the last conversion was detected by readChannelsOnConversion()
+		self._last_conversion = None
 		config = INA3221_CONFIG_ENABLE_CHAN1 | \
 				 INA3221_CONFIG_ENABLE_CHAN2 | \
 				 INA3221_CONFIG_ENABLE_CHAN3 | \
@@ -88,6 +179,7 @@ class SDL_Pi_INA3221():
 
 
 
+		self._config = config
 		self._write_register_little_endian(INA3221_REG_CONFIG, config)
 
 
@@ -113,6 +205,35 @@ class SDL_Pi_INA3221():
 		return switchresult
 
 
+	def _read_registers(self, registers):
+		# Reads several 16-bit signed registers in a single I2C transaction, if possible
+
+		registers = tuple(registers)
+		if self._i2c_fd is not None:
+			bulk_read = self._bulk_reads.get(registers)
+			if bulk_read is None:
+				bulk_read = _BulkRead(self._addr, registers)
+				self._bulk_reads[registers] = bulk_read
+			try:
+				fcntl.ioctl(self._i2c_fd, I2C_RDWR, bulk_read.request)
+				return struct.unpack(bulk_read.format, bulk_read.data)
+			except OSError as e:
+				# Other errors (e.g. a NACK or a timeout) are transient bus errors, like the ones thrown by SMBus
+				if e.errno not in (errno.ENOTTY, errno.EOPNOTSUPP, errno.EINVAL):
+					raise
+				# The adapter doesn't support combined transactions, stop trying
+				os.close(self._i2c_fd)
+				self._i2c_fd = None
+
+		values = []
+		for register in registers:
+			value = self._read_register_little_endian(register)
+			if value > 32767:
+				value -= 65536
+			values.append(value)
+		return values
+
+
 	def _write_register_little_endian(self, register, data):
 
 		data = data & 0xFFFF
@@ -162,4 +283,106 @@ class SDL_Pi_INA3221():
 		valueDec = self.getShuntVoltage_mV(channel)/ SHUNT_RESISTOR_VALUE
 		return valueDec
 
+	def configure(self, avg_samples=16, bus_conversion_us=1100, shunt_conversion_us=1100, channels=(1, 2, 3),
+		bus_voltage=True):
+		# Writes a new config register value, with the chip running in continuous mode.
+		# avg_samples must be one of the values in INA3221_AVG_SAMPLES, and the conversion times must be one of
+		# the values in INA3221_CONVERSION_TIMES. Otherwise, ValueError is thrown.
+		# bus_voltage: True to measure both shunt and bus voltages, false to measure only shunt voltages.
+
+		config = INA3221_AVG_SAMPLES.index(avg_samples) << 9 | \
+				 INA3221_CONVERSION_TIMES.index(bus_conversion_us) << 6 | \
+				 INA3221_CONVERSION_TIMES.index(shunt_conversion_us) << 3 | \
+				 INA3221_CONFIG_MODE_2 | \
+				 INA3221_CONFIG_MODE_0
+		if bus_voltage:
+			config |= INA3221_CONFIG_MODE_1
+		for channel in channels:
+			if channel not in (1, 2, 3):
+				raise ValueError("Invalid INA3221 channel: " + str(channel))
+			config |= INA3221_CONFIG_ENABLE_CHAN1 >> (channel - 1)
+
+		self._config = config
+		self._channels = tuple(channels)
+		self._last_conversion = None
+		self._write_register_little_endian(INA3221_REG_CONFIG, config)
+
+	def getConversionTime_s(self):
+		# Returns the time it takes the chip to produce a new set of values for all enabled channels with the
+		# current averaging, conversion time and mode settings
+
+		avg = INA3221_AVG_SAMPLES[(self._config >> 9) & 0x7]
+		bus_ct = INA3221_CONVERSION_TIMES[(self._config >> 6) & 0x7]
+		shunt_ct = INA3221_CONVERSION_TIMES[(self._config >> 3) & 0x7]
+		mode = self._config & 0x7
+		channel_time = 0
+		if mode & INA3221_CONFIG_MODE_0:
+			channel_time += shunt_ct
+		if mode & INA3221_CONFIG_MODE_1:
+			channel_time += bus_ct
+		num_channels = 0
+		for enable_bit in (INA3221_CONFIG_ENABLE_CHAN1, INA3221_CONFIG_ENABLE_CHAN2, INA3221_CONFIG_ENABLE_CHAN3):
+			if self._config & enable_bit:
+				num_channels += 1
+		return channel_time * num_channels * avg / 1e6
+
+	def isConversionReady(self):
+		# Returns true if a new conversion cycle has completed since the last call. Reading the flag clears it.
+
+		return (self._read_register_little_endian(INA3221_REG_MASKENABLE) & INA3221_MASKENABLE_CVRF) != 0
+
+	def readChannelsOnConversion(self, channels=None, bus_voltage=False, timeout=None):
+		# Waits until the chip flags that a new conversion cycle is complete, then reads the channels like
+		# readChannels(). This results in exactly one read per conversion.
+		# If no new conversion is flagged before the timeout (in seconds, defaults to twice the conversion time),
+		# the current values are read anyway and the readings are returned with new = False.
+
+		conversion_time = self.getConversionTime_s()
+		if timeout is None:
+			timeout = 2 * conversion_time
+		start = time.monotonic()
+
+		# Don't poll the flag until the next conversion is about to be complete. We wake up slightly early, since
+		# the previous conversion was detected some time after it actually completed.
+		if self._last_conversion is not None:
+			wait = self._last_conversion + conversion_time * 0.9 - start
+			if wait > 0:
+				time.sleep(wait)
+
+		poll_interval = conversion_time / 20
+		ready = self.isConversionReady()
+		while not ready and time.monotonic() - start < timeout:
+			time.sleep(poll_interval)
+			ready = self.isConversionReady()
+
+		if ready:
+			self._last_conversion = time.monotonic()
+		readings = self.readChannels(channels, bus_voltage)
+		for reading in readings:
+			reading.new = ready
+		return readings
+
+	def readChannels(self, channels=None, bus_voltage=False):
+		# Reads the shunt voltage (and optionally also the bus voltage) of several channels at once, using a
+		# single I2C transaction. Returns a list with one INA3221Reading per channel, in the same order.
+		# channels: Channels to read. Defaults to all the enabled channels.
+
+		if channels is None:
+			channels = self._channels
+		registers = []
+		for channel in channels:
+			registers.append(INA3221_REG_SHUNTVOLTAGE_1 + (channel - 1) * 2)
+			if bus_voltage:
+				registers.append(INA3221_REG_BUSVOLTAGE_1 + (channel - 1) * 2)
+
+		timestamp = int(time.time() * 1000)
+		values = self._read_registers(registers)
+
+		step = 2 if bus_voltage else 1
+		readings = []
+		for i, channel in enumerate(channels):
+			readings.append(INA3221Reading(timestamp, channel, values[i * step] * 0.005,
+				values[i * step + 1] * 0.001 if bus_voltage else None))
+		return readings
+
 
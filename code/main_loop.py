@@ -1,16 +1,34 @@
 import os
+import signal
 import sys
 import time
 from threading import Thread, Event
-from typing import List
+from typing import Dict, List
 
+from attacks.attack_state import AttackState
+from data.binary_buffer_data_writer import BinaryBufferDataWriter
 from data.buffer_data_writer import BufferDataWriter
+from data.columnar_data_writer import ColumnarDataWriter
 from data.data_writer import DataWriter
+from data.encoded_data_writer import EncodedDataWriter
+from data.energy_meter import EnergyMeter
+from data.feature_extractor import FeatureExtractor
+from data.multiplexed_data_writer import MultiplexedDataWriter
+from data.rollup_writer import RollupWriter
+from data.sample_consumer import SampleConsumer
+from data.sample_feed import SampleFeedPublisher
+from data.sample_ring import SampleRing
+from data.segment_compressor import Compression, SegmentCompressor
 from data.standard_data_writer import StandardDataWriter
+from data.stream_publisher import SampleStreamPublisher, SlowClientPolicy, parse_address
+from data.writer_thread import WriterThread
+from defs.acquisition_profile import AcquisitionProfile
+from defs.measured_device import MeasuredDevice
+from defs.scheduler import DeadlineScheduler, OverrunPolicy
 from defs.utils import log
-# noinspection PyPackageRequirements
-# Reason: The IDE incorrectly assumes this is a library that needs to be added to requirements.txt
-from lib import SDL_Pi_INA3221
+from sensors.sensor import SensorReading
+from sensors.sensor_array import SensorArray
+from sensors.sensor_type import SensorType
 from attacks.attack_type import AttackType
 from attacks.attack_generator import NormalParams, AttackGenerator
 from defs.constants import Constants as Cst
@@ -18,26 +36,26 @@ from defs.config import Config as Cfg
 
 """
 Script run by the main device. It reads the status of the end devices and writes it to a CSV file.
-Power usage data is read using the SDL_Pi_INA3221 library.
+Power usage data is read using the SDL_Pi_INA3221 library. Other sensors can be used instead to run the script
+without the hardware (see the --sensor flag).
 Attack data is read from files under the attacks/ directory. This directory is expected to contain one file for
 each active attack on each device, named "attack-X-Y", where X is the number that represents the attacked device
 and Y is the number that represents the attack in progress.
 Attack scripts should ensure the corresponding file is created and deleted when an attack starts and ends.
 (Existing attack scripts already handle this automatically)
+The contents of the directory are cached in memory (see AttackState), so it's not listed on every measurement.
 
-The CSV file has 3 columns:
+The devices to measure and the sensor channel each one is connected to are listed in the config file. One CSV file is
+written for each device, with 3 columns:
 	Time: UNIX timestamp in ms
 	Attacks: Indicates which attack(s) were active on the device. Each bit represents an attack.
 		Example: A value of 3 (bits 0 and 1 set) means both attack #0 and #1 are active.
-	Power: Power usage of the device
+	Power: Power usage of the device: current in mA, or real power in mW if the -rp flag is used. Empty if the
+	measurement was skipped because the previous one took too long.
 
 This script also allows performing automated attacks given some user-specified parameters.
 """
 
-ina3221 = SDL_Pi_INA3221.SDL_Pi_INA3221(addr=0x40)
-
-NUM_DEVICES = 3
-
 
 def main():
 	args = sys.argv
@@ -145,16 +163,206 @@ def main():
 				print("Error: Buffer size must be > 0")
 				return 1
 
+		columnar = False
+		if "-c" in args:
+			args.remove("-c")
+			columnar = True
+			if buffer_size > 0:
+				print("Error: -c is not compatible with -b")
+				return 1
+
+		encoded = False
+		if "-e" in args:
+			args.remove("-e")
+			encoded = True
+			if buffer_size > 0 or columnar:
+				print("Error: -e is not compatible with -b or -c")
+				return 1
+		multiplexed = False
+		if "-m" in args:
+			args.remove("-m")
+			multiplexed = True
+			if columnar or encoded:
+				print("Error: -m is not compatible with -c or -e")
+				return 1
+		mantissa_bits = 0
+		value = pop_flag_param(args, "--mantissa-bits")
+		if value is not None:
+			mantissa_bits = int(value)
+			if not 1 <= mantissa_bits <= 23:
+				print("Error: Mantissa bits must be between 1 and 23")
+				return 1
+
+		rotate_size = 0
+		value = pop_flag_param(args, "--rotate-size")
+		if value is not None:
+			rotate_size = int(float(value) * 1024 * 1024)
+			if rotate_size <= 0:
+				print("Error: Rotation size must be positive")
+				return 1
+		rotate_interval = 0
+		value = pop_flag_param(args, "--rotate-time")
+		if value is not None:
+			rotate_interval = float(value) * 60
+			if rotate_interval <= 0:
+				print("Error: Rotation time must be positive")
+				return 1
+		if (buffer_size > 0 or columnar or encoded or multiplexed) and (rotate_size > 0 or rotate_interval > 0):
+			print("Error: Rotation is not compatible with -b, -c, -e or -m")
+			return 1
+		compression = Compression.GZIP
+		value = pop_flag_param(args, "--compress")
+		if value is not None:
+			try:
+				compression = Compression.from_str(value)
+			except ValueError:
+				print_help()
+				return 1
+			if not compression.is_available():
+				print("Error: The zstandard package must be installed to use zstd compression")
+				return 1
+
+		binary_buffer = False
+		value = pop_flag_param(args, "--buffer-format")
+		if value is not None:
+			if value == "binary":
+				binary_buffer = True
+				if multiplexed:
+					print("Error: -m can only be used with CSV buffers")
+					return 1
+			elif value != "csv":
+				print_help()
+				return 1
+
+		feed = False
+		if "--feed" in args:
+			args.remove("--feed")
+			feed = True
+
+		rollups = False
+		if "--rollups" in args:
+			args.remove("--rollups")
+			rollups = True
+			if buffer_size > 0:
+				print("Error: --rollups is not compatible with -b")
+				return 1
+
+		features = False
+		if "--features" in args:
+			args.remove("--features")
+			features = True
+		feature_window = Cst.FEATURE_WINDOW_SIZE
+		value = pop_flag_param(args, "--feature-window")
+		if value is not None:
+			feature_window = int(value)
+			if feature_window < 2 * Cst.FEATURE_SPECTRAL_BANDS:
+				print("Error: Feature window size must be at least " + str(2 * Cst.FEATURE_SPECTRAL_BANDS))
+				return 1
+		feature_hop = Cst.FEATURE_HOP_SIZE
+		value = pop_flag_param(args, "--feature-hop")
+		if value is not None:
+			feature_hop = int(value)
+			if feature_hop <= 0:
+				print("Error: Feature hop size must be positive")
+				return 1
+
+		stream_address = pop_flag_param(args, "--stream")
+		if stream_address is not None:
+			try:
+				parse_address(stream_address)
+			except ValueError:
+				print("Error: Stream address must be <host>:<port> or unix:<path>")
+				return 1
+		stream_policy = SlowClientPolicy.DROP
+		value = pop_flag_param(args, "--stream-policy")
+		if value is not None:
+			try:
+				stream_policy = SlowClientPolicy.from_str(value)
+			except ValueError:
+				print_help()
+				return 1
+
 		log_attacks = True
 		if "-na" in args:
 			args.remove("-na")
 			log_attacks = False
 
-		run(generator, print_events, exit_early, buffer_size, log_attacks, event_seed)
+		overrun_policy = OverrunPolicy.SKIP
+		value = pop_flag_param(args, "--overrun")
+		if value is not None:
+			try:
+				overrun_policy = OverrunPolicy.from_str(value)
+			except ValueError:
+				print_help()
+				return 1
+
+		sync_conversions = False
+		if "-cr" in args:
+			args.remove("-cr")
+			sync_conversions = True
+
+		profile_name = pop_flag_param(args, "-p")
+		if profile_name is None:
+			profile_name = Cfg.get().default_acquisition_profile
+		elif profile_name not in Cfg.get().acquisition_profiles:
+			print("Error: Acquisition profile \"" + profile_name + "\" is not defined in the config file")
+			return 1
+
+		profile = Cfg.get().acquisition_profiles[profile_name]
+
+		real_power = False
+		if "-rp" in args:
+			args.remove("-rp")
+			real_power = True
+			if not profile.measures_bus_voltage():
+				print("Error: Acquisition profile \"" + profile_name + "\" does not measure bus voltage, which is "
+					"required to compute real power")
+				return 1
+
+		sensor_type = SensorType.INA3221
+		value = pop_flag_param(args, "--sensor")
+		if value is not None:
+			try:
+				sensor_type = SensorType.from_str(value)
+			except ValueError:
+				print_help()
+				return 1
+		replay_files = None
+		value = pop_flag_param(args, "--replay")
+		if value is not None:
+			replay_files = value.split(",")
+		elif sensor_type == SensorType.REPLAY:
+			print("Error: The replay sensor requires specifying the trace files with --replay")
+			return 1
+		replay_speed = 1
+		value = pop_flag_param(args, "--speed")
+		if value is not None:
+			replay_speed = float(value)
+			if replay_speed <= 0:
+				print("Error: Replay speed must be positive")
+				return 1
+
+		if replay_files is not None and len(replay_files) != len(Cfg.get().measured_devices):
+			print("Error: " + str(len(Cfg.get().measured_devices)) + " trace files must be specified with --replay, "
+				"one per device")
+			return 1
+
+		sensors = SensorArray(Cfg.get().measured_devices, sensor_type, replay_files, replay_speed)
+		signal.signal(signal.SIGTERM, handle_sigterm)
+		run(generator, print_events, exit_early, buffer_size, log_attacks, event_seed, overrun_policy, sync_conversions,
+			profile, real_power, sensors, binary_buffer, rotate_size, rotate_interval, compression, columnar,
+			encoded, mantissa_bits, multiplexed, feed, stream_address, stream_policy, features, feature_window,
+			feature_hop, rollups)
 
 
 def run(generator: "AttackGenerator | None", print_events: bool, exit_early: bool, buffer_size: int, log_attacks: bool,
-	event_seed: int = None):
+	event_seed: int = None, overrun_policy: OverrunPolicy = OverrunPolicy.SKIP, sync_conversions: bool = False,
+	profile: AcquisitionProfile = None, real_power: bool = False, sensors: SensorArray = None,
+	binary_buffer: bool = False, rotate_size: int = 0, rotate_interval: float = 0,
+	compression: Compression = Compression.GZIP, columnar: bool = False, encoded: bool = False,
+	mantissa_bits: int = 0, multiplexed: bool = False, feed: bool = False, stream_address: str = None,
+	stream_policy: SlowClientPolicy = SlowClientPolicy.DROP, features: bool = False,
+	feature_window: int = Cst.FEATURE_WINDOW_SIZE, feature_hop: int = Cst.FEATURE_HOP_SIZE, rollups: bool = False):
 	"""
 	Runs the program. If an attack generator has been provided, it will be launched on a separate thread.
 	The program will also end its execution after the specified duration for the generator is complete.
@@ -165,14 +373,51 @@ def run(generator: "AttackGenerator | None", print_events: bool, exit_early: boo
 	buffer_size: If > 0, data will be written to a cyclic buffer instead of to a regular file.
 	log_attacks: True to add a column to the data listing the currently active attacks
 	event_seed: If specified, this seed will be used to initialize the RNG used to generate the attack list.
+	overrun_policy: What to do when a measurement takes longer than the measurement delay. Missed measurements are
+	written to the output as entries with an empty power value.
+	sync_conversions: If true, the measurement delay will be ignored. Instead, power will be read once each time the
+	sensor completes a new conversion, which is the highest rate at which non-duplicate values can be obtained.
+	profile: Sensor settings to use. If not specified, the default profile from the config file will be used.
+	real_power: If true, bus voltage will be read alongside shunt voltage, and the power column will contain the real
+	power used by each device (in mW) instead of the current (in mA). The energy used by each device will be
+	tracked, and a summary will be written once the execution ends.
+	sensors: Sensors used to read the power usage of the devices listed in the config file. If not specified, the
+	INA3221 chips listed in the config file will be used.
+	binary_buffer: If true and buffer_size > 0, the buffer will be written in binary format (see
+	BinaryBufferDataWriter) instead of as a CSV file.
+	rotate_size, rotate_interval: If buffer_size is 0 and either of them is > 0, the output of each device will be
+	split into segments, and a new one will be started once the current one reaches rotate_size bytes or has been open
+	for rotate_interval seconds. Closed segments are listed in a manifest file.
+	compression: Compression applied to closed segments when rotation is enabled
+	columnar: If true and buffer_size is 0, the output of each device will be written to a directory in columnar
+	format (see ColumnarDataWriter) instead of to a CSV file.
+	encoded: If true, buffer_size is 0 and columnar is false, the output of each device will be encoded with the
+	time-series codec (see EncodedDataWriter) instead of written as CSV.
+	mantissa_bits: If > 0, power values will be rounded to this many mantissa bits when encoded is true.
+	multiplexed: If true, the data of all the devices will be written to a single file or CSV buffer, with one
+	entry per tick (see MultiplexedDataWriter).
+	feed: If true, samples will also be published to a shared memory ring that other processes on the same host can
+	read from (see data.sample_feed).
+	stream_address: If specified, samples will also be sent to the subscribers that connect to this address (see
+	SampleStreamPublisher).
+	stream_policy: What to do with stream subscribers that can't keep up
+	features: If true, rolling-window features of the power usage of each device will be computed as samples are
+	read and written to a separate file (see FeatureExtractor).
+	feature_window, feature_hop: Number of samples in each feature window and between consecutive windows
+	rollups: If true and buffer_size is 0, aggregates of the power usage of each device over 1 s, 10 s and 1 min
+	buckets will be written next to its output (see RollupWriter).
 	"""
+	if profile is None:
+		profile = Cfg.get().acquisition_profiles[Cfg.get().default_acquisition_profile]
+	devices = Cfg.get().measured_devices
+	measurement_delay = get_measurement_delay(profile)
 	if generator is None:
-		end_time = -1
+		num_measurements = -1
 		generator_thread = None
 		if exit_early:
 			return
 	else:
-		end_time = time.time() + generator.duration * 60
+		num_measurements = round(generator.duration * 60 / measurement_delay)
 		generator.stop_flag = Event()
 		events = generator.create_event_list(event_seed)
 		if print_events:
@@ -182,78 +427,268 @@ def run(generator: "AttackGenerator | None", print_events: bool, exit_early: boo
 		if exit_early:
 			return
 		generator_thread = Thread(target=generator.start)
-		generator_thread.start()
 
+	if sensors is None:
+		sensors = SensorArray(devices, SensorType.INA3221)
 	os.makedirs(Cst.ATTACK_FOLDER, exist_ok=True)
-	for i in range(NUM_DEVICES):
-		os.makedirs(os.path.dirname(get_file_path(i + 1, buffer_size > 0)), exist_ok=True)
-	writers = []
-	if buffer_size > 0:
-		for i in range(NUM_DEVICES):
-			writers.append(BufferDataWriter(get_file_path(i + 1, True), log_attacks, buffer_size))
+	attack_state = AttackState() if log_attacks else None
+	if buffer_size == 0 and (rotate_size > 0 or rotate_interval > 0):
+		compressor = SegmentCompressor(compression)
 	else:
-		for i in range(NUM_DEVICES):
-			writers.append(StandardDataWriter(get_file_path(i + 1, False), log_attacks))
-
-	log("Main loop started")
+		compressor = None
+	writers = {}
+	consumers = []
+	# The sensors and every output are set up before starting any thread, so if one of them fails, no threads are
+	# left running that would keep the process alive
 	try:
-		while end_time == -1 or time.time() < end_time:
-			time_start = time.time()
-
-			for i, writer in enumerate(writers):
-				write_csv_line(writer, i + 1)
-
-			time_end = time.time()
-			# Time to wait until the next measurement
-			time_wait = time_start + Cfg.get().measurement_delay - time_end
-			if time_wait >= 0:
-				time.sleep(time_wait)
-			else:
-				log("Warning: Can't keep up with the set measurement delay! " + str(time_wait * -1000) +
-					" ms of additional delay were introduced.")
+		sensors.configure(profile)
+		energy_meter = create_outputs(devices, writers, consumers, buffer_size, log_attacks, binary_buffer,
+			rotate_size, rotate_interval, compressor, columnar, encoded, mantissa_bits, multiplexed, feed,
+			stream_address, stream_policy, features, feature_window, feature_hop, rollups, real_power)
+	except BaseException:
+		for writer in writers.values():
+			writer.close()
+		for consumer in consumers:
+			consumer.close()
+		sensors.close()
+		raise
+	# Samples are passed to a separate thread that writes them, so slow writes don't delay the next measurement
+	ring = SampleRing(Cst.SAMPLE_RING_CAPACITY)
+	writer_thread = WriterThread(ring, writers, Cst.WRITER_BATCH_SIZE, Cst.WRITER_FLUSH_INTERVAL, consumers)
+	scheduler = DeadlineScheduler(measurement_delay, overrun_policy, num_measurements)
+	# Number of times the sensor didn't produce a new conversion in time when running with sync_conversions
+	num_stale_reads = 0
+	try:
+		writer_thread.start()
+		if compressor is not None:
+			compressor.start()
+		if attack_state is not None:
+			attack_state.start()
+		if generator_thread is not None:
+			generator_thread.start()
+		log("Main loop started")
+		if sync_conversions:
+			log("Reading power on every sensor conversion (every " +
+				str(sensors.get_conversion_time() * 1000) + " ms)")
+			end_time = -1 if generator is None else time.monotonic() + generator.duration * 60
+			while end_time == -1 or time.monotonic() < end_time:
+				readings = sensors.read_on_conversion(real_power)
+				if all(reading.new for reading in readings):
+					for device, reading in zip(devices, readings):
+						push_sample(ring, device.device_num, get_power(reading, real_power), attack_state,
+							reading.timestamp)
+				else:
+					# The values haven't changed since the last read, don't write them again
+					num_stale_reads += 1
+					push_gap(ring, devices, readings[0].timestamp)
+				writer_thread.notify()
+		else:
+			scheduler.start()
+			while not scheduler.finished():
+				skipped = scheduler.next_tick()
+				for tick in range(scheduler.tick - skipped, scheduler.tick):
+					push_gap(ring, devices, scheduler.get_tick_timestamp(tick))
+
+				timestamp = scheduler.get_tick_timestamp()
+				# Each sensor reads all its channels at once, and sensors on different buses are read in parallel, so
+				# the measurements of all devices are aligned in time
+				readings = sensors.read(real_power)
+				for device, reading in zip(devices, readings):
+					push_sample(ring, device.device_num, get_power(reading, real_power), attack_state, timestamp)
+				writer_thread.notify()
 	except KeyboardInterrupt:
 		if generator is not None:
 			# Signal the generator so it ends its execution
 			generator.stop_flag.set()
-
-	if buffer_size > 0:
-		write_buffer_end()
+	except BaseException:
+		if generator is not None:
+			generator.stop_flag.set()
+		raise
+	finally:
+		# Make sure all the data read so far reaches the output files, even if the loop failed
+		writer_thread.stop()
+		for device_num, writer in writers.items():
+			# A writer that failed during the execution can fail again here, which mustn't prevent the rest of the
+			# outputs from being closed
+			try:
+				if binary_buffer and buffer_size > 0:
+					# Binary buffers signal the end of the execution with a flag instead of being overwritten
+					writer.write_end()
+				writer.close()
+			except Exception as e:
+				log("Error: Couldn't close the output of device " + str(device_num) + ": " + repr(e))
+		if compressor is not None:
+			# Wait until the last segments have been compressed
+			compressor.stop()
+		sensors.close()
+
+	if buffer_size == 0 and not columnar and not encoded and not multiplexed:
+		for device_num, writer in writers.items():
+			log("Output file of device " + str(device_num) + ": " + str(writer.stats))
+	if ring.dropped > 0:
+		log("Warning: " + str(ring.dropped) + " samples were dropped because they couldn't be written fast enough")
+	if energy_meter is not None:
+		energy_meter.write_summary(get_energy_summary_path())
+
+	if attack_state is not None:
+		attack_state.stop()
+
+	if buffer_size > 0 and not binary_buffer:
+		if multiplexed:
+			write_buffer_end([get_multiplexed_file_path(True)])
+		else:
+			write_buffer_end([get_file_path(device.device_num, True) for device in devices])
 
 	if generator is not None:
 		log("Waiting for attack generator to exit...")
 		generator_thread.join()
 
-	log("Main loop stopped")
+	if sync_conversions:
+		log("Main loop stopped. Stale reads: " + str(num_stale_reads))
+	else:
+		log("Main loop stopped. " + str(scheduler.stats))
 
 
-def write_csv_line(writer: DataWriter, device_num: int):
+def create_outputs(devices: List[MeasuredDevice], writers: Dict[int, DataWriter], consumers: List[SampleConsumer],
+	buffer_size: int, log_attacks: bool, binary_buffer: bool, rotate_size: int, rotate_interval: float,
+	compressor: "SegmentCompressor | None", columnar: bool, encoded: bool, mantissa_bits: int, multiplexed: bool,
+	feed: bool, stream_address: "str | None", stream_policy: SlowClientPolicy, features: bool, feature_window: int,
+	feature_hop: int, rollups: bool, real_power: bool) -> "EnergyMeter | None":
+	"""
+	Creates the writer of each device and the consumers that receive every sample, based on the parameters of run().
+	Outputs are added to writers and consumers as soon as they are created, so the caller can close them if a later
+	one fails.
+	return: The consumer that tracks the energy used by each device, if real_power is true
+	"""
+	# Path of the output of each device without extension, used to name the files written next to it
+	base_paths = {}
+	if multiplexed:
+		file_path = get_multiplexed_file_path(buffer_size > 0)
+		os.makedirs(os.path.dirname(file_path), exist_ok=True)
+		consumers.append(MultiplexedDataWriter(file_path, [device.device_num for device in devices], log_attacks,
+			buffer_size))
+		for device in devices:
+			base_paths[device.device_num] = os.path.splitext(file_path)[0] + "-device-" + str(device.device_num)
+	else:
+		for device in devices:
+			# The path includes the current time, so it must only be computed once
+			file_path = get_file_path(device.device_num, buffer_size > 0, binary_buffer)
+			base_path = os.path.splitext(file_path)[0]
+			base_paths[device.device_num] = base_path
+			os.makedirs(os.path.dirname(file_path), exist_ok=True)
+			if buffer_size > 0 and binary_buffer:
+				writers[device.device_num] = BinaryBufferDataWriter(file_path, log_attacks, buffer_size)
+			elif buffer_size > 0:
+				writers[device.device_num] = BufferDataWriter(file_path, log_attacks, buffer_size)
+			elif columnar:
+				writers[device.device_num] = ColumnarDataWriter(base_path, log_attacks)
+			elif encoded:
+				writers[device.device_num] = EncodedDataWriter(base_path + ".tsc", log_attacks, mantissa_bits)
+			else:
+				writers[device.device_num] = StandardDataWriter(file_path, log_attacks, rotate_size=rotate_size,
+					rotate_interval=rotate_interval, compressor=compressor)
+	if feed:
+		consumers.append(SampleFeedPublisher())
+	if stream_address is not None:
+		consumers.append(SampleStreamPublisher(stream_address, policy=stream_policy))
+		log("Streaming samples on " + stream_address)
+	if rollups and buffer_size == 0:
+		consumers.append(RollupWriter(base_paths))
+	if features:
+		file_path = get_features_file_path()
+		os.makedirs(os.path.dirname(file_path), exist_ok=True)
+		consumers.append(FeatureExtractor(feature_window, feature_hop, file_path=file_path))
+	if real_power:
+		energy_meter = EnergyMeter()
+		consumers.append(energy_meter)
+		return energy_meter
+	return None
+
+
+def handle_sigterm(_signum, _frame):
 	"""
-	Writes a single line to the CSV file associated with the specified device
-	device_num: Number identifying the device whose data should be written
+	Handles SIGTERM like Ctrl+C, so all data is written to the output files when the program is stopped with kill or
+	by a service manager
 	"""
+	raise KeyboardInterrupt()
 
-	power = ina3221.getCurrent_mA(device_num)
+
+def get_measurement_delay(profile: AcquisitionProfile) -> float:
+	"""
+	Returns the delay between measurements, in seconds. If the delay in the config file is 0, the shortest delay
+	allowed by the acquisition profile is returned instead. If the delay in the config file is shorter than that,
+	a warning is logged.
+	"""
+	# The slowest sensor is the one with the most enabled channels
+	channels_per_sensor = {}
+	for device in Cfg.get().measured_devices:
+		key = (device.bus, device.address)
+		channels_per_sensor[key] = channels_per_sensor.get(key, 0) + 1
+	conversion_time = profile.get_conversion_time(max(channels_per_sensor.values()))
+	measurement_delay = Cfg.get().measurement_delay
+	if measurement_delay <= 0:
+		measurement_delay = conversion_time
+		log("Using the shortest measurement delay allowed by acquisition profile \"" + profile.name + "\": " +
+			str(conversion_time * 1000) + " ms")
+	elif measurement_delay < conversion_time:
+		log("Warning: The measurement delay (" + str(measurement_delay * 1000) + " ms) is shorter than the time the "
+			"sensor needs to produce new values with acquisition profile \"" + profile.name + "\" (" +
+			str(conversion_time * 1000) + " ms). Some measurements will be duplicates.")
+	return measurement_delay
+
+
+def get_power(reading: SensorReading, real_power: bool) -> float:
+	"""
+	Returns the value that should be written to the power column for a sensor reading
+	real_power: True to return the real power in mW, false to return the current in mA
+	"""
+	return reading.power_mW if real_power else reading.current_mA
+
+
+def push_sample(ring: SampleRing, device_num: int, power: float, attack_state: "AttackState | None", timestamp: int):
+	"""
+	Pushes a single sample to the ring used to pass data to the writer thread
+	device_num: Number identifying the device the sample belongs to
+	power: Power usage read for the device
+	attack_state: Used to check the attacks that are active on the device. If None, no attack data will be written.
+	timestamp: Timestamp of the measurement
+	"""
 
 	# Check active attacks on this device
-	attacks = 0
-	for attack_file in os.listdir(Cst.ATTACK_FOLDER):
-		if os.path.isfile(os.path.join(Cst.ATTACK_FOLDER, attack_file)):
-			file_split = attack_file.split("-")
-			device_id = int(file_split[1])
-			if device_id == device_num:
-				attack_id = int(file_split[2])
-				attacks |= 1 << attack_id
+	attacks = -1 if attack_state is None else attack_state.get_attacks(device_num)
 
-	writer.write(power, attacks)
+	ring.push(timestamp, device_num, power, attacks)
 
 
-def get_file_path(device_num: int, buffer_mode: bool) -> str:
+def push_gap(ring: SampleRing, devices: List[MeasuredDevice], timestamp: int):
+	"""
+	Pushes an entry with no power data for each device, used to mark a measurement that couldn't be taken
+	"""
+	for device in devices:
+		ring.push(timestamp, device.device_num, None)
+
+
+def get_file_path(device_num: int, buffer_mode: bool, binary: bool = False) -> str:
 	"""
 	Returns the path to the file where the data for a given device should be written
 	device_num: Number identifying the device where data will be read from
 	buffer_mode: True if the file will be written in buffer mode
+	binary: True if the buffer will be written in binary format
 	"""
 	string = "data/" + "data-channel-" + str(device_num) + "/"
+	if buffer_mode:
+		string += "buffer.bin" if binary else "buffer.csv"
+	else:
+		string += time.strftime("%Y-%m-%d %H-%M-%S") + ".csv"
+	return string
+
+
+def get_multiplexed_file_path(buffer_mode: bool) -> str:
+	"""
+	Returns the path to the file where the data of all the devices should be written when running in multiplexed mode
+	buffer_mode: True if the file will be written in buffer mode
+	"""
+	string = "data/multiplexed/"
 	if buffer_mode:
 		string += "buffer.csv"
 	else:
@@ -261,16 +696,29 @@ def get_file_path(device_num: int, buffer_mode: bool) -> str:
 	return string
 
 
-def write_buffer_end():
+def get_features_file_path() -> str:
+	"""
+	Returns the path to the file where the features computed during the current execution should be written
+	"""
+	return "data/features/" + time.strftime("%Y-%m-%d %H-%M-%S") + ".csv"
+
+
+def get_energy_summary_path() -> str:
+	"""
+	Returns the path to the file where the energy summary of the current execution should be written
+	"""
+	return "data/energy-" + time.strftime("%Y-%m-%d %H-%M-%S") + ".csv"
+
+
+def write_buffer_end(paths: List[str]):
 	"""
-	Writes the end keyword in all the data buffers to signal that the execution has ended.
+	Writes the end keyword in the specified CSV buffers to signal that the execution has ended.
+	Each buffer is replaced atomically, so readers see either the full buffer or the end keyword.
 	"""
-	with open(get_file_path(1, True), "w") as f:
-		f.write(Cst.BUFFER_OVER_KEYWORD)
-	with open(get_file_path(2, True), "w") as f:
-		f.write(Cst.BUFFER_OVER_KEYWORD)
-	with open(get_file_path(3, True), "w") as f:
-		f.write(Cst.BUFFER_OVER_KEYWORD)
+	for path in paths:
+		with open(path + ".tmp", "w") as f:
+			f.write(Cst.BUFFER_OVER_KEYWORD)
+		os.replace(path + ".tmp", path)
 
 
 def print_help():
@@ -306,9 +754,76 @@ def print_help():
 		"-d: Don't actually run any attacks, just exit early. The attack list will still be printed if required.\n"
 		"-b <size>: Run in buffer mode. The most recent <size> reads will be written to a buffer, with older "
 		"entries being overwritten by newer ones.\n"
+		"-c: Write the output of each device in columnar format instead of as a CSV file. Entries are written in "
+		"chunks of NumPy arrays to the data/data-channel-<n>/<time> directory, and can be loaded without parsing "
+		"using data/columnar_reader.py. Not compatible with -b or rotation.\n"
+		"-m: Write the data of all the devices to a single file (data/multiplexed/<time>.csv, or "
+		"data/multiplexed/buffer.csv when using -b), with one line per measurement containing the timestamp "
+		"followed by the attacks and power columns of each device. Not compatible with -c, -e, binary buffers or "
+		"rotation.\n"
+		"-e: Write the output of each device to data/data-channel-<n>/<time>.tsc, encoded with the time-series codec "
+		"defined in data/timeseries_codec.py, which takes a fraction of the space of a CSV file. Not compatible with "
+		"-b, -c or rotation.\n"
+			"\t--mantissa-bits <bits>: Round power values to the specified number of mantissa bits (1-23) before "
+			"encoding them, which makes the output much smaller. Around 12 bits keep the resolution of the "
+			"INA3221. By default, values are stored as float32 without any additional rounding.\n"
+		"--rotate-size <MB>: Split the output of each device into segments of the specified size. Not compatible with "
+		"-b.\n"
+		"--rotate-time <minutes>: Start a new output segment for each device every <minutes> minutes. Not compatible "
+		"with -b.\n"
+			"\tWhen rotating, closed segments are compressed in the background and listed, along with the time range "
+			"they cover, in the <time>-manifest.csv file of each device.\n"
+		"--compress <format>: Compression applied to closed segments. Possible values: none, gzip (default), zstd "
+		"(requires the zstandard package).\n"
+		"--buffer-format <format>: Format of the buffer written when using -b. Possible values:\n"
+			"\t  csv: CSV file with fixed-width lines that are overwritten in place (default). Use data/buffer_reader.py "
+			"to read it while it's being written. At the end of the execution, the file is atomically replaced by one "
+			"that only contains the END keyword.\n"
+			"\t  binary: Binary file that can be read without parsing using data/binary_buffer_reader.py. A flag is "
+			"set in its header at the end of the execution.\n"
+		"--feed: Publish the samples of all the devices to a shared memory ring, so other processes on the same "
+		"device can receive them as soon as they are read, without reading the output files. See "
+		"data/sample_feed.py.\n"
+		"--stream <address>: Send the samples of all the devices to any subscribers that connect to <address>, "
+		"which can be <host>:<port> (TCP) or unix:<path> (UNIX socket). Subscribers can receive them with "
+		"SampleStreamSubscriber from data/stream_publisher.py.\n"
+			"\t--stream-policy <policy>: What to do when a subscriber can't receive samples as fast as they are "
+			"produced. Possible values: drop (drop the oldest samples, default), disconnect.\n"
+		"--rollups: Also write the min, max, mean and number of samples of each device, along with the attacks active "
+		"on them, over 1 s, 10 s and 1 min buckets to data/data-channel-<n>/<time>-rollup-<resolution>.bin (or "
+		"data/multiplexed/<time>-device-<n>-rollup-<resolution>.bin when using -m). Long time ranges can then be "
+		"queried quickly with data/rollup_reader.py. Not compatible with -b.\n"
+		"--features: Compute features (mean, standard deviation, min, max, slope and spectral energy) over a sliding "
+		"window of the samples of each device as they are read, and write them to data/features/<time>.csv. See "
+		"data/feature_extractor.py.\n"
+			"\t--feature-window <n>: Number of samples in each window. Default: " + str(Cst.FEATURE_WINDOW_SIZE) +
+			".\n"
+			"\t--feature-hop <n>: Number of samples between consecutive windows of the same device. Default: " +
+			str(Cst.FEATURE_HOP_SIZE) + ".\n"
 		"-na: Do not log active attacks alongside power reads. Useful when deploying the tool in a scenario "
 		"where controlled attacks will not take place.\n"
-		"Use Ctrl+C to quit, stopping all active attacks if there's any running.\n")
+		"-p <profile>: Name of the sensor acquisition profile to use, as specified in the config file. Defaults to the "
+		"profile marked as default in the config file.\n"
+		"-rp: Read bus voltage alongside shunt voltage and write real power usage (mW) instead of current (mA). "
+		"The energy used by each device will be tracked, and a summary listing the energy used while each "
+		"combination of attacks was active will be written to data/energy-<time>.csv at the end.\n"
+		"--sensor <type>: Sensor used to read power usage. Possible values:\n"
+			"\t  ina3221: INA3221 chip connected to the I2C bus (default)\n"
+			"\t  fake: Emulated INA3221 chip that produces synthetic values\n"
+			"\t  synthetic: Synthetic values generated without emulating any hardware\n"
+			"\t  replay: Play back traces previously recorded by this script\n"
+		"--replay <files>: Comma-separated list of trace files to play back with the replay sensor, one per device, "
+		"in the same order as the devices in the config file.\n"
+		"--speed <speed>: Playback speed of the replay sensor. Default: 1 (real time).\n"
+		"-cr: Read power each time the sensor completes a new conversion instead of using the measurement delay from "
+		"the config file. If the sensor fails to produce a new conversion in time, an entry with an empty power value "
+		"will be written.\n"
+		"--overrun <policy>: What to do when a measurement takes longer than the measurement delay. Possible values:\n"
+			"\t  skip: Skip the missed measurements, writing an entry with an empty power value for each one. "
+			"Measurements stay aligned to the original schedule. (Default)\n"
+			"\t  catch-up: Take the missed measurements immediately, one after another.\n"
+			"\t  stretch: Delay all future measurements by the amount of time that was lost.\n"
+		"Use Ctrl+C (or send SIGTERM) to quit, stopping all active attacks if there's any running.\n")
 
 
 def pop_flag_param(args: List[str], flag: str) -> "str | None":
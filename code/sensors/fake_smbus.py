@@ -0,0 +1,128 @@
+import time
+from typing import Dict
+
+from sensors.synthetic_sensor import SyntheticSignal
+
+# Registers of the INA3221 that are emulated
+_REG_CONFIG = 0x00
+_REG_SHUNT_VOLTAGE_1 = 0x01
+_REG_BUS_VOLTAGE_1 = 0x02
+_REG_MASK_ENABLE = 0x0F
+_REG_MANUFACTURER_ID = 0xFE
+_REG_DIE_ID = 0xFF
+
+_CONFIG_RESET = 0x8000
+_CONFIG_DEFAULT = 0x7127
+_MASK_ENABLE_CVRF = 0x0001
+
+_AVG_SAMPLES = (1, 4, 16, 64, 128, 256, 512, 1024)
+_CONVERSION_TIMES_US = (140, 204, 332, 588, 1100, 2116, 4156, 8244)
+
+# Value of the shunt resistor assumed when converting currents to shunt voltages, in ohms
+_SHUNT_RESISTOR = 0.1
+
+
+class FakeSMBus:
+	"""
+	Object with the same interface as smbus.SMBus that emulates the register map of an INA3221 chip, so the real
+	driver can be run without hardware.
+	Values are generated by a SyntheticSignal. New values are only produced once per conversion period, which is
+	computed from the config register like the real chip does, and the conversion ready flag is set accordingly.
+	"""
+
+	signal: SyntheticSignal
+	# Current value of each register, indexed by register number
+	_registers: Dict[int, int]
+	# Monotonic time at which the config register was last written
+	_config_time: float
+	# Number of the last conversion period whose values were loaded into the registers
+	_last_conversion: int
+
+	def __init__(self, signal: SyntheticSignal = None):
+		self.signal = SyntheticSignal() if signal is None else signal
+		self._registers = {
+			_REG_MANUFACTURER_ID: 0x5449,
+			_REG_DIE_ID: 0x3220
+		}
+		self._write_config(_CONFIG_DEFAULT)
+
+	def read_word_data(self, addr: int, register: int) -> int:
+		self._update()
+		value = self._registers.get(register, 0)
+		if register == _REG_MASK_ENABLE:
+			# Reading the register clears the conversion ready flag
+			self._registers[register] = value & ~_MASK_ENABLE_CVRF
+		# SMBus transfers the low byte first, but the chip sends the high byte first
+		return ((value & 0xFF) << 8) | (value >> 8)
+
+	def write_word_data(self, addr: int, register: int, value: int):
+		value = ((value & 0xFF) << 8) | (value >> 8)
+		if register == _REG_CONFIG:
+			self._write_config(value)
+		elif register == _REG_MASK_ENABLE:
+			# The flags are read-only
+			self._registers[register] = (value & ~_MASK_ENABLE_CVRF) | \
+				(self._registers.get(register, 0) & _MASK_ENABLE_CVRF)
+		elif register in self._registers:
+			self._registers[register] = value
+
+	def read_byte_data(self, addr: int, register: int) -> int:
+		return self.read_word_data(addr, register) & 0xFF
+
+	def write_byte_data(self, addr: int, register: int, value: int):
+		self.write_word_data(addr, register, value << 8)
+
+	def get_conversion_time(self) -> float:
+		"""
+		Returns the time it takes the emulated chip to produce new values with the current config, in seconds
+		"""
+		config = self._registers[_REG_CONFIG]
+		channel_time = 0
+		if config & 0x1:
+			channel_time += _CONVERSION_TIMES_US[(config >> 3) & 0x7]
+		if config & 0x2:
+			channel_time += _CONVERSION_TIMES_US[(config >> 6) & 0x7]
+		num_channels = bin(config & 0x7000).count("1")
+		return max(1, channel_time * num_channels * _AVG_SAMPLES[(config >> 9) & 0x7]) / 1e6
+
+	def _write_config(self, value: int):
+		if value & _CONFIG_RESET:
+			value = _CONFIG_DEFAULT
+		self._registers[_REG_CONFIG] = value
+		self._registers[_REG_MASK_ENABLE] = 0
+		for channel in range(3):
+			self._registers[_REG_SHUNT_VOLTAGE_1 + channel * 2] = 0
+			self._registers[_REG_BUS_VOLTAGE_1 + channel * 2] = 0
+		self._config_time = time.monotonic()
+		self._last_conversion = 0
+
+	def _update(self):
+		"""
+		Loads new values into the voltage registers if a conversion period has ended since the last update
+		"""
+		config = self._registers[_REG_CONFIG]
+		if config & 0x3 == 0 or config & 0x4 == 0:
+			# Power-down or single-shot mode. Single-shot conversions are not emulated.
+			return
+		now = time.monotonic()
+		conversion = int((now - self._config_time) / self.get_conversion_time())
+		if conversion > self._last_conversion:
+			self._last_conversion = conversion
+			for channel in range(3):
+				if config & (0x4000 >> channel):
+					current, voltage = self.signal.get_values(channel + 1, now)
+					if config & 0x1:
+						self._registers[_REG_SHUNT_VOLTAGE_1 + channel * 2] = \
+							self._to_register(current * _SHUNT_RESISTOR, 0.005)
+					if config & 0x2:
+						self._registers[_REG_BUS_VOLTAGE_1 + channel * 2] = self._to_register(voltage, 0.001)
+			self._registers[_REG_MASK_ENABLE] |= _MASK_ENABLE_CVRF
+
+	@staticmethod
+	def _to_register(value: float, lsb: float) -> int:
+		"""
+		Converts a voltage into the value stored in a shunt or bus voltage register (16-bit two's complement, with
+		the 3 lowest bits unused)
+		"""
+		raw = max(-32768, min(32767, int(value / lsb))) & ~0x7
+		return raw & 0xFFFF
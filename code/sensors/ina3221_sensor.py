@@ -0,0 +1,42 @@
+from typing import List, Sequence
+
+from defs.acquisition_profile import AcquisitionProfile
+# noinspection PyPackageRequirements
+# Reason: The IDE incorrectly assumes this is a library that needs to be added to requirements.txt
+from lib import SDL_Pi_INA3221
+from sensors.sensor import Sensor, SensorReading
+
+
+class INA3221Sensor(Sensor):
+	"""
+	Sensor that reads power usage from an INA3221 chip using the SDL_Pi_INA3221 driver
+	"""
+
+	driver: SDL_Pi_INA3221.SDL_Pi_INA3221
+
+	def __init__(self, bus_num: int = 1, address: int = SDL_Pi_INA3221.INA3221_ADDRESS, bus=None):
+		"""
+		bus_num: Number of the I2C bus the chip is connected to
+		address: I2C address of the chip
+		bus: If specified, this object will be used to communicate with the chip instead of the real I2C bus.
+		It must have the same interface as smbus.SMBus.
+		"""
+		self.driver = SDL_Pi_INA3221.SDL_Pi_INA3221(twi=bus_num, addr=address, bus=bus)
+
+	def configure(self, profile: AcquisitionProfile, channels: Sequence[int]):
+		self.driver.configure(profile.averaging, profile.bus_conversion_time, profile.shunt_conversion_time, channels,
+			profile.measures_bus_voltage())
+
+	def read(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		return self._convert(self.driver.readChannels(channels, bus_voltage))
+
+	def read_on_conversion(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		return self._convert(self.driver.readChannelsOnConversion(channels, bus_voltage))
+
+	def get_conversion_time(self) -> float:
+		return self.driver.getConversionTime_s()
+
+	@staticmethod
+	def _convert(readings: List[SDL_Pi_INA3221.INA3221Reading]) -> List[SensorReading]:
+		return [SensorReading(r.timestamp, r.channel, r.current_mA, r.bus_voltage_V, r.power_mW, r.new)
+			for r in readings]
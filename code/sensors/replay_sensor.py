@@ -0,0 +1,105 @@
+import bisect
+import csv
+import time
+from typing import Dict, List, Sequence
+
+from data.data_writer import DataWriter
+from defs.acquisition_profile import AcquisitionProfile
+from defs.utils import log
+from sensors.sensor import Sensor, SensorReading
+
+
+class ReplaySensor(Sensor):
+	"""
+	Sensor that plays back power usage traces previously recorded by the main loop, either in real time or faster.
+	Each channel is read from a separate CSV file, in the format written by StandardDataWriter or BufferDataWriter.
+	Entries with no power value are skipped. Once a trace ends, it starts playing again from the beginning.
+	Since the unit of the recorded power column depends on how it was recorded, replayed values are returned both as
+	the current and as the power of each reading.
+	"""
+
+	# Playback speed. 1 plays the traces in real time, 2 plays them twice as fast, etc.
+	speed: float
+	# Timestamps (ms) and power values of each trace, indexed by channel
+	_times: Dict[int, List[int]]
+	_values: Dict[int, List[float]]
+	# Timestamp of the first entry of the earliest trace. All traces start playing from this point.
+	_trace_start: int
+	# Duration of the longest trace, in ms
+	_trace_duration: int
+	# Monotonic time at which playback started
+	_start: float
+	conversion_time: float
+
+	def __init__(self, file_paths: Dict[int, str], speed: float = 1):
+		"""
+		file_paths: Path to the trace file of each channel, indexed by channel
+		speed: Playback speed
+		"""
+		if speed <= 0:
+			raise ValueError("Playback speed must be positive")
+		self.speed = speed
+		self._times = {}
+		self._values = {}
+		for channel, file_path in file_paths.items():
+			times, values = self._load_trace(file_path)
+			if len(times) == 0:
+				raise ValueError("Trace file " + file_path + " does not contain any power values")
+			self._times[channel] = times
+			self._values[channel] = values
+		self._trace_start = min(times[0] for times in self._times.values())
+		self._trace_duration = max(1, max(times[-1] for times in self._times.values()) - self._trace_start)
+		self._start = time.monotonic()
+		self.conversion_time = 0.001
+
+	def configure(self, profile: AcquisitionProfile, channels: Sequence[int]):
+		self.conversion_time = profile.get_conversion_time(len(channels))
+		self._start = time.monotonic()
+
+	def read(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		timestamp = int(time.time() * 1000)
+		elapsed = int((time.monotonic() - self._start) * self.speed * 1000)
+		trace_time = self._trace_start + elapsed % self._trace_duration
+		readings = []
+		for channel in channels:
+			if channel not in self._times:
+				raise ValueError("No trace file has been specified for channel " + str(channel))
+			times = self._times[channel]
+			# Use the most recent value recorded before the current point of the trace
+			pos = max(0, bisect.bisect_right(times, trace_time) - 1)
+			value = self._values[channel][pos]
+			readings.append(SensorReading(timestamp, channel, value, None, value))
+		return readings
+
+	def get_conversion_time(self) -> float:
+		return self.conversion_time
+
+	@staticmethod
+	def _load_trace(file_path: str):
+		"""
+		Reads a trace file. Returns two lists containing the timestamp and the power value of each entry.
+		"""
+		times = []
+		values = []
+		with open(file_path, newline="") as file:
+			reader = csv.reader(file)
+			header = next(reader)
+			if DataWriter.COLUMN_TIME not in header:
+				# Buffer files start with a status line (position of the most recent entry, entry count and generation
+				# counter), followed by the header
+				header = next(reader)
+			time_col = header.index(DataWriter.COLUMN_TIME)
+			power_col = header.index(DataWriter.COLUMN_POWER)
+			for row in reader:
+				# Skip gaps and buffer entries that haven't been written yet, which are filled with spaces
+				if len(row) <= max(time_col, power_col) or row[power_col].strip() == "":
+					continue
+				times.append(int(float(row[time_col])))
+				values.append(float(row[power_col]))
+		if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+			# Entries in buffer files are not stored in chronological order
+			entries = sorted(zip(times, values))
+			times = [entry[0] for entry in entries]
+			values = [entry[1] for entry in entries]
+		log("Loaded " + str(len(times)) + " entries from trace file " + file_path)
+		return times, values
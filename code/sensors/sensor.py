@@ -0,0 +1,79 @@
+import time
+from abc import ABC, abstractmethod
+from typing import List, Sequence
+
+from defs.acquisition_profile import AcquisitionProfile
+
+
+class SensorReading:
+	"""
+	Values read from one sensor channel
+	"""
+
+	# UNIX time in ms at which the value was read
+	timestamp: int
+	channel: int
+	current_mA: float
+	# None if the bus voltage was not read
+	bus_voltage_V: "float | None"
+	# None if the bus voltage was not read
+	power_mW: "float | None"
+	# False if the sensor had not produced a new value since the previous read
+	new: bool
+
+	def __init__(self, timestamp: int, channel: int, current_mA: float, bus_voltage_V: "float | None" = None,
+		power_mW: "float | None" = None, new: bool = True):
+		self.timestamp = timestamp
+		self.channel = channel
+		self.current_mA = current_mA
+		self.bus_voltage_V = bus_voltage_V
+		if power_mW is None and bus_voltage_V is not None:
+			power_mW = bus_voltage_V * current_mA
+		self.power_mW = power_mW
+		self.new = new
+
+
+class Sensor(ABC):
+	"""
+	Base class for the power sensors that can be used to read the power usage of the devices
+	"""
+
+	@abstractmethod
+	def configure(self, profile: AcquisitionProfile, channels: Sequence[int]):
+		"""
+		Applies the averaging, conversion time and mode settings of an acquisition profile
+		channels: Channels of the sensor that will be enabled
+		"""
+		...
+
+	@abstractmethod
+	def read(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		"""
+		Reads several channels at once. Returns one reading per channel, in the same order, all of them sharing the
+		same timestamp.
+		bus_voltage: True to read the bus voltage too, which is required to compute real power.
+		"""
+		...
+
+	@abstractmethod
+	def get_conversion_time(self) -> float:
+		"""
+		Returns the time it takes the sensor to produce a new value for all enabled channels, in seconds
+		"""
+		...
+
+	def read_on_conversion(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		"""
+		Waits until the sensor produces a new set of values, then reads them like read().
+		The default implementation waits until the start of the next conversion period.
+		"""
+		conversion_time = self.get_conversion_time()
+		now = time.monotonic()
+		time.sleep(conversion_time - now % conversion_time)
+		return self.read(channels, bus_voltage)
+
+	def close(self):
+		"""
+		Releases any resources used by the sensor
+		"""
+		pass
@@ -0,0 +1,194 @@
+from threading import Thread, Event
+from typing import Dict, List, Tuple
+
+from defs.acquisition_profile import AcquisitionProfile
+from defs.measured_device import MeasuredDevice
+from sensors.sensor import Sensor, SensorReading
+from sensors.sensor_factory import SensorFactory
+from sensors.sensor_type import SensorType
+
+
+class _BusReader:
+	"""
+	Reads all the sensors connected to the same I2C bus, one after another. Can run on its own thread so multiple
+	buses are read in parallel.
+	"""
+
+	bus_num: int
+	# Sensors on this bus. Each entry contains the sensor, the channels to read and the position of each channel's
+	# device in the result list.
+	sensors: List[Tuple[Sensor, List[int], List[int]]]
+
+	_thread: "Thread | None"
+	_request: Event
+	_done: Event
+	_stop: bool
+	# Parameters of the current request
+	_results: List["SensorReading | None"]
+	_bus_voltage: bool
+	_on_conversion: bool
+	# Exception thrown by the last read, if any
+	_error: "Exception | None"
+
+	def __init__(self, bus_num: int):
+		self.bus_num = bus_num
+		self.sensors = []
+		self._thread = None
+		self._request = Event()
+		self._done = Event()
+		self._stop = False
+		self._results = []
+		self._bus_voltage = False
+		self._on_conversion = False
+		self._error = None
+
+	def read_into(self, results: List["SensorReading | None"], bus_voltage: bool, on_conversion: bool):
+		"""
+		Reads all the sensors on this bus, storing each reading in its position of the result list
+		"""
+		for sensor, channels, positions in self.sensors:
+			if on_conversion:
+				readings = sensor.read_on_conversion(channels, bus_voltage)
+			else:
+				readings = sensor.read(channels, bus_voltage)
+			for position, reading in zip(positions, readings):
+				results[position] = reading
+
+	def start_thread(self):
+		self._stop = False
+		self._thread = Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+	def request_read(self, results: List["SensorReading | None"], bus_voltage: bool, on_conversion: bool):
+		"""
+		Makes the thread start reading the sensors. wait_read() must be called afterwards.
+		"""
+		self._results = results
+		self._bus_voltage = bus_voltage
+		self._on_conversion = on_conversion
+		self._done.clear()
+		self._request.set()
+
+	def wait_read(self):
+		"""
+		Waits until the read started by request_read() is done. If the read failed, throws the same exception.
+		"""
+		self._done.wait()
+		if self._error is not None:
+			error = self._error
+			self._error = None
+			raise error
+
+	def stop_thread(self):
+		if self._thread is not None:
+			self._stop = True
+			self._request.set()
+			self._thread.join()
+			self._thread = None
+
+	def _run(self):
+		while True:
+			self._request.wait()
+			self._request.clear()
+			if self._stop:
+				break
+			try:
+				self.read_into(self._results, self._bus_voltage, self._on_conversion)
+			except Exception as e:
+				self._error = e
+			self._done.set()
+
+
+class SensorArray:
+	"""
+	Reads the power usage of all the measured devices, which can be connected to multiple sensors on multiple I2C
+	buses. Sensors on the same bus are read one after another, but each bus is read by a separate thread, so adding
+	buses doesn't increase the time it takes to read all the devices.
+	Each sensor is read with a single multi-channel read, so all its channels are aligned in time.
+	"""
+
+	devices: List[MeasuredDevice]
+	_bus_readers: List[_BusReader]
+	# Sensors indexed by (bus, address)
+	_sensors: Dict[Tuple[int, int], Sensor]
+
+	def __init__(self, devices: List[MeasuredDevice], sensor_type: SensorType, replay_files: List[str] = None,
+		replay_speed: float = 1):
+		"""
+		devices: Devices to measure, in the order their readings will be returned
+		sensor_type: Type of sensor used to read each (bus, address) pair
+		replay_files: Trace files to play back when using SensorType.REPLAY. Element 0 corresponds to the first
+		device in the device list.
+		replay_speed: Playback speed when using SensorType.REPLAY
+		"""
+		self.devices = devices
+
+		# Group the channels of each sensor
+		sensor_channels = {}
+		for position, device in enumerate(devices):
+			entry = sensor_channels.setdefault((device.bus, device.address), ([], []))
+			entry[0].append(device.channel)
+			entry[1].append(position)
+
+		self._sensors = {}
+		bus_readers = {}
+		for (bus_num, address), (channels, positions) in sensor_channels.items():
+			files = None
+			if sensor_type == SensorType.REPLAY:
+				if replay_files is None or len(replay_files) < len(devices):
+					raise ValueError("A trace file must be specified for each device")
+				files = {channel: replay_files[position] for channel, position in zip(channels, positions)}
+			sensor = SensorFactory().get_sensor(sensor_type, bus_num, address, files, replay_speed)
+			self._sensors[(bus_num, address)] = sensor
+			bus_reader = bus_readers.setdefault(bus_num, _BusReader(bus_num))
+			bus_reader.sensors.append((sensor, channels, positions))
+		self._bus_readers = list(bus_readers.values())
+
+		# Extra threads are only needed if there's more than one bus
+		if len(self._bus_readers) > 1:
+			for bus_reader in self._bus_readers:
+				bus_reader.start_thread()
+
+	def configure(self, profile: AcquisitionProfile):
+		"""
+		Applies an acquisition profile to all the sensors, enabling only the channels that are in use
+		"""
+		for bus_reader in self._bus_readers:
+			for sensor, channels, _ in bus_reader.sensors:
+				sensor.configure(profile, channels)
+
+	def read(self, bus_voltage: bool = False) -> List[SensorReading]:
+		"""
+		Reads all the devices. Returns one reading per device, in the same order as the device list.
+		bus_voltage: True to read the bus voltage too, which is required to compute real power.
+		"""
+		return self._read(bus_voltage, False)
+
+	def read_on_conversion(self, bus_voltage: bool = False) -> List[SensorReading]:
+		"""
+		Waits until all the sensors have produced new values, then reads all the devices like read().
+		"""
+		return self._read(bus_voltage, True)
+
+	def get_conversion_time(self) -> float:
+		"""
+		Returns the time it takes the slowest sensor to produce new values, in seconds
+		"""
+		return max(sensor.get_conversion_time() for sensor in self._sensors.values())
+
+	def close(self):
+		for bus_reader in self._bus_readers:
+			bus_reader.stop_thread()
+		for sensor in self._sensors.values():
+			sensor.close()
+
+	def _read(self, bus_voltage: bool, on_conversion: bool) -> List[SensorReading]:
+		results = [None] * len(self.devices)
+		if len(self._bus_readers) == 1:
+			self._bus_readers[0].read_into(results, bus_voltage, on_conversion)
+		else:
+			for bus_reader in self._bus_readers:
+				bus_reader.request_read(results, bus_voltage, on_conversion)
+			for bus_reader in self._bus_readers:
+				bus_reader.wait_read()
+		return results
@@ -0,0 +1,35 @@
+from typing import Dict
+
+from sensors.fake_smbus import FakeSMBus
+from sensors.ina3221_sensor import INA3221Sensor
+from sensors.replay_sensor import ReplaySensor
+from sensors.sensor import Sensor
+from sensors.sensor_type import SensorType
+from sensors.synthetic_sensor import SyntheticSensor
+
+
+class SensorFactory:
+	"""
+	Class used to instantiate sensors given a SensorType
+	"""
+
+	def get_sensor(self, sensor_type: SensorType, bus_num: int, address: int, replay_files: Dict[int, str] = None,
+		replay_speed: float = 1) -> Sensor:
+		"""
+		bus_num: Number of the I2C bus the sensor is connected to
+		address: I2C address of the sensor
+		replay_files: Trace files to play back, indexed by channel. Required for SensorType.REPLAY.
+		replay_speed: Playback speed for SensorType.REPLAY.
+		"""
+		if sensor_type == SensorType.INA3221:
+			return INA3221Sensor(bus_num, address)
+		elif sensor_type == SensorType.FAKE_SMBUS:
+			return INA3221Sensor(bus_num, address, FakeSMBus())
+		elif sensor_type == SensorType.SYNTHETIC:
+			return SyntheticSensor()
+		elif sensor_type == SensorType.REPLAY:
+			if replay_files is None or len(replay_files) == 0:
+				raise ValueError("At least one trace file must be specified to replay")
+			return ReplaySensor(replay_files, replay_speed)
+		else:
+			raise NotImplementedError("Sensor type " + sensor_type.name + " has not been implemented")
@@ -0,0 +1,28 @@
+from enum import Enum
+
+
+class SensorType(Enum):
+	"""
+	Represents the different kinds of sensor that can be used to read power usage
+	"""
+	INA3221 = 0  # Real INA3221 chip
+	FAKE_SMBUS = 1  # Real INA3221 driver running against an emulated chip
+	SYNTHETIC = 2  # Fake values generated without emulating any hardware
+	REPLAY = 3  # Values played back from previously recorded traces
+
+	@classmethod
+	def from_str(cls, string: str):
+		"""
+		Given a string that contains the short name of the sensor type, returns the corresponding enum value.
+		If the input doesn't represent a valid sensor type, throws ValueError.
+		"""
+		if string == "ina3221":
+			return cls.INA3221
+		elif string == "fake":
+			return cls.FAKE_SMBUS
+		elif string == "synthetic":
+			return cls.SYNTHETIC
+		elif string == "replay":
+			return cls.REPLAY
+		else:
+			raise ValueError("Unrecognized sensor type: " + string)
@@ -0,0 +1,83 @@
+import random
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from defs.acquisition_profile import AcquisitionProfile
+from sensors.sensor import Sensor, SensorReading
+
+
+class SyntheticSignal:
+	"""
+	Generates fake power usage values. Each channel alternates between periods of low and high usage (similar to a
+	device that is being attacked from time to time), with some noise added to every value.
+	"""
+
+	# Current used during low and high usage periods, in mA
+	LOW_CURRENT = 300
+	HIGH_CURRENT_MIN = 400
+	HIGH_CURRENT_MAX = 650
+	# Standard deviation of the noise added to each value, in mA
+	NOISE = 5
+	# Duration of each period, in seconds
+	MIN_PERIOD = 10
+	MAX_PERIOD = 20
+	# Supply voltage when no current is used, and voltage drop per mA
+	SUPPLY_VOLTAGE = 5.1
+	VOLTAGE_DROP = 0.0005
+
+	_rng: random.Random
+	# State of each channel: (time of the next change, high usage flag, base current of the current period)
+	_channel_state: Dict[int, Tuple[float, bool, float]]
+
+	def __init__(self, seed: int = None):
+		self._rng = random.Random(seed)
+		self._channel_state = {}
+
+	def get_values(self, channel: int, t: float) -> Tuple[float, float]:
+		"""
+		Returns the current (mA) and bus voltage (V) of a channel at a given time (in seconds). Times must be
+		increasing for each channel.
+		"""
+		state = self._channel_state.get(channel)
+		if state is None:
+			state = (t + self._rng.uniform(self.MIN_PERIOD, self.MAX_PERIOD), False, self.LOW_CURRENT)
+		next_change, high, base_current = state
+		while t >= next_change:
+			high = not high
+			base_current = self._rng.uniform(self.HIGH_CURRENT_MIN, self.HIGH_CURRENT_MAX) if high \
+				else self.LOW_CURRENT
+			next_change += self._rng.uniform(self.MIN_PERIOD, self.MAX_PERIOD)
+		self._channel_state[channel] = (next_change, high, base_current)
+
+		current = base_current + self._rng.gauss(0, self.NOISE)
+		return current, self.SUPPLY_VOLTAGE - current * self.VOLTAGE_DROP
+
+
+class SyntheticSensor(Sensor):
+	"""
+	Sensor that generates fake values without accessing any hardware. Reads are almost instant, so it can be used to
+	test the acquisition pipeline at high rates.
+	"""
+
+	signal: SyntheticSignal
+	# Value returned by get_conversion_time(), in seconds
+	conversion_time: float
+
+	def __init__(self, seed: int = None):
+		self.signal = SyntheticSignal(seed)
+		self.conversion_time = 0.001
+
+	def configure(self, profile: AcquisitionProfile, channels: Sequence[int]):
+		self.conversion_time = profile.get_conversion_time(len(channels))
+
+	def read(self, channels: Sequence[int], bus_voltage: bool = False) -> List[SensorReading]:
+		timestamp = int(time.time() * 1000)
+		t = time.monotonic()
+		readings = []
+		for channel in channels:
+			current, voltage = self.signal.get_values(channel, t)
+			readings.append(SensorReading(timestamp, channel, current, voltage if bus_voltage else None))
+		return readings
+
+	def get_conversion_time(self) -> float:
+		return self.conversion_time